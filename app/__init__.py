@@ -1,3 +1,5 @@
+import asyncio
+import signal
 from contextlib import asynccontextmanager
 
 import redis.asyncio as redis
@@ -5,32 +7,55 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_cache import FastAPICache
 from fastapi_cache.backends.redis import RedisBackend
+from loguru import logger
 from prometheus_client import make_asgi_app
 from tiacore_lib.config import ConfigName, get_settings
 from tiacore_lib.rabbit.publisher import EventPublisher
 from tortoise import Tortoise
 
-from app.config import TestConfig, _load_settings
+from app.config import TestConfig, get_settings_snapshot, reload_settings
 from app.database.add_permissions import add_initial_permissions
 from app.logger import setup_logger
 from app.routes import register_routes
 from app.utils.db_helpers import create_test_data
+from app.utils.hashing import (
+    BcryptHasher,
+    configure_calibrated_hasher,
+    configure_hash_pool,
+    configure_password_hasher,
+)
+from app.utils.jwt_keys import reset_keyrings
+from app.utils.outbox import run_outbox_dispatcher
+from app.utils.policy_graph import configure_policy_snapshot
+from app.utils.revocation import listen_revocations
 
 
 def provide_settings(config_name: ConfigName):
     def _inner():
-        return _load_settings(config_name)
+        return get_settings_snapshot(config_name)
 
     return _inner
 
 
+def _reload(config_name: ConfigName) -> None:
+    reload_settings(config_name)
+    # Новые ключи из JWT_KEYS_DIR подхватываются вместе с настройками
+    reset_keyrings()
+
+
 def create_app(config_name: ConfigName) -> FastAPI:
-    settings = _load_settings(config_name)
+    settings = get_settings_snapshot(config_name)
+    configure_hash_pool(settings.HASH_POOL_WORKERS, settings.HASH_POOL_QUEUE_SIZE, settings.HASH_POOL_KIND)
+    if settings.PASSWORD_HASH_ROUNDS:
+        configure_password_hasher(BcryptHasher(settings.PASSWORD_HASH_ROUNDS))
+    configure_policy_snapshot(settings.POLICY_SNAPSHOT_PATH)
 
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         print("🔥 Lifespan START")
         print(f"Тип настроек: {type(settings)}")
+        revocation_listener = None
+        outbox_dispatcher = None
         if not isinstance(settings, TestConfig):
             from app.database.config import TORTOISE_ORM
 
@@ -44,11 +69,24 @@ def create_app(config_name: ConfigName) -> FastAPI:
             redis_url = settings.REDIS_URL
             redis_client = redis.from_url(redis_url)
             FastAPICache.init(RedisBackend(redis_client), prefix="fastapi-cache")
+            app.state.redis = redis_client
+            if not settings.PASSWORD_HASH_ROUNDS:
+                await configure_calibrated_hasher(settings.PASSWORD_HASH_TARGET_MS, redis_client)
+            revocation_listener = asyncio.create_task(listen_revocations(redis_client))
 
             app.state.publisher = EventPublisher(settings.AUTH_BROKER_URL)
             await app.state.publisher.connect()
+            outbox_dispatcher = asyncio.create_task(run_outbox_dispatcher(app.state.publisher))
+
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, _reload, config_name)
+            except (NotImplementedError, AttributeError):
+                logger.warning("SIGHUP недоступен, перечитывание настроек по сигналу отключено")
         yield
 
+        for task in (revocation_listener, outbox_dispatcher):
+            if task is not None:
+                task.cancel()
         await Tortoise.close_connections()
 
     app = FastAPI(title="Auth Service", lifespan=lifespan)
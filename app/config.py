@@ -1,3 +1,4 @@
+from loguru import logger
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from tiacore_lib.config import (
     BaseConfig as SharedBaseConfig,
@@ -37,10 +38,40 @@ class BaseConfig(SharedBaseConfig):
 
     AUTH_BROKER_URL: str = ""
 
+    # Access-токен несёт снимок прав и проверяется без обращения к БД
+    STATELESS_ACCESS_TOKENS: bool = False
+
+    # Пул для bcrypt: "thread" или "process"; None — по числу CPU (не больше 4)
+    HASH_POOL_KIND: str = "thread"
+    HASH_POOL_WORKERS: int | None = None
+    HASH_POOL_QUEUE_SIZE: int = 64
+    # Стоимость bcrypt; пусто — калибруется на старте под PASSWORD_HASH_TARGET_MS на хеш
+    PASSWORD_HASH_ROUNDS: int | None = None
+    PASSWORD_HASH_TARGET_MS: float = 250
+
+    # Скользящие окна попыток логина, регистрации и писем (Redis): попыток за RATE_LIMIT_WINDOW секунд
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_WINDOW: int = 60
+    RATE_LIMIT_PER_IP: int = 30
+    RATE_LIMIT_PER_EMAIL: int = 5
+
+    # Ключ HMAC для API-токенов; пусто — SECRET_KEY (смена ключа делает все токены недействительными)
+    API_TOKEN_SECRET: str | None = None
+
+    # Каталог с <kid>.pem для RS256; пусто — подпись SECRET_KEY/ALGORITHM
+    JWT_KEYS_DIR: str | None = None
+    JWT_SIGNING_KID: str | None = None
+    # При JWT_KEYS_DIR принимать и токены, подписанные SECRET_KEY; выключить, когда старые токены истекут
+    JWT_ACCEPT_HS256: bool = True
+
+    # Файл снимка политики ролей, общий для воркеров (mmap); пусто — граф в памяти воркера
+    POLICY_SNAPSHOT_PATH: str | None = None
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
         extra="ignore",
+        frozen=True,
     )
 
     @property
@@ -75,10 +106,26 @@ class TestConfig(BaseSettings):
     FRONT_ORIGIN: str | None = None
     BACK_ORIGIN: str | None = None
     AUTH_BROKER_URL: str = ""
+    STATELESS_ACCESS_TOKENS: bool = False
+    HASH_POOL_KIND: str = "thread"
+    HASH_POOL_WORKERS: int | None = None
+    HASH_POOL_QUEUE_SIZE: int = 64
+    PASSWORD_HASH_ROUNDS: int | None = 12
+    PASSWORD_HASH_TARGET_MS: float = 250
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_WINDOW: int = 60
+    RATE_LIMIT_PER_IP: int = 30
+    RATE_LIMIT_PER_EMAIL: int = 5
+    API_TOKEN_SECRET: str | None = None
+    JWT_KEYS_DIR: str | None = None
+    JWT_SIGNING_KID: str | None = None
+    JWT_ACCEPT_HS256: bool = True
+    POLICY_SNAPSHOT_PATH: str | None = None
     model_config = SettingsConfigDict(
         env_file=".env.test",
         env_file_encoding="utf-8",
         extra="ignore",  # необязательно, но рекомендую
+        frozen=True,
     )
 
     def __init__(self, **kwargs):
@@ -136,3 +183,27 @@ def _load_settings(config_name: str):
             return ServerConfig()
         case _:
             raise ValueError(f"❌ Unknown config_name: {config_name}")
+
+
+# Настройки читаются один раз на процесс; перечитать — reload_settings (SIGHUP)
+_settings_snapshots: dict[ConfigName, BaseSettings] = {}
+
+
+def get_settings_snapshot(config_name: str):
+    name = ConfigName(config_name)
+    settings = _settings_snapshots.get(name)
+    if settings is None:
+        settings = _settings_snapshots[name] = _load_settings(name)
+    return settings
+
+
+def reload_settings(config_name: str):
+    """
+    Перечитывает окружение и .env и подменяет снимок для новых запросов.
+
+    Уже созданные на старте ресурсы (БД, Redis, пул хеширования) не пересоздаются.
+    """
+    name = ConfigName(config_name)
+    _settings_snapshots[name] = _load_settings(name)
+    logger.info(f"🔄 Настройки {name.value} перечитаны")
+    return _settings_snapshots[name]
@@ -2,13 +2,13 @@ import os
 
 from dotenv import load_dotenv
 
-from app.config import ConfigName, _load_settings
+from app.config import ConfigName, get_settings_snapshot
 
 load_dotenv()
 
 
 CONFIG_NAME = ConfigName(os.getenv("CONFIG_NAME", "development"))
-settings = _load_settings(config_name=CONFIG_NAME)
+settings = get_settings_snapshot(config_name=CONFIG_NAME)
 
 TORTOISE_ORM = {
     "connections": {"default": settings.db_url},
@@ -1,14 +1,21 @@
 import uuid
 
-import bcrypt
 from tortoise import fields
+from tortoise.exceptions import IntegrityError
 from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from app.utils.hashing import hash_password, needs_rehash, verify_password
+
+PERMISSION_BIT_ATTEMPTS = 10
 
 
 class Permission(Model):
     id = fields.CharField(max_length=255, pk=True)
     name = fields.CharField(max_length=255)
     comment = fields.CharField(max_length=255, null=True)
+    # Номер бита в масках прав; назначается один раз и не переиспользуется
+    bit_index = fields.IntField(null=True, unique=True)
 
     def __repr__(self):
         return f"<Permissions(permission_id={self.id}, permission_name={self.name})>"
@@ -16,6 +23,34 @@ class Permission(Model):
     class Meta:
         table = "permissions"
 
+    async def save(self, using_db=None, update_fields=None, force_create=False, force_update=False) -> None:
+        if self.bit_index is not None:
+            await super().save(using_db, update_fields, force_create, force_update)
+            return
+        if update_fields is not None:
+            update_fields = [*update_fields, "bit_index"]
+        db = using_db or self._choose_db(True)
+        # max + 1 без блокировки: параллельная вставка могла занять тот же бит — перечитываем и повторяем
+        for attempt in range(PERMISSION_BIT_ATTEMPTS):
+            try:
+                # Точка сохранения: конфликт не обрывает транзакцию вызывающего
+                async with in_transaction(db.connection_name) as tx:
+                    last = (
+                        await Permission.filter(bit_index__isnull=False)
+                        .using_db(tx)
+                        .order_by("-bit_index")
+                        .first()
+                        .values_list("bit_index", flat=True)
+                    )
+                    self.bit_index = 0 if last is None else last + 1  # type: ignore[operator]
+                    await super().save(tx, update_fields, force_create, force_update)
+                return
+            except IntegrityError:
+                taken = await Permission.filter(bit_index=self.bit_index).exclude(id=self.id).using_db(db).exists()
+                self.bit_index = None
+                if not taken or attempt == PERMISSION_BIT_ATTEMPTS - 1:
+                    raise
+
 
 class Restriction(Model):
     id = fields.CharField(max_length=255, pk=True)
@@ -46,6 +81,10 @@ class ApiToken(Model):
     id = fields.UUIDField(pk=True, default=uuid.uuid4)
     user = fields.ForeignKeyField("models.User", related_name="api_tokens", on_delete=fields.CASCADE)
     application = fields.ForeignKeyField("models.Application", related_name="api_tokens", on_delete=fields.CASCADE)
+    # Публичная часть токена tia_<prefix>_…: поиск по индексу без перебора хешей.
+    # У токенов, выпущенных до префиксов, пусто — такие не принимаются
+    prefix = fields.CharField(max_length=16, unique=True, null=True)
+    # HMAC-SHA256 токена (app.handlers.token)
     token_hash = fields.CharField(max_length=255)
     created_at = fields.DatetimeField(auto_now_add=True)
     expires_at = fields.DatetimeField(null=True)
@@ -86,6 +125,46 @@ class RoleIncludeRelation(Model):
     class Meta:
         table = "role_include_relations"
 
+    # Замыкание role_closure обновляется в той же транзакции, что и само ребро.
+    # Массовые операции QuerySet (.update()/.delete()) его не поддерживают.
+    async def save(self, using_db=None, update_fields=None, force_create=False, force_update=False) -> None:
+        from app.utils.role_closure import replace_closure_edge
+
+        db = using_db or self._choose_db(True)
+        async with in_transaction(db.connection_name) as tx:
+            previous = None
+            if self._saved_in_db:
+                previous = (
+                    await RoleIncludeRelation.filter(id=self.id)
+                    .using_db(tx)
+                    .first()
+                    .values_list("parent_role_id", "child_role_id")
+                )
+            await super().save(tx, update_fields, force_create, force_update)
+            await replace_closure_edge(previous, (self.parent_role_id, self.child_role_id), tx)  # type: ignore
+
+    async def delete(self, using_db=None) -> None:
+        from app.utils.role_closure import replace_closure_edge
+
+        db = using_db or self._choose_db(True)
+        async with in_transaction(db.connection_name) as tx:
+            await super().delete(tx)
+            await replace_closure_edge((self.parent_role_id, self.child_role_id), None, tx)  # type: ignore
+
+
+class RoleClosure(Model):
+    """Транзитивное замыкание RoleIncludeRelation: ancestor включает descendant на глубине depth."""
+
+    id = fields.UUIDField(pk=True, default=uuid.uuid4)
+    ancestor = fields.ForeignKeyField("models.Role", related_name="closure_descendants", on_delete=fields.CASCADE)
+    descendant = fields.ForeignKeyField("models.Role", related_name="closure_ancestors", on_delete=fields.CASCADE)
+    depth = fields.IntField()
+
+    class Meta:
+        table = "role_closure"
+        unique_together = ("ancestor", "descendant")
+        indexes = (("descendant_id",),)
+
 
 class RolePermissionRelation(Model):
     id = fields.UUIDField(pk=True, default=uuid.uuid4)
@@ -125,13 +204,16 @@ class User(Model):
     class Meta:
         table = "users"
 
-    def check_password(self, password: str) -> bool:
+    async def check_password(self, password: str) -> bool:
         if not self.password_hash:
             return False
-        return bcrypt.checkpw(password.encode(), self.password_hash.encode())
+        return await verify_password(password, self.password_hash)
 
-    def update_password(self, password: str) -> None:
-        self.password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    async def update_password(self, password: str) -> None:
+        self.password_hash = await hash_password(password)
+
+    def password_needs_rehash(self) -> bool:
+        return bool(self.password_hash) and needs_rehash(self.password_hash)
 
     @classmethod
     async def create_user(
@@ -143,7 +225,7 @@ class User(Model):
         is_superadmin: bool = False,
         is_verified: bool = False,
     ):
-        hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        hashed_password = await hash_password(password)
         return await cls.create(
             email=email,
             password_hash=hashed_password,
@@ -251,3 +333,24 @@ class SubscriptionPayments(Model):
 
     class Meta:
         table = "subscription_payments"
+
+
+class OutboxEvent(Model):
+    """
+    Событие пользователя для брокера, записанное в той же транзакции, что и правка.
+    payload — готовое тело UserEvent на момент правки; отправляет app.utils.outbox.
+    """
+
+    id = fields.BigIntField(pk=True)
+    event_type = fields.CharField(max_length=50)
+    # Без внешнего ключа: событие о пользователе переживает его удаление
+    user_id = fields.UUIDField(null=True)
+    payload = fields.JSONField()
+    attempts = fields.IntField(default=0)
+    # Пусто — отправить сразу; иначе время следующей попытки или конец аренды диспетчером
+    available_at = fields.DatetimeField(null=True)
+    last_error = fields.TextField(null=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "event_outbox"
@@ -0,0 +1,97 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from app.database.models import User
+from app.handlers.cache_handler import get_permissions_version
+from app.utils.identity import (
+    EMPTY_PERMISSIONS,
+    NO_PERMISSIONS,
+    ParsedPermissions,
+    get_parsed_permissions,
+)
+from app.utils.permissions_cache import get_cached_permission_snapshot
+
+
+@dataclass(frozen=True, slots=True)
+class UserAccess:
+    is_superadmin: bool
+    permissions: ParsedPermissions
+
+    def _company(self, company_id: str, application_id: str):
+        return self.permissions.get(application_id, {}).get(company_id, NO_PERMISSIONS)
+
+    def allows(self, company_id: str, application_id: str, permission: str) -> bool:
+        return self.is_superadmin or permission in self._company(company_id, application_id).permissions
+
+    def restrictions(self, company_id: str, application_id: str, permission: str) -> frozenset[str]:
+        if self.is_superadmin:
+            return frozenset()
+        return self._company(company_id, application_id).restrictions.get(permission, frozenset())
+
+
+_ACCESS_CACHE_SIZE = 4096
+# (user_id, версия прав) -> UserAccess; None — пользователя нет
+_access: OrderedDict[tuple[str, str], Optional[UserAccess]] = OrderedDict()
+
+
+async def get_user_access(user_id) -> Optional[UserAccess]:
+    """
+    Права пользователя для точечных проверок. Пока версия прав не сменилась, ответ
+    берётся из памяти процесса: два чтения версии из кэша и поиск во frozenset,
+    без запроса пользователя и разбора JSON снимка.
+    """
+    key = (str(user_id), await get_permissions_version(user_id))
+    if key in _access:
+        _access.move_to_end(key)
+        return _access[key]
+
+    user = await User.get_or_none(id=user_id)
+    access = None
+    if user is not None and user.is_superadmin:
+        access = UserAccess(True, EMPTY_PERMISSIONS)
+    elif user is not None:
+        snapshot = await get_cached_permission_snapshot(user) or {}
+        parsed = EMPTY_PERMISSIONS
+        if snapshot:
+            parsed = get_parsed_permissions(
+                ("snapshot", key[0], snapshot["version"]), snapshot["permissions"], snapshot["masks"]
+            )
+        access = UserAccess(False, parsed)
+
+    _access[key] = access
+    if len(_access) > _ACCESS_CACHE_SIZE:
+        _access.popitem(last=False)
+    return access
+
+
+async def check_permission(user_id, company_id, application_id: str, permission: str) -> bool:
+    access = await get_user_access(user_id)
+    return access is not None and access.allows(str(company_id), application_id, permission)
+
+
+async def decide_permission(user_id, company_id, application_id: str, permission: str) -> dict:
+    """Решение целиком: выдано ли право и с какими запретами."""
+    access = await get_user_access(user_id)
+    if access is None or not access.allows(str(company_id), application_id, permission):
+        return {"allowed": False, "restrictions": []}
+    return {"allowed": True, "restrictions": sorted(access.restrictions(str(company_id), application_id, permission))}
+
+
+async def check_permissions(checks: Iterable) -> list[bool]:
+    """Пакет проверок: права каждого пользователя поднимаются один раз."""
+    checks = list(checks)
+    user_ids = list(dict.fromkeys(str(check.user_id) for check in checks))
+    accesses = dict(zip(user_ids, await asyncio.gather(*(get_user_access(uid) for uid in user_ids))))
+    results = []
+    for check in checks:
+        access = accesses[str(check.user_id)]
+        results.append(
+            access is not None and access.allows(str(check.company_id), check.application_id, check.permission)
+        )
+    return results
+
+
+def reset_access_cache() -> None:
+    _access.clear()
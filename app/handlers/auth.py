@@ -9,23 +9,64 @@ from tiacore_lib.config import get_settings
 
 from app.auth_schemas import bearer_scheme
 from app.database.models import User
-from app.utils.permissions_get import get_company_permissions_for_user
+from app.handlers.cache_handler import get_permissions_version
+from app.handlers.token import authenticate_api_token, is_api_token
+from app.utils.hashing import password_rehashed
+from app.utils.identity import EMPTY_PERMISSIONS, get_parsed_permissions
+from app.utils.jwt_keys import ASYMMETRIC_ALGORITHM, get_keyring
+from app.utils.permissions_cache import (
+    get_cached_company_permissions,
+    get_cached_permission_snapshot,
+)
+from app.utils.revocation import is_token_revoked
 
 # Конфигурация JWT
 
 
+def encode_jwt(payload: dict, settings) -> str:
+    """Подпись RS256 с kid, если настроен JWT_KEYS_DIR, иначе SECRET_KEY/ALGORITHM."""
+    keyring = get_keyring(settings)
+    if keyring is None:
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    return jwt.encode(
+        payload,
+        keyring.signing_key,
+        algorithm=ASYMMETRIC_ALGORITHM,
+        headers={"kid": keyring.signing_kid},
+    )
+
+
+def decode_jwt(token: str, settings) -> dict:
+    """
+    Проверка подписи по заголовку токена: RS256 — ключом с его kid,
+    иначе SECRET_KEY (токены, выданные до включения асимметричной подписи,
+    пока JWT_ACCEPT_HS256 не выключен).
+    """
+    keyring = get_keyring(settings)
+    if keyring is not None:
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") == ASYMMETRIC_ALGORITHM:
+            public_key = keyring.public_key(header.get("kid"))
+            if public_key is None:
+                raise JWTError(f"Unknown signing key: {header.get('kid')}")
+            return jwt.decode(token, public_key, algorithms=[ASYMMETRIC_ALGORITHM])
+        if not settings.JWT_ACCEPT_HS256:
+            raise JWTError(f"Signing algorithm is no longer accepted: {header.get('alg')}")
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
 def generate_token(payload: dict, settings, expires_in_hours: int = 1) -> str:
     payload = {
         **payload,
         "exp": datetime.now(timezone.utc) + timedelta(hours=expires_in_hours),
     }
-    token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    token = encode_jwt(payload, settings)
     return token
 
 
 def verify_jwt_token(token: str, settings) -> dict:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_jwt(token, settings)
         return payload
     except JWTError as e:
         logger.warning(f"❌ Ошибка при декодировании токена: {str(e)}")
@@ -43,7 +84,7 @@ def create_access_token(data: dict, settings, type, expires_delta=None):
             "iat": int(datetime.now(timezone.utc).timestamp()),
         }
     )
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = encode_jwt(to_encode, settings)
     return encoded_jwt
 
 
@@ -52,6 +93,45 @@ def create_refresh_token(data: dict, settings, type):
     return create_access_token(data, settings, type, expires_delta=expires)
 
 
+async def issue_token_pair(user: User, settings, sid: str | None = None) -> tuple[str, str]:
+    """
+    Access и refresh одной сессии. Общий sid связывает пару (и все её обновления
+    через /refresh): logout отзывает sid, и refresh-токен перестаёт работать вместе с access.
+    """
+    sid = sid or str(uuid4())
+    access_token = create_access_token(
+        {**await build_access_claims(user, settings), "sid": sid}, settings, type="access"
+    )
+    refresh_token = create_refresh_token({"sub": user.email, "sid": sid}, settings, type="refresh")
+    return access_token, refresh_token
+
+
+async def build_access_claims(user: User, settings) -> dict:
+    """
+    Claims для access-токена.
+
+    В режиме STATELESS_ACCESS_TOKENS токен дополнительно несёт подписанный
+    снимок: user_id, is_superadmin, права и их версию. Версия читается ДО
+    расчёта прав, чтобы правка, пришедшая между ними, сделала снимок устаревшим.
+    """
+    claims = {"sub": user.email}
+    if not settings.STATELESS_ACCESS_TOKENS:
+        return claims
+
+    version = await get_permissions_version(user.id)
+    snapshot = await get_cached_permission_snapshot(user) or {}
+    claims.update(
+        {
+            "uid": str(user.id),
+            "sa": user.is_superadmin,
+            "pv": version,
+            "perms": snapshot.get("permissions"),
+            "hr": snapshot.get("has_relations"),
+        }
+    )
+    return claims
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(bearer_scheme),
     settings=Depends(get_settings),
@@ -62,32 +142,52 @@ async def get_current_user(
 
     token = credentials.credentials.strip()
 
+    if is_api_token(token):
+        return await verify_api_token(token, settings)
     token_data = await verify_token(token, settings)
     return token_data
 
 
-async def verify_token(token: str, settings) -> dict:
+async def verify_token(token: str, settings, token_type: str | None = None) -> dict:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_jwt(token, settings)
         email = payload.get("sub")
         jti = payload.get("jti")
+        sid = payload.get("sid")
         if email is None:
             logger.warning("❌ Токен не содержит 'sub'. Отказ в доступе.")
             raise HTTPException(status_code=401, detail="Invalid token")
+        if token_type is not None and payload.get("type") != token_type:
+            logger.warning(f"❌ Ожидался токен типа {token_type}, получен {payload.get('type')}. Отказ в доступе.")
+            raise HTTPException(status_code=401, detail="Invalid token type")
+        if is_token_revoked(jti) or is_token_revoked(sid):
+            logger.warning(f"❌ Токен {jti} (сессия {sid}) отозван. Отказ в доступе.")
+            raise HTTPException(status_code=401, detail="Token has been revoked")
+
+        if settings.STATELESS_ACCESS_TOKENS and payload.get("type") == "access" and payload.get("pv"):
+            # Быстрый путь: снимок из токена актуален, пока версия прав не сменилась
+            if payload["pv"] == await get_permissions_version(payload["uid"]):
+                return {
+                    "email": email,
+                    "permissions": payload.get("perms"),
+                    "permission_blocks": get_parsed_permissions(
+                        ("token", payload["uid"], payload["pv"]), payload.get("perms")
+                    ),
+                    "has_relations": payload.get("hr"),
+                    "is_superadmin": payload["sa"],
+                    "user_id": payload["uid"],
+                    "jti": jti,
+                    "sid": sid,
+                    "exp": payload.get("exp"),
+                }
+            logger.debug(f"Снимок прав в токене устарел, пересчёт для {email}")
 
         user = await User.get_or_none(email=email)
         if not user:
             logger.warning("❌ Пользователь или application не найдены. Отказ в доступе.")
             raise HTTPException(status_code=401, detail="Invalid token or missing application")
-        permissions = await get_company_permissions_for_user(user)
-        token_data = {
-            "email": email,
-            "permissions": permissions,
-            "is_superadmin": user.is_superadmin,
-            "user_id": str(user.id),
-            "jti": jti,
-        }
-
+        token_data = await _user_token_data(user, jti, payload.get("exp"))
+        token_data["sid"] = sid
         return token_data
 
     except JWTError as e:
@@ -95,6 +195,65 @@ async def verify_token(token: str, settings) -> dict:
         raise HTTPException(status_code=401, detail="Invalid or expired token") from e
 
 
+async def verify_api_token(token: str, settings) -> dict:
+    """То же, что verify_token, для API-токена: поиск по prefix вместо подписи JWT."""
+    entry = await authenticate_api_token(token, settings)
+    if entry is None:
+        logger.warning("❌ API-токен не найден, неверен или истёк. Отказ в доступе.")
+        raise HTTPException(status_code=401, detail="Invalid or expired API token")
+    user = await User.get_or_none(id=entry["user_id"])
+    if not user:
+        logger.warning(f"❌ Владелец API-токена {entry['id']} не найден. Отказ в доступе.")
+        raise HTTPException(status_code=401, detail="Invalid or expired API token")
+    # Токен выпущен для одного приложения: права других приложений ему не достаются
+    token_data = await _user_token_data(user, None, entry["expires_at"], application_id=entry["application_id"])
+    token_data["api_token_id"] = entry["id"]
+    token_data["api_token_application"] = entry["application_id"]
+    return token_data
+
+
+async def _user_token_data(user: User, jti, exp, application_id: str | None = None) -> dict:
+    snapshot = await get_cached_permission_snapshot(user) or {}
+    if snapshot and application_id is not None:
+        snapshot = {
+            **snapshot,
+            "permissions": {application_id: snapshot["permissions"].get(application_id, {})},
+            "masks": {application_id: (snapshot["masks"] or {}).get(application_id, {})},
+        }
+    return {
+        "email": user.email,
+        "permissions": snapshot.get("permissions"),
+        "permission_masks": snapshot.get("masks"),
+        "permission_blocks": (
+            get_parsed_permissions(
+                ("snapshot", str(user.id), snapshot["version"], application_id),
+                snapshot["permissions"],
+                snapshot["masks"],
+            )
+            if snapshot
+            else EMPTY_PERMISSIONS
+        ),
+        "has_relations": snapshot.get("has_relations"),
+        "is_superadmin": user.is_superadmin,
+        "user_id": str(user.id),
+        "jti": jti,
+        "exp": exp,
+    }
+
+
+async def _rehash_password(user: User, password: str) -> None:
+    """Хеш с параметрами не по текущей калибровке: пароль известен — пересчитываем."""
+    try:
+        await user.update_password(password)
+    except HTTPException:
+        # Пул хеширования перегружен — логин важнее, перехешируем в следующий раз
+        logger.warning(f"Перехеширование пароля {user.email} отложено: пул занят")
+        return
+    await user.save(update_fields=["password_hash"])
+    password_rehashed.inc()
+    logger.info(f"🔐 Пароль {user.email} перехеширован с текущей стоимостью")
+
+
 async def login_handler(email: str, password: str):
     user = await User.get_or_none(email=email)
 
@@ -102,14 +261,17 @@ async def login_handler(email: str, password: str):
         logger.warning(f"🔐 Пользователь '{email}' не найден")
         raise HTTPException(status_code=404, detail=f"Пользователь '{email}' не найден")
 
-    if not user.check_password(password):
+    if not await user.check_password(password):
         logger.warning(f"🔐 Неверный пароль для пользователя '{email}'")
         raise HTTPException(status_code=401, detail=f"Неверный пароль для пользователя '{email}'")
 
     if not user.is_verified and not user.is_superadmin:
         raise HTTPException(status_code=403, detail="Необходимо верифицировать email")
 
-    company_permissions = await get_company_permissions_for_user(user)
+    if user.password_needs_rehash():
+        await _rehash_password(user, password)
+
+    company_permissions = await get_cached_company_permissions(user)
 
     return user, company_permissions
 
@@ -1,6 +1,126 @@
+import asyncio
+import secrets
+
 from fastapi_cache import FastAPICache
+from prometheus_client import Counter
+
+from app.utils.revocation import revoke_token
+
+# Версии прав живут дольше любого access-токена: если ключ пропал (TTL,
+# перезапуск Redis), генерируется новая случайная версия и все снимки
+# считаются устаревшими.
+PERMISSIONS_VERSION_TTL = 60 * 60 * 24 * 30
+
+POLICY_VERSION_KEY = "permissions_version:policy"
+
+permissions_cache_invalidations = Counter(
+    "permissions_cache_invalidations_total",
+    "Invalidations of cached permission snapshots",
+    ["scope"],
+)
+
+
+# Смена версии с проверкой прежней за один шаг: из параллельных правок
+# прежнюю версию видит только одна. KEYS[1] — ключ версии; ARGV: ожидаемая
+# версия, новая версия, TTL в секундах. 1 — прежняя версия совпала с ожидаемой.
+SWAP_VERSION_LUA = """
+local current = redis.call('GET', KEYS[1])
+redis.call('SET', KEYS[1], ARGV[2], 'EX', tonumber(ARGV[3]))
+if current == ARGV[1] then
+    return 1
+end
+return 0
+"""
+
+_swap_script = None
+_swap_script_client = None
+# Без Redis (InMemoryBackend) кэш живёт в одном процессе — хватает локальной блокировки
+_swap_lock = asyncio.Lock()
+
+
+def _user_version_key(user_id) -> str:
+    return f"permissions_version:user:{user_id}"
+
+
+async def blacklist_token(jti: str, exp: int, redis_client=None):
+    """Отзывает токен до его exp: ключ в Redis с TTL + рассылка по воркерам."""
+    await revoke_token(jti, exp, redis_client)
+
+
+async def _bump_version(key: str) -> str:
+    version = secrets.token_hex(6)
+    backend = FastAPICache.get_backend()
+    await backend.set(key, version.encode("utf-8"), expire=PERMISSIONS_VERSION_TTL)
+    return version
 
 
-async def blacklist_token(jti: str):
+async def _get_or_init_version(key: str) -> str:
     backend = FastAPICache.get_backend()
-    await backend.set(f"blacklist:{jti}", "true".encode("utf-8"))
+    raw = await backend.get(key)
+    if raw is not None:
+        return raw.decode("utf-8")
+    return await _bump_version(key)
+
+
+async def get_policy_version() -> str:
+    """Версия политики ролей: меняется при правках ролей, их прав и включений."""
+    return await _get_or_init_version(POLICY_VERSION_KEY)
+
+
+async def get_permissions_version(user_id) -> str:
+    """
+    Текущая версия прав пользователя: "<версия политики>.<версия пользователя>".
+
+    Политика меняется при правках ролей/прав/включений, версия пользователя —
+    при изменении его связей с компаниями.
+    """
+    policy_version = await get_policy_version()
+    user_version = await _get_or_init_version(_user_version_key(user_id))
+    return f"{policy_version}.{user_version}"
+
+
+async def bump_user_permissions_version(*user_ids) -> None:
+    for user_id in {str(uid) for uid in user_ids if uid}:
+        await _bump_version(_user_version_key(user_id))
+        permissions_cache_invalidations.labels(scope="user").inc()
+
+
+async def _swap_version(key: str, expected: str, version: str) -> bool:
+    """Записывает version в key; True — если до записи там лежала expected."""
+    global _swap_script, _swap_script_client
+    backend = FastAPICache.get_backend()
+    redis_client = getattr(backend, "redis", None)
+    if redis_client is not None:
+        if _swap_script_client is not redis_client:
+            _swap_script = redis_client.register_script(SWAP_VERSION_LUA)
+            _swap_script_client = redis_client
+        swapped = await _swap_script(keys=[key], args=[expected, version, PERMISSIONS_VERSION_TTL])  # type: ignore[misc]
+        return bool(swapped)
+    async with _swap_lock:
+        current = await backend.get(key)
+        await backend.set(key, version.encode("utf-8"), expire=PERMISSIONS_VERSION_TTL)
+    return current is not None and current.decode("utf-8") == expected
+
+
+async def advance_user_permissions_version(user_id, expected: str) -> str | None:
+    """
+    Сменить версию прав пользователя, если текущая равна expected (прочитанной до правки).
+    Возвращает новую полную версию; None — версию успели сменить другие правки
+    (версия всё равно сменена, но снимок, посчитанный для expected, дополнять нельзя).
+
+    Сравнение и смена версии пользователя атомарны: из параллельных правок одного
+    пользователя новую версию получает только одна, остальные пересобирают снимок целиком.
+    """
+    expected_policy, _, expected_user = expected.partition(".")
+    policy_version = await get_policy_version()
+    user_version = secrets.token_hex(6)
+    swapped = await _swap_version(_user_version_key(user_id), expected_user, user_version)
+    permissions_cache_invalidations.labels(scope="user").inc()
+    if not swapped or policy_version != expected_policy:
+        return None
+    return f"{policy_version}.{user_version}"
+
+
+async def bump_policy_version() -> None:
+    await _bump_version(POLICY_VERSION_KEY)
+    permissions_cache_invalidations.labels(scope="policy").inc()
@@ -4,10 +4,11 @@ from uuid import UUID
 from fastapi import Depends, HTTPException, Path, Query
 from loguru import logger
 from tiacore_lib.config import get_settings
-from tiacore_lib.pydantic_models.auth_models import RolePermissionBlock
 
 from app.database.models import UserCompanyRelation
 from app.handlers.auth import get_current_user
+from app.utils.identity import NO_PERMISSIONS
+from app.utils.permission_bits import get_permission_index
 
 
 async def get_current_context(
@@ -15,52 +16,68 @@ async def get_current_context(
     company: Optional[UUID] = Query(None, description="ID компании"),
     settings=Depends(get_settings),
 ):
-    permissions_map = token_data.get("permissions", {})
     is_token_superadmin = token_data.get("is_superadmin")
     user_id = token_data["user_id"]
-    logger.debug(f"[DEBUG TOKEN DATA] permissions={token_data['permissions']}")
     application = settings.APP
     if is_token_superadmin:
+        index = await get_permission_index()
         return {
             "user": user_id,
             "company": company,
             "application": application,
             "role": "superadmin",
             "permissions": ["*"],
+            "restrictions": {},
+            # Все известные процессу биты; проверки суперадмина до маски не доходят
+            "permission_mask": index.mask_of(permission_id for permission_id, _ in index.items()),
             "is_superadmin": True,
             "has_relations": True,
         }
 
-    relations = await UserCompanyRelation.filter(user_id=user_id).all()
-    has_relations = bool(relations)
-
-    permissions = []
-    raw_blocks = []
+    has_relations = token_data.get("has_relations")
+    if has_relations is None:
+        # Снимок или stateless-токен, выпущенные до появления флага
+        has_relations = await UserCompanyRelation.exists(user_id=user_id)
 
+    company_permissions = NO_PERMISSIONS
     if company and application:
-        raw_entries = permissions_map.get(application, {}).get(str(company), [])
-        for entry in raw_entries:
-            if isinstance(entry, dict):
-                entry = RolePermissionBlock(**entry)
-            permissions.extend(entry.permissions)
-            raw_blocks.append(entry)
-
-        logger.debug(
-            f"[DEBUG CONTEXT] application={application}, company={company}, "
-            f"raw={raw_entries}, flat_permissions={permissions}"
-        )
+        company_permissions = token_data["permission_blocks"].get(application, {}).get(str(company), NO_PERMISSIONS)
+
+    permission_mask = company_permissions.mask
+    if permission_mask is None:
+        # Снимок из stateless-токена несёт только списки прав
+        permissions = company_permissions.permissions
+        permission_mask = (await get_permission_index(permissions)).mask_of(permissions)
+
+    logger.debug(
+        f"[DEBUG CONTEXT] application={application}, company={company}, "
+        f"permissions={sorted(company_permissions.permissions)}"
+    )
 
     return {
         "user": user_id,
         "company": company,
         "application": application,
-        "permissions": permissions,
-        "raw_permission_blocks": raw_blocks,
+        "permissions": company_permissions.permissions,
+        "restrictions": company_permissions.restrictions,
+        "raw_permission_blocks": company_permissions.blocks,
+        "permission_mask": permission_mask,
         "is_superadmin": False,
         "has_relations": has_relations,
     }
 
 
+async def context_has_permission(ctx: dict, permission: str) -> bool:
+    """
+    Проверка одного бита в маске прав контекста. Разрешение, которого ещё нет
+    в индексе процесса (создано после его загрузки), ищется в множестве прав.
+    """
+    bit = (await get_permission_index()).bit(permission)
+    if bit is None:
+        return permission in ctx["permissions"]
+    return bool(ctx["permission_mask"] >> bit & 1)
+
+
 def require_permission_in_context(permission: str):
     async def dependency(ctx=Depends(get_current_context)):
         if ctx["is_superadmin"]:
@@ -71,7 +88,7 @@ def require_permission_in_context(permission: str):
                 доступ разрешён без проверки прав"""
             )
             return ctx
-        if permission in ctx["permissions"]:
+        if await context_has_permission(ctx, permission):
             return ctx
         logger.warning(
             f"Недостаточно прав для пользователя {ctx['user']}, требуется: {permission}"
@@ -102,7 +119,7 @@ def require_permission_or_self_view(permission: str):
             )
             return ctx
 
-        if permission in ctx["permissions"]:
+        if await context_has_permission(ctx, permission):
             return ctx
 
         logger.warning(
@@ -0,0 +1,70 @@
+import asyncio
+
+from fastapi import HTTPException
+from jose import JWTError
+from loguru import logger
+
+from app.database.models import User
+from app.handlers.auth import decode_jwt
+from app.utils.permissions_cache import get_cached_permission_snapshot
+from app.utils.revocation import is_token_revoked
+
+
+def _inactive(error: str) -> dict:
+    return {"active": False, "error": error}
+
+
+def _decode_access_token(token: str, settings) -> dict:
+    try:
+        payload = decode_jwt(token, settings)
+    except JWTError as e:
+        raise HTTPException(status_code=401, detail="Invalid or expired token") from e
+    if payload.get("type") != "access" or not payload.get("sub"):
+        raise HTTPException(status_code=401, detail="Not an access token")
+    if is_token_revoked(payload.get("jti")) or is_token_revoked(payload.get("sid")):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return payload
+
+
+async def introspect_tokens(tokens: list[str], application_id: str, settings) -> list[dict]:
+    """
+    Пакетная проверка access-токенов.
+
+    Одинаковые токены проверяются один раз, пользователи загружаются одним
+    запросом, а права считаются (или берутся из кэша) один раз на пользователя,
+    сколько бы его токенов ни пришло.
+    """
+    decoded: dict[str, dict] = {}
+    for token in dict.fromkeys(tokens):
+        try:
+            decoded[token] = _decode_access_token(token, settings)
+        except HTTPException as e:
+            decoded[token] = _inactive(e.detail)
+
+    emails = {payload["sub"] for payload in decoded.values() if "sub" in payload}
+    users = {user.email: user for user in await User.filter(email__in=list(emails))}
+
+    regular = [user for user in users.values() if not user.is_superadmin]
+    snapshots = await asyncio.gather(*(get_cached_permission_snapshot(user) for user in regular))
+    permissions = {
+        user.email: (snapshot or {}).get("permissions", {}).get(application_id, {})
+        for user, snapshot in zip(regular, snapshots)
+    }
+    logger.info(f"Интроспекция: {len(tokens)} токенов, {len(decoded)} уникальных, {len(users)} пользователей")
+
+    results = {}
+    for token, payload in decoded.items():
+        if "sub" not in payload:
+            results[token] = payload
+            continue
+        user = users.get(payload["sub"])
+        if user is None:
+            results[token] = _inactive("User not found")
+            continue
+        results[token] = {
+            "active": True,
+            "user_id": user.id,
+            "is_superadmin": user.is_superadmin,
+            "permissions": None if user.is_superadmin else permissions[user.email],
+        }
+    return [results[token] for token in tokens]
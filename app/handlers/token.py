@@ -1,13 +1,104 @@
+import hashlib
+import hmac
+import json
 import secrets
+import time
+from datetime import timezone
+from typing import Optional
 
-import bcrypt
+from fastapi_cache import FastAPICache
+from prometheus_client import Counter
 
+from app.database.models import ApiToken
 
-def generate_token_pair() -> tuple[str, str]:
-    token = secrets.token_urlsafe(32)
-    hashed = bcrypt.hashpw(token.encode(), bcrypt.gensalt()).decode()
-    return token, hashed
+# Токен: tia_<prefix>_<secret>. prefix — публичный id для поиска по уникальному индексу,
+# весь токен сверяется по HMAC-SHA256. bcrypt не нужен: в токене 256 случайных бит, не пароль
+API_TOKEN_SCHEME = "tia_"
+API_TOKEN_CACHE_PREFIX = "api_token:"
+# Для бессрочных токенов; удаление токена сбрасывает запись сразу
+API_TOKEN_CACHE_TTL = 24 * 60 * 60
 
+api_token_lookups = Counter("api_token_lookups_total", "API token authentications", ["result"])
 
-def verify_token(provided: str, hashed: str) -> bool:
-    return bcrypt.checkpw(provided.encode(), hashed.encode())
+
+def _hmac_key(settings) -> bytes:
+    return (settings.API_TOKEN_SECRET or settings.SECRET_KEY).encode()
+
+
+def api_token_digest(raw_token: str, settings) -> str:
+    return hmac.new(_hmac_key(settings), raw_token.encode(), hashlib.sha256).hexdigest()
+
+
+def generate_api_token(settings) -> tuple[str, str, str]:
+    """(токен, prefix, digest); сам токен не хранится и отдаётся клиенту один раз."""
+    prefix = secrets.token_hex(6)
+    raw_token = f"{API_TOKEN_SCHEME}{prefix}_{secrets.token_urlsafe(32)}"
+    return raw_token, prefix, api_token_digest(raw_token, settings)
+
+
+def is_api_token(token: str) -> bool:
+    return token.startswith(API_TOKEN_SCHEME)
+
+
+def _parse_prefix(raw_token: str) -> Optional[str]:
+    prefix, separator, secret = raw_token[len(API_TOKEN_SCHEME) :].partition("_")
+    return prefix if separator and prefix and secret else None
+
+
+def _cache_key(prefix: str) -> str:
+    return f"{API_TOKEN_CACHE_PREFIX}{prefix}"
+
+
+async def authenticate_api_token(raw_token: str, settings) -> Optional[dict]:
+    """
+    {"id", "user_id", "application_id", "expires_at"} действующего токена, иначе None.
+
+    Строка ищется по prefix, digest сравнивается hmac.compare_digest. Строка
+    успешно проверенного токена кэшируется до его expires_at, повторные запросы в БД не ходят;
+    digest из кэша всё равно сверяется с предъявленным токеном.
+    """
+    prefix = _parse_prefix(raw_token)
+    if prefix is None:
+        api_token_lookups.labels(result="invalid").inc()
+        return None
+    digest = api_token_digest(raw_token, settings)
+    backend = FastAPICache.get_backend()
+
+    raw = await backend.get(_cache_key(prefix))
+    if raw is not None:
+        entry, source = json.loads(raw), "cache"
+    else:
+        token = await ApiToken.get_or_none(prefix=prefix)
+        if token is None:
+            api_token_lookups.labels(result="invalid").inc()
+            return None
+        expires_at = token.expires_at
+        if expires_at is not None and expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        entry = {
+            "id": str(token.id),
+            "user_id": str(token.user_id),  # type: ignore
+            "application_id": token.application_id,  # type: ignore
+            "digest": token.token_hash,
+            "expires_at": int(expires_at.timestamp()) if expires_at else None,
+        }
+        source = "db"
+
+    now = time.time()
+    if not hmac.compare_digest(entry["digest"], digest) or (
+        entry["expires_at"] is not None and entry["expires_at"] <= now
+    ):
+        api_token_lookups.labels(result="invalid").inc()
+        return None
+
+    if source == "db":
+        ttl = API_TOKEN_CACHE_TTL if entry["expires_at"] is None else min(API_TOKEN_CACHE_TTL, int(entry["expires_at"] - now))
+        if ttl > 0:
+            await backend.set(_cache_key(prefix), json.dumps(entry).encode("utf-8"), expire=ttl)
+    api_token_lookups.labels(result=source).inc()
+    return entry
+
+
+async def forget_api_token(prefix: Optional[str]) -> None:
+    if prefix:
+        await FastAPICache.get_backend().clear(key=_cache_key(prefix))
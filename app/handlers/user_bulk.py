@@ -0,0 +1,193 @@
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request
+from loguru import logger
+from pydantic import ValidationError
+from tiacore_lib.pydantic_models.user_models import UserCreateSchema
+from tortoise.exceptions import IntegrityError
+from tortoise.transactions import in_transaction
+
+from app.database.models import Company, Role, User, UserCompanyRelation
+from app.pydantic_models.user_bulk_models import (
+    BULK_USERS_BATCH_SIZE,
+    BULK_USERS_MAX_ROWS,
+    BulkUserResponse,
+    BulkUserResult,
+)
+from app.utils.hashing import hash_passwords
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonlines")
+
+
+class _InvalidRow:
+    __slots__ = ("error",)
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return _InvalidRow(f"Некорректный JSON: {e}")
+
+
+async def iter_bulk_rows(request: Request) -> AsyncIterator:
+    """
+    Строки запроса: NDJSON читается по мере поступления тела (партии пишутся,
+    пока клиент ещё отправляет), JSON-массив — целиком.
+    """
+    content_type = request.headers.get("content-type", "").split(";", 1)[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    try:
+        rows = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив или NDJSON") from e
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив или NDJSON")
+    for row in rows:
+        yield row
+
+
+async def provision_users(rows: AsyncIterator) -> BulkUserResponse:
+    """
+    Массовое создание пользователей партиями по BULK_USERS_BATCH_SIZE. Каждая строка —
+    как тело /api/users/add; результат — по строке, ошибка одной строки не мешает остальным.
+    """
+    results: list[BulkUserResult] = []
+    seen: set[str] = set()
+    batch: list[tuple[int, UserCreateSchema]] = []
+    truncated = False
+
+    index = 0
+    async for row in rows:
+        if index >= BULK_USERS_MAX_ROWS:
+            truncated = True
+            break
+        if isinstance(row, _InvalidRow):
+            results.append(BulkUserResult(index=index, status="invalid", error=row.error))
+        else:
+            try:
+                data = UserCreateSchema.model_validate(row)
+            except ValidationError as e:
+                results.append(BulkUserResult(index=index, status="invalid", error=_first_error(e)))
+            else:
+                if data.email in seen:
+                    results.append(
+                        BulkUserResult(
+                            index=index, email=data.email, status="duplicate", error="Email повторяется в запросе"
+                        )
+                    )
+                else:
+                    seen.add(data.email)
+                    batch.append((index, data))
+        index += 1
+        if len(batch) >= BULK_USERS_BATCH_SIZE:
+            results.extend(await _create_batch(batch))
+            batch = []
+    if batch:
+        results.extend(await _create_batch(batch))
+
+    results.sort(key=lambda result: result.index)
+    created = sum(result.status == "created" for result in results)
+    logger.success(f"Массовое создание пользователей: создано {created} из {len(results)}")
+    return BulkUserResponse(
+        created=created,
+        failed=len(results) - created,
+        truncated=truncated,
+        results=results,
+    )
+
+
+def _first_error(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+async def _create_batch(
+    batch: list[tuple[int, UserCreateSchema]], password_hashes: dict[int, str] | None = None
+) -> list[BulkUserResult]:
+    """password_hashes — хеши строк (по index), посчитанные прошлой попыткой: bcrypt второй раз не нужен."""
+    existing = set(await User.filter(email__in=[data.email for _, data in batch]).values_list("email", flat=True))
+    results = [
+        BulkUserResult(index=index, email=data.email, status="exists", error="Имя пользователя занято")
+        for index, data in batch
+        if data.email in existing
+    ]
+    fresh = [(index, data) for index, data in batch if data.email not in existing]
+    if not fresh:
+        return results
+
+    password_hashes = dict(password_hashes or {})
+    unhashed = [(index, data) for index, data in fresh if index not in password_hashes]
+    try:
+        if unhashed:
+            hashes = await hash_passwords([data.password for _, data in unhashed])
+            password_hashes.update((index, password_hash) for (index, _), password_hash in zip(unhashed, hashes))
+    except HTTPException as e:
+        logger.warning(f"Партия из {len(fresh)} пользователей не создана: {e.detail}")
+        return results + [
+            BulkUserResult(index=index, email=data.email, status="failed", error=e.detail) for index, data in fresh
+        ]
+
+    # Роль user каждого приложения и существующие компании — по запросу на партию
+    application_ids = {data.application_id for _, data in fresh if data.company_id and data.application_id}
+    role_ids = dict(
+        await Role.filter(system_name="user", application_id__in=application_ids).values_list("application_id", "id")
+        if application_ids
+        else []
+    )
+    company_ids = {data.company_id for _, data in fresh if data.company_id and data.application_id}
+    companies = (
+        {str(company_id) for company_id in await Company.filter(id__in=company_ids).values_list("id", flat=True)}
+        if company_ids
+        else set()
+    )
+
+    users = [
+        User(email=data.email, full_name=data.full_name, position=data.position, password_hash=password_hashes[index])
+        for index, data in fresh
+    ]
+    relations = {}
+    for (index, data), user in zip(fresh, users):
+        role_id = role_ids.get(data.application_id)
+        if role_id and str(data.company_id) in companies:
+            relations[index] = UserCompanyRelation(
+                user_id=user.id, company_id=data.company_id, role_id=role_id, application_id=data.application_id
+            )
+
+    try:
+        async with in_transaction() as conn:
+            await User.bulk_create(users, using_db=conn)
+            await UserCompanyRelation.bulk_create(list(relations.values()), using_db=conn)
+    except IntegrityError as e:
+        # Email успели занять параллельно — партия откатилась целиком; повторяем без занятых
+        logger.warning(f"Конфликт при вставке партии пользователей, повтор: {e}")
+        taken = set(await User.filter(email__in=[data.email for _, data in fresh]).values_list("email", flat=True))
+        if not taken:
+            return results + [
+                BulkUserResult(index=index, email=data.email, status="failed", error="Ошибка записи")
+                for index, data in fresh
+            ]
+        return results + await _create_batch(fresh, password_hashes)
+
+    return results + [
+        BulkUserResult(
+            index=index, email=data.email, status="created", user_id=user.id, relation_created=index in relations
+        )
+        for (index, data), user in zip(fresh, users)
+    ]
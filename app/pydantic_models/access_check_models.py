@@ -0,0 +1,25 @@
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+CHECK_MAX_ITEMS = 1000
+
+
+class PermissionCheck(BaseModel):
+    user_id: UUID = Field(..., description="Пользователь, чьи права проверяются")
+    company_id: UUID = Field(..., description="Компания")
+    application_id: str = Field(..., description="Приложение")
+    permission: str = Field(..., description="ID разрешения")
+
+
+class PermissionCheckResponse(BaseModel):
+    allowed: bool
+    restrictions: list[str] = Field(default_factory=list, description="Запреты, с которыми выдано право")
+
+
+class PermissionCheckBatchRequest(BaseModel):
+    checks: list[PermissionCheck] = Field(..., min_length=1, max_length=CHECK_MAX_ITEMS)
+
+
+class PermissionCheckBatchResponse(BaseModel):
+    results: list[bool] = Field(..., description="В порядке переданных проверок")
@@ -0,0 +1,22 @@
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+INTROSPECT_MAX_TOKENS = 500
+
+
+class IntrospectRequest(BaseModel):
+    tokens: list[str] = Field(..., min_length=1, max_length=INTROSPECT_MAX_TOKENS, description="Access-токены")
+    application_id: str = Field(..., description="Приложение, для которого нужен блок прав")
+
+
+class TokenIntrospection(BaseModel):
+    active: bool
+    user_id: UUID | None = None
+    is_superadmin: bool | None = None
+    permissions: dict | None = Field(None, description="{company_id: [RolePermissionBlock]} для application_id")
+    error: str | None = None
+
+
+class IntrospectResponse(BaseModel):
+    results: list[TokenIntrospection] = Field(..., description="В порядке переданных токенов")
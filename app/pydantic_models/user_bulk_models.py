@@ -0,0 +1,25 @@
+from typing import Literal, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+BULK_USERS_BATCH_SIZE = 500
+BULK_USERS_MAX_ROWS = 10_000
+
+BulkUserStatus = Literal["created", "exists", "duplicate", "invalid", "failed"]
+
+
+class BulkUserResult(BaseModel):
+    index: int = Field(..., description="Номер строки в запросе, с нуля")
+    email: Optional[str] = None
+    status: BulkUserStatus
+    user_id: Optional[UUID] = None
+    relation_created: bool = Field(False, description="Создана связь с компанией (роль user приложения)")
+    error: Optional[str] = None
+
+
+class BulkUserResponse(BaseModel):
+    created: int
+    failed: int
+    truncated: bool = Field(False, description=f"Строки после {BULK_USERS_MAX_ROWS}-й не обработаны")
+    results: list[BulkUserResult] = Field(..., description="В порядке строк запроса")
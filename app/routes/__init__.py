@@ -1,11 +1,13 @@
 from fastapi import FastAPI
 
+from .api_token_route import token_router
 from .application_route import application_router
 from .auth_route import auth_router
 from .company_route import company_router
 from .company_subscription_route import company_subscription_router
 from .include_roles_route import role_include_router
 from .invite_route import invite_router
+from .jwks_route import jwks_router
 from .permissions_route import permissions_router
 from .register_route import register_router
 from .reset_password_route import reset_router
@@ -21,6 +23,7 @@ from .user_route import user_router
 
 def register_routes(app: FastAPI):
     app.include_router(auth_router, prefix="/api/auth", tags=["Auth"])
+    app.include_router(jwks_router, tags=["Auth"])
     app.include_router(register_router, prefix="/api", tags=["Register"])
     app.include_router(invite_router, prefix="/api", tags=["Invite"])
     app.include_router(reset_router, prefix="/api", tags=["ResetPassword"])
@@ -43,6 +46,7 @@ def register_routes(app: FastAPI):
     )
 
     app.include_router(application_router, prefix="/api/applications", tags=["Applications"])
+    app.include_router(token_router, prefix="/api/api-tokens", tags=["ApiTokens"])
     app.include_router(subscription_router, prefix="/api/subscriptions", tags=["Subscriptions"])
     app.include_router(subscription_details_router, prefix="/api/subscription-details", tags=["SubscriptionDetails"])
     app.include_router(company_subscription_router, prefix="/api/company-subscriptions", tags=["CompanySubscriptions"])
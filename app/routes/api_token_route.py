@@ -2,6 +2,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Path, status
 from loguru import logger
+from tiacore_lib.config import get_settings
 from tiacore_lib.pydantic_models.api_tokens_models import (
     ApiTokenCreateSchema,
     ApiTokenResponseSchema,
@@ -9,12 +10,31 @@ from tiacore_lib.pydantic_models.api_tokens_models import (
 from tiacore_lib.utils.validate_helpers import validate_exists
 
 from app.database.models import ApiToken, User, UserCompanyRelation
-from app.handlers.depends import require_permission_in_context
-from app.handlers.token import generate_token_pair  # функция хеширования
+from app.handlers.depends import context_has_permission, require_permission_in_context
+from app.handlers.token import forget_api_token, generate_api_token
 
 token_router = APIRouter()
 
 
+async def _check_token_owner_access(context: dict, permission: str, owner_id) -> None:
+    """
+    Токен действует от имени владельца, поэтому выпускать и удалять чужие токены
+    можно только по праву из собственной связи с компанией владельца. Пропуск
+    require_permission_in_context для пользователей без связей здесь не действует.
+    """
+    if context.get("is_superadmin"):
+        return
+    if str(owner_id) == str(context["user"]) and permission == "delete_api_token":
+        return
+    if context["company"] is None or not await context_has_permission(context, permission):
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    owner = await User.get_or_none(id=owner_id)
+    if owner is None or owner.is_superadmin:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    if not await UserCompanyRelation.exists(user_id=owner_id, company_id=context["company"]):
+        raise HTTPException(status_code=403, detail="Пользователь не связан с вашей компанией")
+
+
 @token_router.post(
     "/add",
     response_model=ApiTokenResponseSchema,
@@ -24,24 +44,17 @@ token_router = APIRouter()
 async def create_api_token(
     data: ApiTokenCreateSchema,
     context: dict = Depends(require_permission_in_context("add_api_token")),
+    settings=Depends(get_settings),
 ):
     await validate_exists(User, data.user_id, "Пользователь")
+    await _check_token_owner_access(context, "add_api_token", data.user_id)
 
-    if not context.get("is_superadmin"):
-        related = await UserCompanyRelation.exists(
-            user_id=data.user_id, api_token_id=context["api_token"]
-        )
-        if not related:
-            raise HTTPException(
-                status_code=403,
-                detail="Пользователь не связан с вашей компанией",
-            )
-
-    raw_token, token_hash = generate_token_pair()
+    raw_token, prefix, token_hash = generate_api_token(settings)
 
     token = await ApiToken.create(
         user_id=data.user_id,
         application_id=data.application_id,
+        prefix=prefix,
         token_hash=token_hash,
         expires_at=data.expires_at,
         comment=data.comment,
@@ -52,19 +65,22 @@ async def create_api_token(
 
 @token_router.delete(
     "/{api_token_id}",
-    summary="Удаление компании",
+    summary="Удаление API токена",
     status_code=status.HTTP_204_NO_CONTENT,
 )
 async def delete_api_token(
     api_token_id: UUID = Path(
-        ..., title="ID компании", description="ID удаляемой компании"
+        ..., title="ID API токена", description="ID удаляемого API токена"
     ),
-    _=Depends(require_permission_in_context("delete_api_token")),
+    context: dict = Depends(require_permission_in_context("delete_api_token")),
 ):
-    logger.info(f"Удаление компании: {api_token_id}")
+    logger.info(f"Удаление API токена: {api_token_id}")
 
     api_token = await ApiToken.filter(id=api_token_id).first()
     if not api_token:
-        raise HTTPException(status_code=404, detail="Компания не найдена")
+        raise HTTPException(status_code=404, detail="API токен не найден")
+    await _check_token_owner_access(context, "delete_api_token", api_token.user_id)  # type: ignore
     await api_token.delete()
-    logger.success(f"Компания {api_token_id} успешно удалена")
+    # Успешные проверки кэшируются до expires_at — удалённый токен убираем и из кэша
+    await forget_api_token(api_token.prefix)
+    logger.success(f"API токен {api_token_id} успешно удалён")
@@ -1,3 +1,5 @@
+import time
+
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from jose import JWTError
 from loguru import logger
@@ -9,27 +11,38 @@ from tiacore_lib.pydantic_models.auth_models import (
     TokenResponse,
     UserCompanyRelationOut,
 )
-from tiacore_lib.rabbit.models import EventType, UserEvent
+from tiacore_lib.rabbit.models import EventType
 
 from app.database.models import User, UserCompanyRelation
+from app.handlers.access_check import check_permissions, decide_permission
 from app.handlers.auth import (
-    create_access_token,
-    create_refresh_token,
     get_current_user,
+    issue_token_pair,
     login_handler,
+    require_superadmin,
     verify_token,
 )
 from app.handlers.cache_handler import blacklist_token
-from app.utils.event_builder import build_user_event
-from app.utils.permissions_get import (
-    get_company_permissions_by_application,
-    get_company_permissions_for_user,
+from app.handlers.introspection import introspect_tokens
+from app.pydantic_models.access_check_models import (
+    PermissionCheck,
+    PermissionCheckBatchRequest,
+    PermissionCheckBatchResponse,
+    PermissionCheckResponse,
+)
+from app.pydantic_models.introspection_models import (
+    IntrospectRequest,
+    IntrospectResponse,
 )
+from app.utils.outbox import enqueue_user_event
+from app.utils.permissions_cache import get_cached_company_permissions
+from app.utils.permissions_get import get_company_permissions_by_application
+from app.utils.rate_limit import rate_limit
 
 auth_router = APIRouter()
 
 
-@auth_router.post("/login", response_model=TokenResponse)
+@auth_router.post("/login", response_model=TokenResponse, dependencies=[Depends(rate_limit("login"))])
 async def login(data: LoginRequest, request: Request, settings=Depends(get_settings)):
     result = await login_handler(data.email, data.password)
     if not result:
@@ -37,12 +50,12 @@ async def login(data: LoginRequest, request: Request, settings=Depends(get_setti
 
     user, company_permissions = result
     logger.debug(f"Полученные разрешения: {company_permissions}")
-    event = await build_user_event(user, event_type=EventType.USER_LOGGED_IN)
-    await request.app.state.publisher.publish_event(event)
+    await enqueue_user_event(EventType.USER_LOGGED_IN, user_id=user.id)
 
+    access_token, refresh_token = await issue_token_pair(user, settings)
     return TokenResponse(
-        access_token=create_access_token({"sub": user.email}, settings, type="access"),
-        refresh_token=create_refresh_token({"sub": user.email}, settings, type="refresh"),
+        access_token=access_token,
+        refresh_token=refresh_token,
         permissions=None if user.is_superadmin else company_permissions,
         is_superadmin=user.is_superadmin,
         user_id=user.id,
@@ -57,18 +70,20 @@ async def refresh_access_token(data: RefreshRequest, settings=Depends(get_settin
         if not refresh_token:
             raise HTTPException(status_code=400, detail="Refresh token is required")
 
-        payload = await verify_token(refresh_token, settings)
+        payload = await verify_token(refresh_token, settings, token_type="refresh")
         email = payload["email"]
 
         user = await User.get_or_none(email=email)
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
 
-        company_permissions = await get_company_permissions_for_user(user)
+        company_permissions = await get_cached_company_permissions(user)
 
+        # Новая пара остаётся в той же сессии — logout отзовёт и её
+        access_token, refresh_token = await issue_token_pair(user, settings, payload.get("sid"))
         return TokenResponse(
-            access_token=create_access_token({"sub": user.email}, settings, type="access"),
-            refresh_token=create_refresh_token({"sub": user.email}, settings, type="refresh"),
+            access_token=access_token,
+            refresh_token=refresh_token,
             permissions=None if user.is_superadmin else company_permissions,
             is_superadmin=user.is_superadmin,
             user_id=user.id,
@@ -89,10 +104,13 @@ async def give_user_data(application_id: str = Query(...), token_data=Depends(ge
     ]
 
     company_list = [relation.company.id for relation in relations]
-    permissions = await get_company_permissions_by_application(user, application_id)
-    if not permissions:
-        filtered_permissions = {}
-    else:
+    filtered_permissions = {}
+    if not user.is_superadmin:
+        # Снимок прав уже поднят get_current_user (из кэша или токена); без него
+        # считаем только запрошенное приложение
+        permissions = token_data.get("permissions")
+        if permissions is None:
+            permissions = await get_company_permissions_by_application(user, application_id) or {}
         filtered_permissions = permissions.get(application_id, {})
 
     return MEResponse(
@@ -109,11 +127,39 @@ async def give_user_data(application_id: str = Query(...), token_data=Depends(ge
 async def logout(
     request: Request,
     token_data=Depends(get_current_user),
+    settings=Depends(get_settings),
 ):
     logger.info(f"Пользователь {token_data['email']} вышел из системы")
-    event = UserEvent(
-        event=EventType.USER_LOGGED_OUT,
-        email=token_data["email"],
-    )
-    await blacklist_token(token_data["jti"])
-    await request.app.state.publisher.publish_event(event)
+    redis_client = getattr(request.app.state, "redis", None)
+    if token_data.get("jti") and token_data.get("exp"):
+        await blacklist_token(token_data["jti"], token_data["exp"], redis_client)
+    if token_data.get("sid"):
+        # Отзыв сессии гасит refresh-токены пары; ни один из них не живёт дольше REFRESH_TOKEN_EXPIRE_DAYS
+        session_exp = int(time.time()) + settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
+        await blacklist_token(token_data["sid"], session_exp, redis_client)
+    await enqueue_user_event(EventType.USER_LOGGED_OUT, email=token_data["email"])
+
+
+@auth_router.post("/introspect", response_model=IntrospectResponse, summary="Пакетная проверка access-токенов")
+async def introspect(
+    data: IntrospectRequest,
+    settings=Depends(get_settings),
+    _=Depends(require_superadmin),
+):
+    results = await introspect_tokens(data.tokens, data.application_id, settings)
+    return IntrospectResponse(results=results)
+
+
+@auth_router.post("/check", response_model=PermissionCheckResponse, summary="Проверка одного разрешения пользователя")
+async def check(data: PermissionCheck, _=Depends(require_superadmin)):
+    decision = await decide_permission(data.user_id, data.company_id, data.application_id, data.permission)
+    return PermissionCheckResponse(**decision)
+
+
+@auth_router.post(
+    "/check/batch",
+    response_model=PermissionCheckBatchResponse,
+    summary="Пакетная проверка разрешений",
+)
+async def check_batch(data: PermissionCheckBatchRequest, _=Depends(require_superadmin)):
+    return PermissionCheckBatchResponse(results=await check_permissions(data.checks))
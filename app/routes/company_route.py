@@ -7,7 +7,6 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
-    Request,
     status,
 )
 from loguru import logger
@@ -22,10 +21,16 @@ from tiacore_lib.pydantic_models.company_models import (
 from tiacore_lib.rabbit.models import EventType
 from tiacore_lib.utils.validate_helpers import validate_exists
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
 from app.database.models import Application, Company, Role, User, UserCompanyRelation
 from app.handlers.auth import get_current_user
-from app.utils.event_builder import build_user_event
+from app.handlers.cache_handler import (
+    bump_user_permissions_version,
+    get_permissions_version,
+)
+from app.utils.outbox import enqueue_user_event
+from app.utils.permissions_cache import update_snapshot_after_relation_change
 
 company_router = APIRouter()
 
@@ -37,7 +42,6 @@ company_router = APIRouter()
     status_code=status.HTTP_201_CREATED,
 )
 async def add_company(
-    request: Request,
     data: CompanyCreateSchema = Body(),
     user_data: dict = Depends(get_current_user),
 ):
@@ -58,14 +62,16 @@ async def add_company(
 
     role = await Role.get_or_none(system_name="admin", application_id=data.application_id)
     if role:
-        await UserCompanyRelation.create(
-            role=role,
-            company=company,
-            user=user,
-            application_id=data.application_id,
-        )
-        event = await build_user_event(user, event_type=EventType.USER_UPDATED)
-        await request.app.state.publisher.publish_event(event)
+        version = await get_permissions_version(user.id)
+        async with in_transaction():
+            await UserCompanyRelation.create(
+                role=role,
+                company=company,
+                user=user,
+                application_id=data.application_id,
+            )
+            await enqueue_user_event(EventType.USER_UPDATED, user_id=user.id)
+        await update_snapshot_after_relation_change(user.id, [company.id], version)
 
     return {"company_id": str(company.id)}
 
@@ -99,7 +105,9 @@ async def delete_company(
     company = await Company.filter(id=company_id).first()
     if not company:
         raise HTTPException(status_code=404, detail="Компания не найдена")
+    related_user_ids = await UserCompanyRelation.filter(company_id=company_id).values_list("user_id", flat=True)
     await company.delete()
+    await bump_user_permissions_version(*related_user_ids)
     logger.success(f"Компания {company_id} успешно удалена")
 
 
@@ -3,9 +3,11 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
 from tiacore_lib.utils.validate_helpers import validate_exists
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
 from app.database.models import Role, RoleIncludeRelation
 from app.handlers.auth import require_superadmin
+from app.handlers.cache_handler import bump_policy_version
 from app.pydantic_models.include_roles_models import (
     RoleIncludeRelationCreateSchema,
     RoleIncludeRelationEditSchema,
@@ -14,6 +16,8 @@ from app.pydantic_models.include_roles_models import (
     RoleIncludeRelationResponseSchema,
     RoleIncludeRelationSchema,
 )
+from app.utils.impact import enqueue_role_impact
+from app.utils.role_closure import creates_cycle
 
 role_include_router = APIRouter()
 
@@ -22,18 +26,10 @@ role_include_router = APIRouter()
 async def check_no_cycle(parent_role_id: UUID, child_role_id: UUID):
     """
     Проверяет, не возникает ли цикл при добавлении связи parent → child.
+    Один индексированный запрос к role_closure вне зависимости от глубины иерархии.
     """
-    visited = set()
-    queue = [child_role_id]
-    while queue:
-        current = queue.pop()
-        if current == parent_role_id:
-            raise HTTPException(status_code=400, detail="Добавление этой связи создаст цикл в иерархии ролей.")
-        children = await RoleIncludeRelation.filter(parent_role_id=current).values_list("child_role_id", flat=True)
-        for ch in children:
-            if ch not in visited:
-                visited.add(ch)
-                queue.append(ch)  # type: ignore
+    if await creates_cycle(parent_role_id, child_role_id):
+        raise HTTPException(status_code=400, detail="Добавление этой связи создаст цикл в иерархии ролей.")
 
 
 @role_include_router.post(
@@ -60,9 +56,13 @@ async def add_role_include_relation(
     if exists:
         raise HTTPException(status_code=409, detail="Такая связь уже существует.")
 
-    relation = await RoleIncludeRelation.create(
-        created_by=context["user_id"], modified_by=context["user_id"], **data.model_dump()
-    )
+    async with in_transaction():
+        relation = await RoleIncludeRelation.create(
+            created_by=context["user_id"], modified_by=context["user_id"], **data.model_dump()
+        )
+        # Права меняются у держателей parent и всех ролей, включающих её
+        await enqueue_role_impact([data.parent_role_id])
+    await bump_policy_version()
     return {"role_include_relation_id": str(relation.id)}
 
 
@@ -107,9 +107,13 @@ async def update_role_include_relation(
     if exists:
         raise HTTPException(status_code=409, detail="Такая связь уже существует.")
 
+    previous_parent_id = relation.parent_role_id  # type: ignore
     await relation.update_from_dict(update_data)
     relation.modified_by = context["user_id"]
-    await relation.save()
+    async with in_transaction():
+        await relation.save()
+        await enqueue_role_impact([previous_parent_id, new_parent_id])
+    await bump_policy_version()
     return {"role_include_relation_id": str(relation.id)}
 
 
@@ -125,7 +129,10 @@ async def delete_role_include_relation(
     relation = await RoleIncludeRelation.filter(id=role_include_relation_id).first()
     if not relation:
         raise HTTPException(status_code=404, detail="Связь не найдена")
-    await relation.delete()
+    async with in_transaction():
+        await relation.delete()
+        await enqueue_role_impact([relation.parent_role_id])  # type: ignore
+    await bump_policy_version()
 
 
 @role_include_router.get(
@@ -11,18 +11,22 @@ from tiacore_lib.utils.verification import send_email
 from app.config import get_front_url
 from app.database.models import Application, Company, Role, User, UserCompanyRelation
 from app.handlers.auth import (
-    create_access_token,
-    create_refresh_token,
     generate_token,
     get_current_user,
+    issue_token_pair,
     verify_jwt_token,
 )
-from app.utils.permissions_get import get_company_permissions_for_user
+from app.handlers.cache_handler import get_permissions_version
+from app.utils.permissions_cache import (
+    get_cached_company_permissions,
+    update_snapshot_after_relation_change,
+)
+from app.utils.rate_limit import rate_limit
 
 invite_router = APIRouter()
 
 
-@invite_router.post("/invite", status_code=201)
+@invite_router.post("/invite", status_code=201, dependencies=[Depends(rate_limit("invite"))])
 async def invite_user(data: InviteRequest, _=Depends(get_current_user), settings=Depends(get_settings)):
     payload = {
         "sub": data.email,
@@ -95,17 +99,20 @@ async def register_with_token(
     if existing_relation:
         logger.info("🔁 Связь уже существует")
     else:
+        version = await get_permissions_version(user.id)
         await UserCompanyRelation.create(
             user=user,
             company_id=company_id,
             role=role,
             application_id=application_id,
         )
+        await update_snapshot_after_relation_change(user.id, [company_id], version)
         logger.debug("Связь создана")
+    access_token, refresh_token = await issue_token_pair(user, settings)
     return TokenResponse(
-        access_token=create_access_token({"sub": user.email}, settings, type="access"),
-        refresh_token=create_refresh_token({"sub": user.email}, settings, type="refresh"),
-        permissions=None if user.is_superadmin else await get_company_permissions_for_user(user),
+        access_token=access_token,
+        refresh_token=refresh_token,
+        permissions=None if user.is_superadmin else await get_cached_company_permissions(user),
         is_superadmin=user.is_superadmin,
         user_id=user.id,
     )
@@ -128,6 +135,8 @@ async def accept_invite(token: str = Query(...), settings=Depends(get_settings))
     if existing_relation:
         logger.info("🔁 Связь уже существует")
         return
+    version = await get_permissions_version(user.id)
     await UserCompanyRelation.create(user=user, company_id=company_id, role=role, application_id=application_id)
+    await update_snapshot_after_relation_change(user.id, [company_id], version)
     logger.debug("Связь создана")
     return
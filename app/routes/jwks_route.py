@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, Response
+from tiacore_lib.config import get_settings
+
+from app.utils.jwt_keys import get_keyring
+
+jwks_router = APIRouter()
+
+# Клиенты кешируют набор ключей; новый ключ публикуется заранее, до начала подписи им
+JWKS_MAX_AGE = 300
+
+
+@jwks_router.get("/.well-known/jwks.json", summary="Публичные ключи для проверки JWT")
+async def get_jwks(response: Response, settings=Depends(get_settings)):
+    keyring = get_keyring(settings)
+    response.headers["Cache-Control"] = f"public, max-age={JWKS_MAX_AGE}"
+    return keyring.jwks if keyring else {"keys": []}
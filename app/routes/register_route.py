@@ -13,11 +13,12 @@ from app.handlers.auth import (
     generate_token,
     verify_jwt_token,
 )
+from app.utils.rate_limit import rate_limit
 
 register_router = APIRouter()
 
 
-@register_router.post("/register", response_model=RegisterResponse)
+@register_router.post("/register", response_model=RegisterResponse, dependencies=[Depends(rate_limit("register"))])
 async def register(
     data: RegisterRequest,
     settings=Depends(get_settings),
@@ -47,7 +48,7 @@ async def register(
     return RegisterResponse(user_id=user.id)
 
 
-@register_router.post("/resend-verification")
+@register_router.post("/resend-verification", dependencies=[Depends(rate_limit("resend_verification"))])
 async def resend_verification(
     email: str = Body(..., embed=True),
     application_id: str = Body(..., embed=True),
@@ -12,11 +12,12 @@ from app.handlers.auth import (
     generate_token,
     verify_jwt_token,
 )
+from app.utils.rate_limit import rate_limit
 
 reset_router = APIRouter()
 
 
-@reset_router.post("/reset-password", status_code=201)
+@reset_router.post("/reset-password", status_code=201, dependencies=[Depends(rate_limit("reset_password"))])
 async def reset_password(data: ResetPasswordRequest, settings=Depends(get_settings)):
     payload = {
         "sub": data.email,
@@ -50,6 +51,6 @@ async def reset_verify(
     user = await User.get_or_none(email=email)
     if not user:
         raise HTTPException(status_code=400, detail="Пользователь не найден")
-    user.update_password(password=data.password)
+    await user.update_password(password=data.password)
     await user.save()
     return
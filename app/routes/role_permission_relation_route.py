@@ -12,6 +12,7 @@ from tiacore_lib.pydantic_models.role_permission_relation_models import (
 )
 from tiacore_lib.utils.validate_helpers import validate_exists
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
 from app.database.models import (
     Permission,
@@ -20,6 +21,8 @@ from app.database.models import (
     RolePermissionRelation,
 )
 from app.handlers.auth import require_superadmin
+from app.handlers.cache_handler import bump_policy_version
+from app.utils.impact import enqueue_role_impact
 
 role_relation_router = APIRouter()
 
@@ -38,7 +41,10 @@ async def add_role_permission_relation(
     await validate_exists(Permission, data.permission_id, "Разрешение")
     await validate_exists(Restriction, data.restriction_id, "Запрет")
 
-    relation = await RolePermissionRelation.create(**data.model_dump())
+    async with in_transaction():
+        relation = await RolePermissionRelation.create(**data.model_dump())
+        await enqueue_role_impact([relation.role_id])  # type: ignore
+    await bump_policy_version()
     return {"role_permission_id": str(relation.id)}
 
 
@@ -66,8 +72,12 @@ async def update_role_permission_relation(
         if field in update_data:
             await validate_exists(model, update_data[field], label)
 
+    previous_role_id = relation.role_id  # type: ignore
     relation.update_from_dict(update_data)
-    await relation.save()
+    async with in_transaction():
+        await relation.save()
+        await enqueue_role_impact([previous_role_id, relation.role_id])  # type: ignore
+    await bump_policy_version()
 
     return {"role_permission_id": str(relation.id)}
 
@@ -77,12 +87,18 @@ async def update_role_permission_relation(
     summary="Удалить связь роль-разрешение",
     status_code=status.HTTP_204_NO_CONTENT,
 )
-async def delete_role_permission_relation(role_permission_id: UUID, _: dict = Depends(require_superadmin)):
+async def delete_role_permission_relation(
+    role_permission_id: UUID,
+    _: dict = Depends(require_superadmin),
+):
     relation = await RolePermissionRelation.filter(id=role_permission_id).first()
     if not relation:
         raise HTTPException(status_code=404, detail="Связь не найдена")
 
-    await relation.delete()
+    async with in_transaction():
+        await relation.delete()
+        await enqueue_role_impact([relation.role_id])  # type: ignore
+    await bump_policy_version()
 
 
 @role_relation_router.get(
@@ -1,6 +1,14 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, Response, status
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    HTTPException,
+    Path,
+    Response,
+    status,
+)
 from loguru import logger
 from tiacore_lib.pydantic_models.roles_models import (
     RoleCreateManySchema,
@@ -12,9 +20,12 @@ from tiacore_lib.pydantic_models.roles_models import (
     RoleSchema,
 )
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
-from app.database.models import Role, RolePermissionRelation
+from app.database.models import Role, RoleIncludeRelation, RolePermissionRelation
 from app.handlers.auth import get_current_user, require_superadmin
+from app.handlers.cache_handler import bump_policy_version
+from app.utils.impact import enqueue_role_impact, find_affected_users
 
 role_router = APIRouter()
 
@@ -29,6 +40,8 @@ async def add_role(data: RoleCreateSchema = Body(...), _: dict = Depends(require
     logger.info("Создание роли")
     try:
         role = await Role.create(**data.model_dump())
+        # Граф ролей процесса не знает новую роль, пока не сменится версия политики
+        await bump_policy_version()
         logger.success(f"Роль {role.name} ({role.id}) успешно создана")
         return RoleResponseSchema(role_id=role.id)
     except (KeyError, TypeError, ValueError) as e:
@@ -48,17 +61,20 @@ async def add_many_roles(
 ):
     logger.info(f"Создание роли: {data.model_dump()}")
     try:
-        role = await Role.create(name=data.name, application_id=data.application_id)
-        await RolePermissionRelation.bulk_create(
-            [
-                RolePermissionRelation(
-                    role_id=role.id,
-                    permission_id=permission_id,
-                    application_id=data.application_id,
-                )
-                for permission_id in data.permissions
-            ]
-        )
+        async with in_transaction() as conn:
+            role = await Role.create(name=data.name, application_id=data.application_id, using_db=conn)
+            await RolePermissionRelation.bulk_create(
+                [
+                    RolePermissionRelation(
+                        role_id=role.id,
+                        permission_id=permission_id,
+                        application_id=data.application_id,
+                    )
+                    for permission_id in data.permissions
+                ],
+                using_db=conn,
+            )
+        await bump_policy_version()
         logger.success(f"Роль {role.name} ({role.id}) успешно создана")
         return {"role_id": role.id}
     except (KeyError, TypeError, ValueError) as e:
@@ -83,7 +99,10 @@ async def edit_role(
             raise HTTPException(status_code=403, detail="Нельзя изменить системную роль")
 
         await role.update_from_dict(data.model_dump(exclude_unset=True))
-        await role.save()
+        async with in_transaction():
+            await role.save()
+            await enqueue_role_impact([role_id])
+        await bump_policy_version()
 
         logger.success(f"Роль {role_id} успешно обновлена")
         return RoleResponseSchema(role_id=role.id)
@@ -107,7 +126,16 @@ async def delete_role(
         if role.system_name:
             raise HTTPException(status_code=403, detail="Нельзя удалить системную роль")
 
-        await role.delete()
+        # После удаления обратного замыкания роли уже не будет — пользователей ищем заранее
+        affected_user_ids = await find_affected_users([role_id])
+        async with in_transaction() as conn:
+            # Рёбра удаляем поштучно, чтобы пересобрать role_closure — каскад БД его не обновит
+            edges = await RoleIncludeRelation.filter(Q(parent_role_id=role_id) | Q(child_role_id=role_id)).using_db(conn)
+            for edge in edges:
+                await edge.delete(using_db=conn)
+            await role.delete(using_db=conn)
+            await enqueue_role_impact(user_ids=affected_user_ids)
+        await bump_policy_version()
 
         logger.success(f"Роль {role_id} успешно удалена")
         return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,6 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from tiacore_lib.pydantic_models.user_company_relation_models import (
     UserCompanyRelationCreateSchema,
     UserCompanyRelationEditSchema,
@@ -12,11 +12,14 @@ from tiacore_lib.pydantic_models.user_company_relation_models import (
 from tiacore_lib.rabbit.models import EventType
 from tiacore_lib.utils.validate_helpers import validate_exists
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
 from app.database.models import Application, Company, Role, User, UserCompanyRelation
 from app.dependencies.permissions import with_permission_and_user_company_check
+from app.handlers.cache_handler import get_permissions_version
 from app.handlers.depends import require_permission_in_context
-from app.utils.event_builder import build_user_event
+from app.utils.outbox import enqueue_user_event
+from app.utils.permissions_cache import update_snapshot_after_relation_change
 
 relation_router = APIRouter()
 
@@ -28,7 +31,6 @@ relation_router = APIRouter()
     status_code=status.HTTP_201_CREATED,
 )
 async def add_user_company_relation(
-    request: Request,
     data: UserCompanyRelationCreateSchema,
     context: dict = Depends(require_permission_in_context("add_user_company_relation")),
 ):
@@ -44,9 +46,11 @@ async def add_user_company_relation(
         if not is_related:
             raise HTTPException(status_code=403, detail="Вы не имеете доступа к этой компании")
 
-    relation = await UserCompanyRelation.create(**data.model_dump())
-    event = await build_user_event(user, event_type=EventType.USER_UPDATED)
-    await request.app.state.publisher.publish_event(event)
+    version = await get_permissions_version(user.id)
+    async with in_transaction():
+        relation = await UserCompanyRelation.create(**data.model_dump())
+        await enqueue_user_event(EventType.USER_UPDATED, user_id=user.id)
+    await update_snapshot_after_relation_change(user.id, [data.company_id], version)
 
     return {"user_company_id": str(relation.id)}
 
@@ -57,12 +61,11 @@ async def add_user_company_relation(
     summary="Изменить связь пользователя с компанией",
 )
 async def update_user_company_relation(
-    request: Request,
     user_company_id: UUID,
     data: UserCompanyRelationEditSchema,
     _=with_permission_and_user_company_check("edit_user_company_relation"),
 ):
-    relation = await UserCompanyRelation.filter(id=user_company_id).prefetch_related("user").first()
+    relation = await UserCompanyRelation.filter(id=user_company_id).first()
     if not relation:
         raise HTTPException(status_code=404, detail="Связь не найдена")
 
@@ -78,10 +81,20 @@ async def update_user_company_relation(
     if "application_id" in update_data:
         await validate_exists(Application, update_data.get("application_id"), "Приложение")
 
-    await relation.update_from_dict(update_data)
-    await relation.save()
-    event = await build_user_event(relation.user, event_type=EventType.USER_UPDATED)
-    await request.app.state.publisher.publish_event(event)
+    previous = (str(relation.user_id), str(relation.company_id))  # type: ignore
+    new_user_id = str(update_data.get("user_id", previous[0]))
+    versions = {user_id: await get_permissions_version(user_id) for user_id in {previous[0], new_user_id}}
+    # Затронуты старая и новая компания; если связь сменила пользователя — у каждого своя
+    changed: dict[str, set[str]] = {}
+    async with in_transaction():
+        await relation.update_from_dict(update_data)
+        await relation.save()
+        for user_id, company_id in (previous, (str(relation.user_id), str(relation.company_id))):  # type: ignore
+            changed.setdefault(user_id, set()).add(company_id)
+        for user_id in changed:
+            await enqueue_user_event(EventType.USER_UPDATED, user_id=user_id)
+    for user_id, company_ids in changed.items():
+        await update_snapshot_after_relation_change(user_id, company_ids, versions[user_id])
     return {"user_company_id": str(relation.id)}
 
 
@@ -91,16 +104,17 @@ async def update_user_company_relation(
     status_code=status.HTTP_204_NO_CONTENT,
 )
 async def delete_user_company_relation(
-    request: Request,
     user_company_id: UUID,
     _=with_permission_and_user_company_check("delete_user_company_relation"),
 ):
-    relation = await UserCompanyRelation.filter(id=user_company_id).prefetch_related("user").first()
+    relation = await UserCompanyRelation.filter(id=user_company_id).first()
     if not relation:
         raise HTTPException(status_code=404, detail="Связь не найдена")
-    event = await build_user_event(relation.user, event_type=EventType.USER_UPDATED)
-    await request.app.state.publisher.publish_event(event)
-    await relation.delete()
+    version = await get_permissions_version(relation.user_id)  # type: ignore
+    async with in_transaction():
+        await relation.delete()
+        await enqueue_user_event(EventType.USER_UPDATED, user_id=relation.user_id)  # type: ignore
+    await update_snapshot_after_relation_change(relation.user_id, [relation.company_id], version)  # type: ignore
 
 
 @relation_router.get(
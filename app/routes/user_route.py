@@ -1,7 +1,6 @@
 from uuid import UUID
 
-import bcrypt
-from fastapi import APIRouter, Body, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Path, Request, status
 from loguru import logger
 from tiacore_lib.pydantic_models.user_models import (
     UserCreateSchema,
@@ -15,6 +14,10 @@ from tortoise.expressions import Q
 
 from app.database.models import Company, Role, User, UserCompanyRelation
 from app.handlers.auth import get_current_user, require_superadmin
+from app.handlers.cache_handler import bump_user_permissions_version
+from app.handlers.user_bulk import iter_bulk_rows, provision_users
+from app.pydantic_models.user_bulk_models import BulkUserResponse
+from app.utils.hashing import hash_password
 
 user_router = APIRouter()
 
@@ -60,6 +63,28 @@ async def add_user(data: UserCreateSchema = Body(...), _=Depends(require_superad
         raise HTTPException(status_code=400, detail="Некорректные данные") from e
 
 
+@user_router.post(
+    "/bulk",
+    response_model=BulkUserResponse,
+    summary="Массовое создание пользователей",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": {"type": "object"}}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def add_users_bulk(request: Request, _=Depends(require_superadmin)):
+    """
+    JSON-массив или NDJSON (application/x-ndjson) строк в формате /add.
+    Ответ — результат по каждой строке; созданные партии не откатываются из-за ошибок в других.
+    """
+    return await provision_users(iter_bulk_rows(request))
+
+
 @user_router.patch("/{user_id}", response_model=UserResponseSchema, summary="Изменение пользователя")
 async def edit_user(
     user_id: UUID,
@@ -71,7 +96,7 @@ async def edit_user(
     update_data = data.model_dump(exclude_unset=True)
 
     if "password" in update_data:  # Если передан пароль, хешируем его
-        update_data["password_hash"] = bcrypt.hashpw(update_data.pop("password").encode(), bcrypt.gensalt()).decode()
+        update_data["password_hash"] = await hash_password(update_data.pop("password"))
     if "is_verified" in update_data:
         if not context["is_superadmin"]:
             update_data.pop("is_verified")
@@ -83,6 +108,7 @@ async def edit_user(
         logger.warning(f"Пользователь {user_id} не найден")
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
+    await bump_user_permissions_version(user_id)
     logger.success(f"Пользователь {user_id} успешно обновлён")
     return {"user_id": str(user_id)}
 
@@ -102,6 +128,7 @@ async def delete_user(user_id: UUID, _=Depends(get_current_user)):
         if user.email == "admin":
             raise HTTPException(status_code=403, detail="вы не можете удалить администратора.")
         await user.delete()
+        await bump_user_permissions_version(user_id)
         logger.success(f"Пользователь {user_id} успешно удален")
     except (KeyError, TypeError, ValueError) as e:
         logger.warning(f"Ошибка данных: {e}")
@@ -1,10 +1,19 @@
 # app/utils/user_event_builder.py
 
+from collections import defaultdict
+from typing import Iterable
+
 from tiacore_lib.pydantic_models.auth_models import UserCompanyRelationOut
 from tiacore_lib.rabbit.models import EventType, UserData, UserEvent
 
 from app.database.models import User, UserCompanyRelation
-from app.utils.permissions_get import get_company_permissions_for_user
+from app.utils.permissions_cache import get_cached_company_permissions
+from app.utils.permissions_get import (
+    assemble_company_permissions,
+    distribute_graph_masks,
+)
+from app.utils.policy_graph import PolicyGraph, get_policy_graph
+from app.utils.policy_snapshot import MappedPolicyGraph
 
 
 async def build_user_event(user: User, event_type: EventType) -> UserEvent:
@@ -19,7 +28,7 @@ async def build_user_event(user: User, event_type: EventType) -> UserEvent:
     ]
 
     company_list = [str(r.company.id) for r in relations]
-    permissions = await get_company_permissions_for_user(user)
+    permissions = await get_cached_company_permissions(user)
 
     return UserEvent(
         event=event_type,
@@ -32,3 +41,59 @@ async def build_user_event(user: User, event_type: EventType) -> UserEvent:
             relations=relation_list,
         ),
     )
+
+
+async def build_user_events(
+    user_ids: Iterable,
+    event_type: EventType,
+    graph: PolicyGraph | MappedPolicyGraph | None = None,
+) -> list[UserEvent]:
+    """
+    То же, что build_user_event, для пачки пользователей: два запроса на всю пачку
+    (пользователи и их связи), имена ролей и права — из графа ролей процесса
+    или переданного graph. Кэш снимков не трогаем: после правки политики он всё равно устарел.
+    """
+    user_ids = list(user_ids)
+    users = await User.filter(id__in=user_ids).values_list("id", "email", "is_superadmin")
+    relation_rows = await UserCompanyRelation.filter(user_id__in=user_ids).values_list(
+        "id", "user_id", "company_id", "role_id"
+    )
+    if graph is None:
+        graph = await get_policy_graph()
+
+    relations_by_user: dict = defaultdict(list)
+    for relation_id, user_id, company_id, role_id in relation_rows:
+        relations_by_user[user_id].append((str(relation_id), str(company_id), role_id))
+
+    events = []
+    for user_id, email, is_superadmin in users:
+        relations = relations_by_user.get(user_id, [])
+        permissions = None
+        if not is_superadmin:
+            pairs = [(company_id, role_id) for _, company_id, role_id in relations]
+            bucket = distribute_graph_masks(graph, pairs)
+            permissions, _ = assemble_company_permissions(
+                bucket, graph.index, graph.role_name, graph.role_restrictions
+            )
+
+        events.append(
+            UserEvent(
+                event=event_type,
+                email=email,
+                payload=UserData(
+                    user_id=str(user_id),
+                    is_superadmin=is_superadmin,
+                    permissions=permissions,
+                    companies=[company_id for _, company_id, _ in relations],
+                    relations=[
+                        UserCompanyRelationOut(
+                            id=relation_id,
+                            company_id=company_id,
+                            role=graph.role_name.get(role_id, "Неизвестная роль"),
+                        )
+                        for relation_id, company_id, role_id in relations
+                    ],
+                ),
+            )
+        )
+    return events
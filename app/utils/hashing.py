@@ -0,0 +1,225 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Protocol
+
+import bcrypt
+from fastapi import HTTPException
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+
+hash_queue_depth = Gauge("password_hash_queue_depth", "Password hash jobs queued or running")
+hash_rejected = Counter("password_hash_rejected_total", "Password hash jobs rejected because the queue is full")
+hash_latency = Histogram(
+    "password_hash_seconds",
+    "Time spent computing bcrypt hashes in the worker pool",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5),
+)
+hash_cost = Gauge("password_hash_cost", "Work factor of the configured password hasher")
+password_rehashed = Counter("password_rehash_total", "Password hashes recomputed on login with the current work factor")
+
+BCRYPT_MIN_ROUNDS = 4
+BCRYPT_DEFAULT_ROUNDS = 12
+# Калибровка не поднимается выше: один хеш на 16 — уже секунды
+BCRYPT_MAX_ROUNDS = 16
+
+# Калибровка, принятая первым воркером; остальные берут её, а не свою
+HASH_COST_KEY = "password_hash:bcrypt_rounds"
+HASH_COST_TTL = 24 * 60 * 60
+
+
+def _hashpw(password: str, rounds: int = BCRYPT_DEFAULT_ROUNDS) -> tuple[str, float]:
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+    return hashed, time.perf_counter() - started
+
+
+def _checkpw(password: str, password_hash: str) -> tuple[bool, float]:
+    started = time.perf_counter()
+    matches = bcrypt.checkpw(password.encode(), password_hash.encode())
+    return matches, time.perf_counter() - started
+
+
+class PasswordHasher(Protocol):
+    """
+    Алгоритм хеширования паролей. hash и verify выполняются в пуле и возвращают
+    (результат, секунды); параметры алгоритма хранятся в самом хеше.
+    """
+
+    name: str
+    cost: int
+
+    def hash(self, password: str) -> tuple[str, float]: ...
+
+    def verify(self, password: str, password_hash: str) -> tuple[bool, float]: ...
+
+    def needs_rehash(self, password_hash: str) -> bool: ...
+
+
+class BcryptHasher:
+    """bcrypt с заданной стоимостью; стоимость записана в хеше ($2b$<rounds>$...)."""
+
+    name = "bcrypt"
+
+    def __init__(self, rounds: int = BCRYPT_DEFAULT_ROUNDS):
+        if not BCRYPT_MIN_ROUNDS <= rounds <= 31:
+            raise ValueError(f"Стоимость bcrypt вне диапазона {BCRYPT_MIN_ROUNDS}..31: {rounds}")
+        self.cost = rounds
+
+    def hash(self, password: str) -> tuple[str, float]:
+        return _hashpw(password, self.cost)
+
+    def verify(self, password: str, password_hash: str) -> tuple[bool, float]:
+        return _checkpw(password, password_hash)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        # Хеш другого алгоритма или с другой стоимостью (и слабее, и дороже текущей)
+        parts = password_hash.split("$")
+        if len(parts) < 4 or parts[1] not in ("2a", "2b", "2y") or not parts[2].isdigit():
+            return True
+        return int(parts[2]) != self.cost
+
+
+def calibrate_bcrypt_rounds(
+    target_ms: float,
+    min_rounds: int = 10,
+    max_rounds: int = BCRYPT_MAX_ROUNDS,
+) -> int:
+    """
+    Наибольшая стоимость bcrypt, при которой один хеш на этой машине укладывается
+    в target_ms (но не меньше min_rounds). Каждый шаг стоимости удваивает время,
+    поэтому следующий шаг пробуется, только если удвоенный замер ещё в цели.
+    """
+
+    def measure(rounds: int) -> float:
+        return min(_hashpw("calibration", rounds)[1] for _ in range(2))
+
+    rounds = min_rounds
+    elapsed = measure(rounds)
+    while rounds < max_rounds and elapsed * 2 * 1000 <= target_ms:
+        next_elapsed = measure(rounds + 1)
+        if next_elapsed * 1000 > target_ms:
+            break
+        rounds, elapsed = rounds + 1, next_elapsed
+    logger.info(f"Калибровка bcrypt: стоимость {rounds} (цель {target_ms} мс, замер {elapsed * 1000:.0f} мс)")
+    return rounds
+
+
+class HashPool:
+    """
+    Пул для bcrypt с ограниченной очередью.
+
+    bcrypt отпускает GIL, поэтому потоков достаточно; процессы доступны для
+    окружений, где этого мало. Если в работе и в очереди уже workers + queue_size
+    задач, новая получает 503 сразу, не дожидаясь своей очереди.
+    """
+
+    def __init__(self, workers: int, queue_size: int, kind: str = "thread"):
+        self.workers = workers
+        self.limit = workers + queue_size
+        self._pending = 0
+        self._executor: Executor
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, operation: str, fn: Callable, *args):
+        if self._pending >= self.limit:
+            hash_rejected.inc()
+            logger.warning(f"Очередь хеширования переполнена ({self._pending}), запрос отклонён")
+            raise HTTPException(status_code=503, detail="Сервис перегружен, повторите попытку позже")
+
+        self._pending += 1
+        hash_queue_depth.inc()
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+            hash_queue_depth.dec()
+        hash_latency.labels(operation=operation).observe(elapsed)
+        return result
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[HashPool] = None
+
+
+def configure_hash_pool(workers: int | None = None, queue_size: int = 64, kind: str = "thread") -> HashPool:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = HashPool(workers or min(4, os.cpu_count() or 1), queue_size, kind)
+    return _pool
+
+
+def get_hash_pool() -> HashPool:
+    return _pool or configure_hash_pool()
+
+
+_hasher: PasswordHasher = BcryptHasher()
+hash_cost.set(_hasher.cost)
+
+
+def configure_password_hasher(hasher: PasswordHasher) -> PasswordHasher:
+    global _hasher
+    _hasher = hasher
+    hash_cost.set(hasher.cost)
+    logger.info(f"Хеширование паролей: {hasher.name}, стоимость {hasher.cost}")
+    return hasher
+
+
+def get_password_hasher() -> PasswordHasher:
+    return _hasher
+
+
+async def configure_calibrated_hasher(target_ms: float, redis=None) -> PasswordHasher:
+    """
+    bcrypt со стоимостью под target_ms. С redis калибровку публикует первый воркер,
+    остальные берут её: иначе воркеры с разными замерами перехешировали бы пароли
+    друг за другом на каждом логине.
+    """
+    stored = await redis.get(HASH_COST_KEY) if redis is not None else None
+    if stored is not None:
+        return configure_password_hasher(BcryptHasher(int(stored)))
+
+    rounds = await asyncio.get_running_loop().run_in_executor(None, calibrate_bcrypt_rounds, target_ms)
+    if redis is not None:
+        await redis.set(HASH_COST_KEY, rounds, ex=HASH_COST_TTL, nx=True)
+        rounds = int(await redis.get(HASH_COST_KEY) or rounds)
+    return configure_password_hasher(BcryptHasher(rounds))
+
+
+async def hash_password(password: str) -> str:
+    return await get_hash_pool().run("hash", _hasher.hash, password)
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    return await get_hash_pool().run("verify", _hasher.verify, password, password_hash)
+
+
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Пакет паролей (массовое создание пользователей): одновременно не больше
+    хешей, чем воркеров пула, — очередь остаётся свободной для логинов.
+    """
+    pool = get_hash_pool()
+    slots = asyncio.Semaphore(pool.workers)
+
+    async def one(password: str) -> str:
+        async with slots:
+            return await pool.run("hash", _hasher.hash, password)
+
+    return list(await asyncio.gather(*(one(password) for password in passwords)))
+
+
+def needs_rehash(password_hash: str) -> bool:
+    return _hasher.needs_rehash(password_hash)
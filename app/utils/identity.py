@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Hashable, Mapping, Optional
+
+_NO_RESTRICTIONS: Mapping[str, frozenset[str]] = MappingProxyType({})
+
+
+@dataclass(frozen=True, slots=True)
+class PermissionBlock:
+    """Права одной роли в компании; замена RolePermissionBlock без валидации на каждый запрос."""
+
+    role: str
+    permissions: frozenset[str]
+    # permission_id -> id запретов, с которыми роль выдаёт право
+    restrictions: Mapping[str, frozenset[str]] = field(default_factory=lambda: _NO_RESTRICTIONS)
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyPermissions:
+    """
+    Все роли пользователя в одной компании приложения. restrictions — запреты на право,
+    действующие, только если ВСЕ роли, выдающие это право, выдают его с запретом.
+    """
+
+    blocks: tuple[PermissionBlock, ...]
+    permissions: frozenset[str]
+    mask: Optional[int]
+    restrictions: Mapping[str, frozenset[str]] = field(default_factory=lambda: _NO_RESTRICTIONS)
+
+
+NO_PERMISSIONS = CompanyPermissions((), frozenset(), 0)
+
+
+def _merge_restrictions(blocks: tuple[PermissionBlock, ...]) -> Mapping[str, frozenset[str]]:
+    merged: dict[str, set[str]] = {}
+    unrestricted: set[str] = set()
+    for block in blocks:
+        for permission_id in block.permissions:
+            ids = block.restrictions.get(permission_id)
+            if ids:
+                merged.setdefault(permission_id, set()).update(ids)
+            else:
+                unrestricted.add(permission_id)
+    return MappingProxyType(
+        {permission_id: frozenset(ids) for permission_id, ids in merged.items() if permission_id not in unrestricted}
+    )
+
+# app_id -> company_id -> CompanyPermissions
+ParsedPermissions = Mapping[str, Mapping[str, CompanyPermissions]]
+
+EMPTY_PERMISSIONS: ParsedPermissions = MappingProxyType({})
+
+
+def parse_permissions(permissions_map: Optional[dict], masks: Optional[dict] = None) -> ParsedPermissions:
+    """Снимок прав (JSON из кэша или токена) → неизменяемая структура с множествами."""
+    if not permissions_map:
+        return EMPTY_PERMISSIONS
+
+    parsed = {}
+    for app_id, companies in permissions_map.items():
+        app_masks = (masks or {}).get(app_id, {})
+        by_company = {}
+        for company_id, entries in companies.items():
+            blocks = tuple(
+                PermissionBlock(
+                    entry["role"],
+                    frozenset(entry["permissions"]),
+                    MappingProxyType({pid: frozenset(ids) for pid, ids in entry.get("restrictions", {}).items()}),
+                )
+                for entry in entries
+            )
+            by_company[company_id] = CompanyPermissions(
+                blocks=blocks,
+                permissions=frozenset().union(*(block.permissions for block in blocks)),
+                mask=app_masks.get(company_id) if masks is not None else None,
+                restrictions=_merge_restrictions(blocks),
+            )
+        parsed[app_id] = MappingProxyType(by_company)
+    return MappingProxyType(parsed)
+
+
+_PARSED_CACHE_SIZE = 2048
+_parsed: OrderedDict[Hashable, ParsedPermissions] = OrderedDict()
+
+
+def get_parsed_permissions(
+    key: Hashable,
+    permissions_map: Optional[dict],
+    masks: Optional[dict] = None,
+) -> ParsedPermissions:
+    """
+    parse_permissions с памятью на (user_id, версия прав): пока версия не сменилась,
+    запросы пользователя получают один и тот же разобранный объект.
+    """
+    parsed = _parsed.get(key)
+    if parsed is None:
+        parsed = _parsed[key] = parse_permissions(permissions_map, masks)
+        if len(_parsed) > _PARSED_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    else:
+        _parsed.move_to_end(key)
+    return parsed
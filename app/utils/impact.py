@@ -0,0 +1,61 @@
+from typing import Iterable
+from uuid import UUID
+
+from loguru import logger
+from prometheus_client import Counter
+from tiacore_lib.rabbit.models import EventType
+
+from app.database.models import RoleClosure, UserCompanyRelation
+from app.utils.outbox import enqueue_user_events
+from app.utils.policy_graph import load_policy_graph
+from app.utils.role_closure import _as_uuid
+
+# Пользователей на одну пачку: два запроса к БД и одна вставка в outbox
+USER_EVENTS_BATCH_SIZE = 500
+
+role_impact_events = Counter("role_impact_user_events_total", "USER_UPDATED events enqueued after role changes")
+
+
+async def find_affected_users(role_ids: Iterable) -> list[UUID]:
+    """
+    Пользователи, чьи эффективные права зависят от ролей role_ids: у них связь
+    с самой ролью или с любой ролью, которая её включает (обратное замыкание).
+
+    Для удаляемой роли вызывать ДО удаления — вместе с ней уходят её строки role_closure.
+    """
+    targets = {_as_uuid(role_id) for role_id in role_ids if role_id}
+    if not targets:
+        return []
+    ancestors = await RoleClosure.filter(descendant_id__in=list(targets)).values_list("ancestor_id", flat=True)
+    targets.update(ancestors)
+    user_ids = (
+        await UserCompanyRelation.filter(role_id__in=list(targets)).distinct().values_list("user_id", flat=True)
+    )
+    return [_as_uuid(user_id) for user_id in user_ids]
+
+
+async def enqueue_role_impact(
+    role_ids: Iterable = (), user_ids: Iterable = (), batch_size: int = USER_EVENTS_BATCH_SIZE
+) -> int:
+    """
+    USER_UPDATED в outbox каждому пользователю, затронутому правкой ролей: затронутые
+    роли раскрываются в пользователей, к ним добавляются user_ids, найденные заранее.
+
+    Вызывать в транзакции правки, после неё: события уйдут, только если правка
+    зафиксирована. Граф ролей процесса ещё старой версии, поэтому тела собираются
+    по графу, загруженному в этой же транзакции.
+    """
+    affected = set(user_ids)
+    affected.update(await find_affected_users(role_ids))
+    if not affected:
+        return 0
+    graph = await load_policy_graph("pending")
+    affected_ids = list(affected)
+    enqueued = 0
+    for start in range(0, len(affected_ids), batch_size):
+        enqueued += await enqueue_user_events(
+            EventType.USER_UPDATED, affected_ids[start : start + batch_size], graph=graph
+        )
+    role_impact_events.inc(enqueued)
+    logger.info(f"Правка ролей затронула {enqueued} пользователей, события USER_UPDATED поставлены в outbox")
+    return enqueued
@@ -0,0 +1,67 @@
+from pathlib import Path
+from typing import Optional
+
+from jose import jwk
+from loguru import logger
+
+ASYMMETRIC_ALGORITHM = "RS256"
+
+
+class KeyRing:
+    """
+    Ключи подписи из JWT_KEYS_DIR: каждый файл <kid>.pem — приватный RSA-ключ.
+
+    Подписывает активный ключ (JWT_SIGNING_KID или последний по имени файла),
+    проверяются и публикуются в JWKS все ключи каталога. Ротация с перекрытием:
+    положить новый ключ → перезагрузить (SIGHUP), чтобы он попал в JWKS →
+    сделать его активным → удалить старый, когда истекут выданные им токены.
+    """
+
+    __slots__ = ("signing_kid", "_private", "_public", "jwks")
+
+    def __init__(self, private_pems: dict[str, str], signing_kid: Optional[str] = None):
+        if not private_pems:
+            raise ValueError("В каталоге ключей нет ни одного <kid>.pem")
+        self.signing_kid = signing_kid or max(private_pems)
+        if self.signing_kid not in private_pems:
+            raise ValueError(f"Ключ подписи {self.signing_kid} не найден")
+
+        self._private = private_pems
+        self._public: dict[str, dict] = {}
+        for kid, pem in private_pems.items():
+            public = jwk.construct(pem, ASYMMETRIC_ALGORITHM).public_key().to_dict()
+            self._public[kid] = {**public, "kid": kid, "use": "sig"}
+        self.jwks = {"keys": [self._public[kid] for kid in sorted(self._public)]}
+
+    @classmethod
+    def from_dir(cls, keys_dir: str, signing_kid: Optional[str] = None) -> "KeyRing":
+        pems = {path.stem: path.read_text() for path in sorted(Path(keys_dir).glob("*.pem"))}
+        keyring = cls(pems, signing_kid)
+        logger.info(f"🔑 Загружены ключи JWT: {sorted(pems)}, подпись: {keyring.signing_kid}")
+        return keyring
+
+    @property
+    def signing_key(self) -> str:
+        return self._private[self.signing_kid]
+
+    def public_key(self, kid: Optional[str]) -> Optional[dict]:
+        return self._public.get(kid) if kid else None
+
+
+_keyrings: dict[tuple[str, Optional[str]], KeyRing] = {}
+
+
+def get_keyring(settings) -> Optional[KeyRing]:
+    """Кольцо ключей для настроек; None — асимметричная подпись выключена (HS256)."""
+    keys_dir = getattr(settings, "JWT_KEYS_DIR", None)
+    if not keys_dir:
+        return None
+    cache_key = (keys_dir, getattr(settings, "JWT_SIGNING_KID", None))
+    keyring = _keyrings.get(cache_key)
+    if keyring is None:
+        keyring = _keyrings[cache_key] = KeyRing.from_dir(*cache_key)
+    return keyring
+
+
+def reset_keyrings() -> None:
+    _keyrings.clear()
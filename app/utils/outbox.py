@@ -0,0 +1,145 @@
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from loguru import logger
+from prometheus_client import Counter
+from tiacore_lib.rabbit.models import EventType, UserEvent
+from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
+
+from app.database.models import OutboxEvent
+from app.utils.event_builder import build_user_events
+
+OUTBOX_BATCH_SIZE = 200
+# Новые записи будят диспетчер сразу; интервал — страховка для записей других воркеров
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_PUBLISH_TIMEOUT = 10.0
+# Взятая партия недоступна другим диспетчерам до конца аренды; упавший воркер её не теряет
+OUTBOX_LEASE = timedelta(seconds=60)
+OUTBOX_MAX_BACKOFF = 300
+
+outbox_published = Counter("outbox_events_published_total", "Outbox events confirmed by the broker")
+outbox_failures = Counter("outbox_publish_failures_total", "Outbox events whose publish failed and was deferred")
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+async def enqueue_user_event(event_type: EventType, *, user_id=None, email: Optional[str] = None) -> None:
+    """
+    Ставит событие в outbox. Вызывать в транзакции правки: событие уйдёт, только
+    если правка зафиксирована. С user_id тело события (email, права, связи)
+    собирается здесь же, по состоянию на момент правки; без него — только email
+    (как USER_LOGGED_OUT).
+    """
+    if user_id is None:
+        await _store([UserEvent(event=event_type, email=email)], [None])
+    else:
+        await enqueue_user_events(event_type, [user_id])
+
+
+async def enqueue_user_events(event_type: EventType, user_ids: Iterable, graph=None) -> int:
+    """
+    enqueue_user_event для пачки пользователей: тела собираются двумя запросами на пачку.
+    graph — граф ролей вместо графа процесса (см. build_user_events).
+    """
+    events = await build_user_events(user_ids, event_type, graph)
+    await _store(events, [event.payload.user_id for event in events])
+    return len(events)
+
+
+async def _store(events: list[UserEvent], user_ids: list) -> None:
+    if not events:
+        return
+    await OutboxEvent.bulk_create(
+        [
+            OutboxEvent(event_type=EventType(event.event).value, user_id=user_id, payload=event.model_dump(mode="json"))
+            for event, user_id in zip(events, user_ids)
+        ]
+    )
+    if _wakeup is not None:
+        _wakeup.set()
+
+
+async def _claim(batch_size: int, now: datetime) -> list[OutboxEvent]:
+    """
+    Берёт партию в аренду короткой транзакцией: строки блокируются FOR UPDATE SKIP LOCKED
+    (диспетчеры разных воркеров не берут одни и те же), available_at сдвигается на OUTBOX_LEASE.
+    """
+    async with in_transaction():
+        rows = (
+            await OutboxEvent.filter(Q(available_at__isnull=True) | Q(available_at__lte=now))
+            .order_by("id")
+            .limit(batch_size)
+            .select_for_update(skip_locked=True)
+        )
+        if rows:
+            await OutboxEvent.filter(id__in=[row.id for row in rows]).update(available_at=now + OUTBOX_LEASE)
+    return rows
+
+
+async def dispatch_outbox_batch(publisher, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """
+    Одна партия outbox, одно сообщение на строку. Публикация идёт вне транзакции:
+    соединение с БД не ждёт брокер. Подтверждённые брокером строки удаляются,
+    неудачные откладываются с экспоненциальной задержкой. Возвращает число строк.
+    """
+    now = datetime.now(timezone.utc)
+    rows = await _claim(batch_size, now)
+    if not rows:
+        return 0
+
+    results = await asyncio.gather(
+        *(
+            asyncio.wait_for(publisher.publish_event(UserEvent.model_validate(row.payload)), OUTBOX_PUBLISH_TIMEOUT)
+            for row in rows
+        ),
+        return_exceptions=True,
+    )
+    done = [row.id for row, result in zip(rows, results) if not isinstance(result, BaseException)]
+    retry: dict[int, list] = defaultdict(list)
+    errors: dict[int, str] = {}
+    for row, result in zip(rows, results):
+        if isinstance(result, BaseException):
+            retry[row.attempts].append(row.id)
+            errors[row.attempts] = repr(result)[:1000]
+
+    now = datetime.now(timezone.utc)
+    async with in_transaction():
+        if done:
+            await OutboxEvent.filter(id__in=done).delete()
+        for attempts, ids in retry.items():
+            await OutboxEvent.filter(id__in=ids).update(
+                attempts=attempts + 1,
+                available_at=now + timedelta(seconds=min(2**attempts, OUTBOX_MAX_BACKOFF)),
+                last_error=errors[attempts],
+            )
+
+    outbox_published.inc(len(done))
+    failed = len(rows) - len(done)
+    if failed:
+        outbox_failures.inc(failed)
+        logger.warning(f"Outbox: {failed} событий не отправлено, повтор позже: {next(iter(errors.values()))}")
+    return len(rows)
+
+
+async def run_outbox_dispatcher(publisher, poll_interval: float = OUTBOX_POLL_INTERVAL) -> None:
+    """Фоновая задача воркера: отправляет outbox партиями, пока есть готовые строки, затем ждёт."""
+    global _wakeup
+    _wakeup = wakeup = asyncio.Event()
+    while True:
+        wakeup.clear()
+        try:
+            processed = await dispatch_outbox_batch(publisher)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Отправка outbox прервана: {e}, повтор через {poll_interval} с")
+            processed = 0
+        if processed >= OUTBOX_BATCH_SIZE:
+            continue
+        try:
+            await asyncio.wait_for(wakeup.wait(), poll_interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,122 @@
+from collections import defaultdict
+from typing import Iterable, Optional, Tuple
+from uuid import UUID
+
+from app.database.models import Permission, RolePermissionRelation
+
+
+class PermissionIndex:
+    """
+    Соответствие permission_id ↔ номер бита (Permission.bit_index).
+
+    Индексы назначаются один раз при создании разрешения и не переиспользуются,
+    поэтому маски, посчитанные разными воркерами, совместимы.
+    """
+
+    __slots__ = ("_bits", "_ids", "_decoded")
+
+    def __init__(self, bits: dict[str, int]):
+        self._bits = bits
+        self._ids: dict[int, str] = {bit: permission_id for permission_id, bit in bits.items()}
+        self._decoded: dict[int, tuple[str, ...]] = {}
+
+    def __contains__(self, permission_id: str) -> bool:
+        return permission_id in self._bits
+
+    def items(self) -> Iterable[Tuple[str, int]]:
+        return self._bits.items()
+
+    def bit(self, permission_id: str) -> Optional[int]:
+        return self._bits.get(permission_id)
+
+    def mask_of(self, permission_ids: Iterable[str]) -> int:
+        mask = 0
+        for permission_id in permission_ids:
+            bit = self._bits.get(permission_id)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def decode(self, mask: int) -> list[str]:
+        """Маска → отсортированный список permission_id. Результат мемоизируется."""
+        decoded = self._decoded.get(mask)
+        if decoded is None:
+            ids = []
+            rest = mask
+            while rest:
+                lowest = rest & -rest
+                permission_id = self._ids.get(lowest.bit_length() - 1)
+                if permission_id is not None:
+                    ids.append(permission_id)
+                rest ^= lowest
+            decoded = self._decoded[mask] = tuple(sorted(ids))
+        return list(decoded)
+
+
+_index: Optional[PermissionIndex] = None
+
+
+async def get_permission_index(required: Iterable[str] = ()) -> PermissionIndex:
+    """Индекс текущего процесса; перечитывается, если в нём нет нужного разрешения."""
+    global _index
+    if _index is None or any(permission_id not in _index for permission_id in required):
+        rows = await Permission.filter(bit_index__isnull=False).values_list("id", "bit_index")
+        _index = PermissionIndex({str(permission_id): bit for permission_id, bit in rows})
+    return _index
+
+
+def reset_permission_index() -> None:
+    global _index
+    _index = None
+
+
+# role_id -> permission_id -> id запретов, с которыми роль выдаёт это право
+RoleRestrictions = dict[UUID, dict[str, tuple[str, ...]]]
+
+
+def fold_restrictions(rows: Iterable[Tuple[UUID, str, Optional[str]]]) -> RoleRestrictions:
+    """
+    Строки (role_id, permission_id, restriction_id) → запреты по ролям.
+
+    Право, выданное ролью хотя бы одной связью без запрета, считается выданным
+    без ограничений: запреты других связей того же права не действуют.
+    """
+    restricted: dict[Tuple[UUID, str], set[str]] = defaultdict(set)
+    unrestricted: set[Tuple[UUID, str]] = set()
+    for role_id, permission_id, restriction_id in rows:
+        if restriction_id is None:
+            unrestricted.add((role_id, str(permission_id)))
+        else:
+            restricted[(role_id, str(permission_id))].add(str(restriction_id))
+
+    restrictions: RoleRestrictions = defaultdict(dict)
+    for (role_id, permission_id), ids in restricted.items():
+        if (role_id, permission_id) not in unrestricted:
+            restrictions[role_id][permission_id] = tuple(sorted(ids))
+    return dict(restrictions)
+
+
+async def compile_role_policy(
+    role_ids: Optional[Iterable[UUID]] = None,
+) -> Tuple[PermissionIndex, dict[UUID, int], RoleRestrictions]:
+    """
+    Собственные (без учёта включений) права каждой роли битовой маской и запреты
+    из RolePermissionRelation.restriction (см. fold_restrictions) — одним запросом;
+    None — все роли.
+    """
+    query = RolePermissionRelation.all() if role_ids is None else RolePermissionRelation.filter(role_id__in=list(role_ids))
+    rows = await query.values_list("role_id", "permission_id", "restriction_id")
+    index = await get_permission_index({str(permission_id) for _, permission_id, _ in rows})
+
+    masks: dict[UUID, int] = defaultdict(int)
+    for role_id, permission_id, _ in rows:
+        bit = index.bit(str(permission_id))
+        if bit is not None:
+            masks[role_id] |= 1 << bit
+    return index, masks, fold_restrictions(rows)
+
+
+async def compile_role_masks(role_ids: Optional[Iterable[UUID]] = None) -> Tuple[PermissionIndex, dict[UUID, int]]:
+    """Собственные (без учёта включений) права каждой роли в виде битовой маски; None — все роли."""
+    index, masks, _ = await compile_role_policy(role_ids)
+    return index, masks
@@ -0,0 +1,133 @@
+import json
+from typing import Iterable
+
+from fastapi_cache import FastAPICache
+from prometheus_client import Counter
+
+from app.database.models import User, UserCompanyRelation
+from app.handlers.cache_handler import (
+    advance_user_permissions_version,
+    get_permissions_version,
+)
+from app.utils.permissions_get import (
+    assemble_company_permissions,
+    distribute_graph_masks,
+    get_company_permissions_with_masks,
+)
+from app.utils.policy_graph import policy_graph_in_use
+from app.utils.single_flight import SingleFlight
+
+# Снимок всё равно сверяется с версией, TTL лишь подчищает неактивных пользователей
+PERMISSIONS_CACHE_TTL = 60 * 60
+
+permissions_cache_hits = Counter("permissions_cache_hits_total", "Permission snapshot cache hits")
+permissions_cache_misses = Counter("permissions_cache_misses_total", "Permission snapshot cache misses")
+permission_snapshot_updates = Counter(
+    "permission_snapshot_updates_total",
+    "Snapshot updates after user-company relation changes",
+    ["mode"],
+)
+
+
+_snapshot_flight = SingleFlight("permission_snapshot")
+
+
+def _snapshot_key(user_id) -> str:
+    return f"permissions:v2:{user_id}"
+
+
+async def get_cached_permission_snapshot(user: User) -> dict | None:
+    """
+    Снимок {"permissions", "masks", "has_relations"} из get_company_permissions_with_masks через кэш в Redis.
+
+    Снимок хранится по user_id вместе с версией прав; при несовпадении версии
+    (правка связей пользователя или политики ролей) он пересчитывается.
+    """
+    if user.is_superadmin:
+        return None
+
+    # Версию читаем до расчёта: правка во время расчёта сделает снимок устаревшим
+    version = await get_permissions_version(user.id)
+    # Параллельные запросы одного пользователя ждут одного чтения/расчёта
+    return await _snapshot_flight.do((str(user.id), version), lambda: _load_snapshot(user, version))
+
+
+async def _load_snapshot(user: User, version: str) -> dict:
+    backend = FastAPICache.get_backend()
+    key = _snapshot_key(user.id)
+
+    raw = await backend.get(key)
+    if raw is not None:
+        snapshot = json.loads(raw)
+        if snapshot.get("version") == version:
+            permissions_cache_hits.inc()
+            return snapshot
+
+    permissions_cache_misses.inc()
+    permissions, masks = await get_company_permissions_with_masks(user)
+    snapshot = {
+        "version": version,
+        "permissions": permissions,
+        "masks": masks,
+        "has_relations": await UserCompanyRelation.exists(user_id=user.id),
+    }
+    await backend.set(key, json.dumps(snapshot).encode("utf-8"), expire=PERMISSIONS_CACHE_TTL)
+    return snapshot
+
+
+async def update_snapshot_after_relation_change(user_id, company_ids: Iterable, expected_version: str) -> bool:
+    """
+    Вызывается после правки связей пользователя с компаниями company_ids; expected_version —
+    версия прав, прочитанная ДО правки. Версия пользователя меняется в любом случае.
+
+    Если в кэше лежит снимок версии expected_version, пересчитываются только затронутые
+    компании: их связи — одним запросом, вклад замыкания ролей — из графа процесса.
+    Снимок сохраняется под новой версией, и следующее чтение (событие, /me) попадает в кэш.
+    Иначе (снимка нет, его успела сменить другая правка, сменилась политика) снимок
+    просто устаревает и пересчитывается целиком при чтении. Возвращает True, если дельта применена.
+    """
+    new_version = await advance_user_permissions_version(user_id, expected_version)
+    backend = FastAPICache.get_backend()
+    key = _snapshot_key(user_id)
+    raw = await backend.get(key) if new_version else None
+    snapshot = json.loads(raw) if raw is not None else None
+    if not snapshot or snapshot.get("version") != expected_version:
+        permission_snapshot_updates.labels(mode="rebuild").inc()
+        return False
+
+    # Граф держится через запрос связей: снимок политики не закроется под нами
+    async with policy_graph_in_use() as graph:
+        if new_version.split(".", 1)[0] != graph.version:  # type: ignore[union-attr]
+            permission_snapshot_updates.labels(mode="rebuild").inc()
+            return False
+
+        company_ids = {str(company_id) for company_id in company_ids}
+        rows = await UserCompanyRelation.filter(user_id=user_id, company_id__in=list(company_ids)).values_list(
+            "company_id", "role_id"
+        )
+        bucket = distribute_graph_masks(graph, [(str(company_id), role_id) for company_id, role_id in rows])
+        permissions, masks = assemble_company_permissions(
+            bucket, graph.index, graph.role_name, graph.role_restrictions
+        )
+
+    # Компании заменяются целиком во всех приложениях: роль компании может давать права в чужом app
+    for section, fresh in ((snapshot["permissions"], permissions), (snapshot["masks"], masks)):
+        for app_id in list(section):
+            for company_id in company_ids:
+                section[app_id].pop(company_id, None)
+            if not section[app_id]:
+                del section[app_id]
+        for app_id, companies in fresh.items():
+            section.setdefault(app_id, {}).update(companies)
+
+    snapshot["version"] = new_version
+    snapshot["has_relations"] = bool(rows) or await UserCompanyRelation.exists(user_id=user_id)
+    await backend.set(key, json.dumps(snapshot).encode("utf-8"), expire=PERMISSIONS_CACHE_TTL)
+    permission_snapshot_updates.labels(mode="delta").inc()
+    return True
+
+
+async def get_cached_company_permissions(user: User) -> dict | None:
+    """То же, что get_company_permissions_for_user, но через кэш в Redis."""
+    snapshot = await get_cached_permission_snapshot(user)
+    return None if snapshot is None else snapshot["permissions"]
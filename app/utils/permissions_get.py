@@ -1,132 +1,234 @@
 from collections import defaultdict
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, List, Mapping, Set, Tuple
 from uuid import UUID
 
+from tortoise import connections
+
 from app.database.models import (
     Role,
-    RoleIncludeRelation,
-    RolePermissionRelation,
     User,
     UserCompanyRelation,
 )
+from app.utils.permission_bits import (
+    PermissionIndex,
+    compile_role_policy,
+    fold_restrictions,
+    get_permission_index,
+)
+from app.utils.policy_graph import get_policy_graph
+from app.utils.role_closure import _as_uuid, load_role_closure
 
-# --- helpers ---
-
-
-async def _reachable_roles_and_adj(start_roles: Set[UUID]) -> Tuple[Set[UUID], dict[UUID, Set[UUID]]]:
-    """BFS по графу включений для всех стартовых ролей сразу."""
-    visited: Set[UUID] = set(start_roles)
-    frontier: Set[UUID] = set(start_roles)
-    adj: dict[UUID, Set[UUID]] = defaultdict(set)
-    while frontier:
-        rows = await RoleIncludeRelation.filter(parent_role_id__in=frontier).values_list(
-            "parent_role_id", "child_role_id"
-        )
-        frontier = set()
-        for parent_id, child_id in rows:
-            adj[parent_id].add(child_id)
-            if child_id not in visited:
-                visited.add(child_id)
-                frontier.add(child_id)
-    return visited, adj
-
-
-def _closure_for_role(root: UUID, adj: dict[UUID, Set[UUID]]) -> Set[UUID]:
-    """Все роли, достижимые из root (включая root)."""
-    stack = [root]
-    seen: Set[UUID] = {root}
-    while stack:
-        cur = stack.pop()
-        for ch in adj.get(cur, ()):
-            if ch not in seen:
-                seen.add(ch)
-                stack.append(ch)
-    return seen
+# --- основное распределение ---
 
+# (app_id, company_id, role_id) -> битовая маска прав роли в этой компании
+Bucket = Dict[Tuple[str, str, UUID], int]
 
-# --- основное распределение ---
+# Bucket, индекс разрешений, имена ролей и их запреты: role_id -> permission_id -> id запретов
+Resolution = Tuple[Bucket, PermissionIndex | None, Mapping[UUID, str], Mapping[UUID, Mapping[str, tuple]]]
 
 
-async def get_company_permissions_for_user(
-    user: User,
-) -> Dict[str, Dict[str, List[dict]]] | None:
+def distribute_role_masks(
+    relations: Iterable[Tuple[str, UUID]],
+    closure_map: dict[UUID, Set[UUID]],
+    role_app_map: dict[UUID, str],
+    role_masks: dict[UUID, int],
+    application_id: str | None = None,
+) -> Bucket:
     """
-    Результат: app_id -> company_id -> [ { role: <role_name>, permissions: [perm_id, ...] }, ... ]
-
-    КАЖДАЯ роль из closure распределяется в СВОЙ app (cross-app).
+    relations — пары (company_id, base_role_id). Каждая роль из closure базовой роли
+    попадает в СВОЙ app; права одной роли в компании объединяются побитовым OR.
+    application_id — оставить только роли этого приложения.
     """
-    if user.is_superadmin:
-        return None
+    bucket: Bucket = defaultdict(int)
+    for company_id, base_rid in relations:
+        for rid in closure_map[base_rid]:
+            target_app_id = role_app_map.get(rid)
+            if not target_app_id or (application_id and target_app_id != application_id):
+                continue
+            mask = role_masks.get(rid)
+            if not mask:
+                continue
+            bucket[(target_app_id, company_id, rid)] |= mask
+    return bucket
 
-    relations = await UserCompanyRelation.filter(user=user).select_related("company", "role", "application")
-    if not relations:
-        return {}
 
-    # 1) Базовые роли и сопутствующие мапы
-    base_role_ids: Set[UUID] = {rel.role.id for rel in relations}
+async def _resolve_buckets_orm(user: User, application_id: str | None = None) -> Resolution:
+    """Запросами Tortoise: связи → замыкание → метаданные ролей → права (SQLite, тесты)."""
+    relations = await UserCompanyRelation.filter(user=user).values_list("company_id", "role_id")
+    if not relations:
+        return {}, None, {}, {}
 
-    # 2) Closure по всем базовым ролям сразу (один раз строим граф)
-    all_roles_needed, adj = await _reachable_roles_and_adj(base_role_ids)
+    relation_pairs = [(str(company_id), role_id) for company_id, role_id in relations]
 
-    # Замыкание для каждой базовой роли
-    closure_map: dict[UUID, Set[UUID]] = {rid: _closure_for_role(rid, adj) for rid in base_role_ids}
+    # 1) Замыкание для каждой базовой роли — один запрос к role_closure
+    closure_map = await load_role_closure({role_id for _, role_id in relation_pairs})
+    all_roles_needed: Set[UUID] = set().union(*closure_map.values())
 
-    # 3) Метаданные ролей: app и имя
-    role_meta_rows = await Role.filter(id__in=all_roles_needed).values_list("id", "application_id", "name")
+    # 2) Метаданные ролей: app и имя; при выборке по приложению — только его роли
+    role_query = Role.filter(id__in=all_roles_needed)
+    if application_id:
+        role_query = role_query.filter(application_id=application_id)
+    role_meta_rows = await role_query.values_list("id", "application_id", "name")
     role_app_map: dict[UUID, str] = {}
     role_name_map: dict[UUID, str] = {}
     for rid, app_id, name in role_meta_rows:
         role_app_map[rid] = str(app_id)
         role_name_map[rid] = name
 
-    # 4) Права ролей (только нужные поля)
-    rp_rows = await RolePermissionRelation.filter(role_id__in=all_roles_needed).values_list("role_id", "permission_id")
-    role_perm_map: dict[UUID, List[str]] = defaultdict(list)
-    for role_id, perm_id in rp_rows:
-        role_perm_map[role_id].append(str(perm_id))  # строковые id, как нужно
+    # 3) Права ролей — сразу битовыми масками (и запреты), только для ролей, прошедших фильтр
+    index, role_masks, role_restrictions = await compile_role_policy(role_app_map)
+
+    # 4) Union по ключу (target_app_id, company_id, target_role_id)
+    bucket = distribute_role_masks(relation_pairs, closure_map, role_app_map, role_masks)
+    return bucket, index, role_name_map, role_restrictions
+
+
+# Связи пользователя, их замыкание по role_closure, метаданные ролей и права — одним запросом
+_PERMISSION_ROWS_SQL = """
+    WITH "base" AS (
+        SELECT "company_id", "role_id" FROM "user_to_company_relations" WHERE "user_id" = {param}
+    ), "expanded" AS (
+        SELECT "company_id", "role_id" FROM "base"
+        UNION
+        SELECT "b"."company_id", "c"."descendant_id"
+        FROM "base" "b"
+        JOIN "role_closure" "c" ON "c"."ancestor_id" = "b"."role_id"
+    )
+    SELECT DISTINCT
+        "e"."company_id", "r"."id" AS "role_id", "r"."application_id", "r"."name",
+        "p"."id" AS "permission_id", "p"."bit_index", "rp"."restriction_id"
+    FROM "expanded" "e"
+    JOIN "user_roles" "r" ON "r"."id" = "e"."role_id"
+    JOIN "role_permission_relations" "rp" ON "rp"."role_id" = "r"."id"
+    JOIN "permissions" "p" ON "p"."id" = "rp"."permission_id"
+    WHERE "p"."bit_index" IS NOT NULL
+"""
+_APPLICATION_FILTER_SQL = """ AND "r"."application_id" = {param}"""
+
+
+async def _resolve_buckets_sql(user: User, application_id: str | None = None) -> Resolution:
+    """Один запрос плоских строк (company, role, app, name, permission, bit, restriction) — для PostgreSQL."""
+    conn = connections.get("default")
+    postgres = conn.capabilities.dialect == "postgres"
+    sql = _PERMISSION_ROWS_SQL.format(param="$1" if postgres else "?")
+    params: list = [user.id if postgres else str(user.id)]
+    if application_id:
+        sql += _APPLICATION_FILTER_SQL.format(param="$2" if postgres else "?")
+        params.append(application_id)
+    rows = await conn.execute_query_dict(sql, params)
+    if not rows:
+        return {}, None, {}, {}
+
+    index = await get_permission_index({str(row["permission_id"]) for row in rows})
+    bucket: Bucket = defaultdict(int)
+    role_name_map: dict[UUID, str] = {}
+    for row in rows:
+        if not row["application_id"]:
+            continue
+        rid = _as_uuid(row["role_id"])
+        role_name_map[rid] = row["name"]
+        bucket[(str(row["application_id"]), str(row["company_id"]), rid)] |= 1 << row["bit_index"]
+    role_restrictions = fold_restrictions(
+        (_as_uuid(row["role_id"]), row["permission_id"], row["restriction_id"]) for row in rows
+    )
+    return bucket, index, role_name_map, role_restrictions
+
+
+async def _resolve_buckets_graph(user: User, application_id: str | None = None) -> Resolution:
+    """Из БД — только связи пользователя; роли, включения и права берутся из графа процесса."""
+    relations = await UserCompanyRelation.filter(user=user).values_list("company_id", "role_id")
+    if not relations:
+        return {}, None, {}, {}
+
+    graph = await get_policy_graph()
+    relation_pairs = [(str(company_id), role_id) for company_id, role_id in relations]
+    bucket = distribute_graph_masks(graph, relation_pairs, application_id)
+    return bucket, graph.index, graph.role_name, graph.role_restrictions
 
-    # 5) Копим union по ключу (target_app_id, company_id, target_role_id)
-    bucket: dict[tuple[str, str, UUID], set[str]] = defaultdict(set)
 
-    for rel in relations:
-        company_id = str(rel.company.id)
-        base_rid: UUID = rel.role.id
+def distribute_graph_masks(graph, relation_pairs: List[Tuple[str, UUID]], application_id: str | None = None) -> Bucket:
+    """distribute_role_masks по уже загруженному графу ролей (PolicyGraph или снимку)."""
+    closure_map = {role_id: graph.closure_of(role_id) for _, role_id in relation_pairs}
+    return distribute_role_masks(relation_pairs, closure_map, graph.role_app, graph.role_masks, application_id)
 
-        # Каждую роль из closure раскидываем в ЕЁ app
-        for rid in closure_map[base_rid]:
-            target_app_id = role_app_map.get(rid)
-            if not target_app_id:
-                continue
-            perms = role_perm_map.get(rid, [])
-            if not perms:
-                continue
-            bucket[(target_app_id, company_id, rid)].update(perms)
 
-    # 6) Формируем требуемую структуру
+_RESOLVERS = {"graph": _resolve_buckets_graph, "orm": _resolve_buckets_orm, "sql": _resolve_buckets_sql}
+
+# Граф ролей в памяти; "sql"/"orm" считают всё по БД и служат эталоном для сверки
+DEFAULT_BACKEND = "graph"
+
+
+async def get_company_permissions_with_masks(
+    user: User,
+    backend: str | None = None,
+) -> Tuple[Dict[str, Dict[str, List[dict]]] | None, Dict[str, Dict[str, int]] | None]:
+    """
+    То же распределение, что и get_company_permissions_for_user, плюс маски
+    app_id -> company_id -> OR прав всех ролей (для проверки одного бита).
+
+    backend: "graph" (по умолчанию, граф ролей процесса), "sql" (один запрос к PostgreSQL) или "orm".
+    Блоки ролей внутри компании упорядочены по имени роли.
+    """
+    if user.is_superadmin:
+        return None, None
+
+    return assemble_company_permissions(*await _RESOLVERS[backend or DEFAULT_BACKEND](user))
+
+
+def assemble_company_permissions(
+    bucket: Bucket,
+    index: PermissionIndex | None,
+    role_name_map,
+    role_restrictions=None,
+) -> Tuple[Dict[str, Dict[str, List[dict]]], Dict[str, Dict[str, int]]]:
+    """
+    Bucket → app_id -> company_id -> блоки ролей (по имени роли) и OR-маски.
+    Блок роли с запретами несёт "restrictions": {permission_id: [restriction_id, ...]}.
+    """
     result: Dict[str, Dict[str, List[dict]]] = defaultdict(lambda: defaultdict(list))
-    for (app_id, company_id, rid), perms in bucket.items():
-        result[app_id][company_id].append(
-            {
-                "role": role_name_map.get(rid, "Неизвестная роль"),
-                "permissions": sorted(perms),
-            }
-        )
+    masks: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for (app_id, company_id, rid), mask in sorted(
+        bucket.items(), key=lambda item: (role_name_map.get(item[0][2], ""), str(item[0][2]))
+    ):
+        block = {
+            "role": role_name_map.get(rid, "Неизвестная роль"),
+            "permissions": index.decode(mask),  # type: ignore[union-attr]
+        }
+        restrictions = role_restrictions.get(rid) if role_restrictions else None
+        if restrictions:
+            block["restrictions"] = {permission_id: list(ids) for permission_id, ids in sorted(restrictions.items())}
+        result[app_id][company_id].append(block)
+        masks[app_id][company_id] |= mask
+
+    return result, masks
+
+
+async def get_company_permissions_for_user(
+    user: User,
+) -> Dict[str, Dict[str, List[dict]]] | None:
+    """
+    Результат: app_id -> company_id -> [ { role: <role_name>, permissions: [perm_id, ...] }, ... ]
 
-    return result
+    КАЖДАЯ роль из closure распределяется в СВОЙ app (cross-app).
+    """
+    permissions, _ = await get_company_permissions_with_masks(user)
+    return permissions
 
 
-# --- версия по одному приложению: фильтруем готовое распределение ---
+# --- версия по одному приложению: роли чужих приложений отбрасываются при разрешении ---
 
 
 async def get_company_permissions_by_application(
-    user: User, application_id: str
+    user: User, application_id: str, backend: str | None = None
 ) -> Dict[str, Dict[str, List[dict]]] | None:
     """
     Возвращает распределение ТОЛЬКО для указанного app_id,
     но учитывает cross-app включения (если в closure есть роли целевого app — они попадут сюда).
+
+    Фильтр по приложению применяется при разрешении ролей: роли других приложений
+    отбрасываются до чтения их метаданных и прав, а не после полного распределения.
     """
-    dist = await get_company_permissions_for_user(user)
-    if dist is None:
+    if user.is_superadmin:
         return None
-    # Оставляем только нужный app
-    return {application_id: dist.get(application_id, {})}
+    permissions, _ = assemble_company_permissions(*await _RESOLVERS[backend or DEFAULT_BACKEND](user, application_id))
+    return {application_id: permissions.get(application_id, {})}
@@ -0,0 +1,145 @@
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from types import MappingProxyType
+from typing import AsyncIterator, Mapping, Optional
+from uuid import UUID
+
+from loguru import logger
+from prometheus_client import Counter
+
+from app.database.models import Role, RoleClosure
+from app.utils.permission_bits import PermissionIndex, compile_role_policy
+from app.utils.policy_snapshot import (
+    MappedPolicyGraph,
+    open_policy_snapshot,
+    write_policy_snapshot,
+)
+from app.utils.single_flight import SingleFlight
+
+policy_graph_loads = Counter("policy_graph_loads_total", "Full reloads of the in-process role graph")
+
+
+@dataclass(frozen=True, slots=True)
+class PolicyGraph:
+    """
+    Вся модель RBAC процесса: роли, их замыкание по включениям, собственные права
+    битовыми масками и запреты на них. Неизменяема; при смене версии политики
+    заменяется целиком.
+    """
+
+    version: str
+    index: PermissionIndex
+    role_app: Mapping[UUID, str]
+    role_name: Mapping[UUID, str]
+    role_masks: Mapping[UUID, int]
+    closure: Mapping[UUID, frozenset[UUID]]
+    # role_id -> permission_id -> id запретов (только роли, у которых они есть)
+    role_restrictions: Mapping[UUID, Mapping[str, tuple[str, ...]]] = field(default_factory=lambda: MappingProxyType({}))
+
+    def closure_of(self, role_id: UUID) -> frozenset[UUID]:
+        """Роль и все включённые в неё (роль без включений — только она сама)."""
+        return self.closure.get(role_id) or frozenset((role_id,))
+
+
+async def load_policy_graph(version: str) -> PolicyGraph:
+    role_rows = await Role.all().values_list("id", "application_id", "name")
+    closure_rows = await RoleClosure.all().values_list("ancestor_id", "descendant_id")
+    index, role_masks, role_restrictions = await compile_role_policy()
+
+    closure: dict[UUID, set[UUID]] = {}
+    for ancestor_id, descendant_id in closure_rows:
+        closure.setdefault(ancestor_id, {ancestor_id}).add(descendant_id)
+
+    policy_graph_loads.inc()
+    logger.info(f"Граф ролей загружен: {len(role_rows)} ролей, версия политики {version}")
+    return PolicyGraph(
+        version=version,
+        index=index,
+        role_app=MappingProxyType({rid: str(app_id) for rid, app_id, _ in role_rows if app_id}),
+        role_name=MappingProxyType({rid: name for rid, _, name in role_rows}),
+        role_masks=MappingProxyType(dict(role_masks)),
+        closure=MappingProxyType({rid: frozenset(ids) for rid, ids in closure.items()}),
+        role_restrictions=MappingProxyType(role_restrictions),
+    )
+
+
+_graph: Optional[PolicyGraph | MappedPolicyGraph] = None
+_graph_flight = SingleFlight("policy_graph")
+_snapshot_path: Optional[str] = None
+
+
+def configure_policy_snapshot(path: Optional[str]) -> None:
+    """
+    Общий для воркеров файл снимка политики. Воркер сначала пробует отобразить файл
+    текущей версии и только при его отсутствии собирает граф из БД и перезаписывает файл.
+    """
+    global _snapshot_path
+    _snapshot_path = path
+
+
+async def _load_graph(version: str) -> PolicyGraph | MappedPolicyGraph:
+    if _snapshot_path:
+        mapped = open_policy_snapshot(_snapshot_path, version)
+        if mapped is not None:
+            logger.info(f"Граф ролей {version} отображён из {_snapshot_path}")
+            return mapped
+
+    graph = await load_policy_graph(version)
+    if not _snapshot_path:
+        return graph
+    try:
+        write_policy_snapshot(graph, _snapshot_path)
+    except OSError as e:
+        logger.warning(f"Не удалось записать снимок политики {_snapshot_path}: {e}")
+        return graph
+    return open_policy_snapshot(_snapshot_path, version) or graph
+
+
+def _install(graph: PolicyGraph | MappedPolicyGraph | None) -> None:
+    """Делает graph графом процесса; вытесненный снимок закрывается после последнего читателя."""
+    global _graph
+    previous, _graph = _graph, graph
+    if previous is not graph and isinstance(previous, MappedPolicyGraph):
+        previous.retire()
+
+
+async def get_policy_graph() -> PolicyGraph | MappedPolicyGraph:
+    """
+    Граф текущей версии политики; перезагружается один раз на смену версии.
+
+    Между await снимок может быть вытеснен и закрыт: читатель, который держит граф
+    через await, берёт его через policy_graph_in_use.
+    """
+    # app.handlers импортирует расчёт прав, поэтому версия — отложенным импортом
+    from app.handlers.cache_handler import get_policy_version
+
+    while True:
+        version = await get_policy_version()
+        graph = _graph
+        if graph is not None and graph.version == version:
+            return graph
+        graph = await _graph_flight.do(version, partial(_load_graph, version))
+        # Пока ждали загрузку, другой запрос мог поставить и уже вытеснить этот снимок
+        if isinstance(graph, MappedPolicyGraph) and graph.closed:
+            continue
+        _install(graph)
+        return graph
+
+
+@asynccontextmanager
+async def policy_graph_in_use() -> AsyncIterator[PolicyGraph | MappedPolicyGraph]:
+    """get_policy_graph для читателя, который держит граф через await: снимок не закроется до выхода."""
+    graph = await get_policy_graph()
+    if not isinstance(graph, MappedPolicyGraph):
+        yield graph
+        return
+    graph.acquire()
+    try:
+        yield graph
+    finally:
+        graph.release()
+
+
+def reset_policy_graph() -> None:
+    _install(None)
@@ -0,0 +1,249 @@
+import json
+import mmap
+import os
+import struct
+from typing import Iterator, Mapping, Optional
+from uuid import UUID
+
+from loguru import logger
+
+from app.utils.permission_bits import PermissionIndex
+
+# Файл снимка политики (little endian):
+#   заголовок  MAGIC, формат, ширина маски в байтах, число ролей, слотов хеш-таблицы,
+#              рёбер замыкания, разрешений, строк; затем версия политики (utf-8)
+#   роли       n_roles × 16 байт UUID
+#   хеш-таблица n_slots × u32: номер роли + 1 (0 — пусто), открытая адресация по первым 8 байтам UUID
+#   маски      n_roles × mask_bytes
+#   замыкание  (n_roles + 1) × u32 смещений, затем n_closure × u32 номеров ролей
+#   биты       n_perms × u32 — bit_index разрешения
+#   строки     (n_strings + 1) × u32 смещений и utf-8: app, имя и запреты (JSON, пусто — нет)
+#              каждой роли, затем id разрешений
+MAGIC = b"RBAC"
+FORMAT_VERSION = 2
+_ROLE_STRINGS = 3
+_HEADER = struct.Struct("<4sHHIIIIIH")
+
+
+class _RoleColumn(Mapping):
+    """Колонка по ролям (app, имя или маска), читаемая прямо из mmap."""
+
+    __slots__ = ("_graph", "_read")
+
+    def __init__(self, graph: "MappedPolicyGraph", read):
+        self._graph = graph
+        self._read = read
+
+    def __getitem__(self, role_id: UUID):
+        position = self._graph.position(role_id)
+        if position is None:
+            raise KeyError(role_id)
+        return self._read(position)
+
+    def __iter__(self) -> Iterator[UUID]:
+        return (self._graph.role_at(i) for i in range(self._graph.n_roles))
+
+    def __len__(self) -> int:
+        return self._graph.n_roles
+
+
+class MappedPolicyGraph:
+    """
+    Тот же интерфейс, что у PolicyGraph (closure_of, role_app, role_name, role_masks,
+    role_restrictions, index), но данные лежат в файле, отображённом в память только для чтения.
+    Страницы файла общие для всех воркеров, в памяти процесса — только индекс разрешений.
+
+    Отображение закрывается, когда граф выведен из оборота (retire) и его не держит
+    ни один читатель (acquire/release).
+    """
+
+    def __init__(self, path: str):
+        self.readers = 0
+        self.retired = False
+        self.closed = False
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._buf = memoryview(self._mm)
+
+        (
+            magic,
+            fmt,
+            self.mask_bytes,
+            self.n_roles,
+            n_slots,
+            n_closure,
+            n_perms,
+            n_strings,
+            version_len,
+        ) = _HEADER.unpack_from(buf)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path}: не снимок политики формата {FORMAT_VERSION}")
+
+        offset = _HEADER.size
+        self.version = bytes(buf[offset : offset + version_len]).decode("utf-8")
+        offset += version_len
+        self._roles_at = offset
+        offset += 16 * self.n_roles
+        self._slots = buf[offset : offset + 4 * n_slots].cast("I")
+        self._slot_mask = n_slots - 1
+        offset += 4 * n_slots
+        self._masks_at = offset
+        offset += self.mask_bytes * self.n_roles
+        self._closure_offsets = buf[offset : offset + 4 * (self.n_roles + 1)].cast("I")
+        offset += 4 * (self.n_roles + 1)
+        self._closure = buf[offset : offset + 4 * n_closure].cast("I")
+        offset += 4 * n_closure
+        bits = buf[offset : offset + 4 * n_perms].cast("I")
+        offset += 4 * n_perms
+        self._string_offsets = buf[offset : offset + 4 * (n_strings + 1)].cast("I")
+        self._strings_at = offset + 4 * (n_strings + 1)
+
+        perm_base = _ROLE_STRINGS * self.n_roles
+        self.index = PermissionIndex({self._string(perm_base + i): bits[i] for i in range(n_perms)})
+        self.role_app = _RoleColumn(self, lambda i: self._string(_ROLE_STRINGS * i))
+        self.role_name = _RoleColumn(self, lambda i: self._string(_ROLE_STRINGS * i + 1))
+        self.role_masks = _RoleColumn(self, self._mask)
+        self.role_restrictions = _RoleColumn(self, self._restrictions)
+
+    def _string(self, i: int) -> str:
+        start = self._strings_at + self._string_offsets[i]
+        end = self._strings_at + self._string_offsets[i + 1]
+        return bytes(self._buf[start:end]).decode("utf-8")
+
+    def _restrictions(self, i: int) -> dict[str, tuple[str, ...]]:
+        raw = self._string(_ROLE_STRINGS * i + 2)
+        return {pid: tuple(ids) for pid, ids in json.loads(raw).items()} if raw else {}
+
+    def _mask(self, i: int) -> int:
+        start = self._masks_at + i * self.mask_bytes
+        return int.from_bytes(self._buf[start : start + self.mask_bytes], "little")
+
+    def _role_bytes(self, i: int) -> bytes:
+        start = self._roles_at + 16 * i
+        return bytes(self._buf[start : start + 16])
+
+    def position(self, role_id: UUID) -> Optional[int]:
+        key = role_id.bytes
+        slot = int.from_bytes(key[:8], "little") & self._slot_mask
+        while entry := self._slots[slot]:
+            if self._role_bytes(entry - 1) == key:
+                return entry - 1
+            slot = (slot + 1) & self._slot_mask
+        return None
+
+    def role_at(self, i: int) -> UUID:
+        return UUID(bytes=self._role_bytes(i))
+
+    def closure_of(self, role_id: UUID) -> frozenset[UUID]:
+        position = self.position(role_id)
+        if position is None:
+            return frozenset((role_id,))
+        start, end = self._closure_offsets[position], self._closure_offsets[position + 1]
+        return frozenset((role_id, *(self.role_at(i) for i in self._closure[start:end])))
+
+    def acquire(self) -> None:
+        self.readers += 1
+
+    def release(self) -> None:
+        self.readers -= 1
+        if self.retired and not self.readers:
+            self.close()
+
+    def retire(self) -> None:
+        """Граф заменён новой версией: закрывается сразу или после последнего читателя."""
+        self.retired = True
+        if not self.readers:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        for name in ("_slots", "_closure_offsets", "_closure", "_string_offsets"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._buf.release()
+        self._mm.close()
+
+
+def write_policy_snapshot(graph, path: str) -> None:
+    """Сериализует PolicyGraph; файл подменяется атомарно, открытые mmap остаются валидными."""
+    roles = sorted(set(graph.role_name) | set(graph.role_app) | set(graph.role_masks), key=lambda rid: rid.bytes)
+    positions = {rid: i for i, rid in enumerate(roles)}
+
+    # Заполненность хеш-таблицы не выше 50%
+    n_slots = 1 << max(3, (2 * len(roles)).bit_length())
+    slots = [0] * n_slots
+    for i, rid in enumerate(roles):
+        slot = int.from_bytes(rid.bytes[:8], "little") & (n_slots - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (n_slots - 1)
+        slots[slot] = i + 1
+    max_mask = max(graph.role_masks.values(), default=0)
+    mask_bytes = max(1, (max_mask.bit_length() + 7) // 8)
+
+    closure_offsets = [0]
+    closure: list[int] = []
+    for rid in roles:
+        closure.extend(sorted(positions[d] for d in graph.closure_of(rid) if d != rid and d in positions))
+        closure_offsets.append(len(closure))
+
+    permissions = sorted(graph.index.items(), key=lambda item: item[1])
+    strings = []
+    for rid in roles:
+        restrictions = graph.role_restrictions.get(rid)
+        strings += [
+            graph.role_app.get(rid, ""),
+            graph.role_name.get(rid, ""),
+            json.dumps(dict(restrictions), sort_keys=True) if restrictions else "",
+        ]
+    strings += [permission_id for permission_id, _ in permissions]
+    encoded = [s.encode("utf-8") for s in strings]
+    string_offsets = [0]
+    for blob in encoded:
+        string_offsets.append(string_offsets[-1] + len(blob))
+
+    version = graph.version.encode("utf-8")
+    parts = [
+        _HEADER.pack(
+            MAGIC,
+            FORMAT_VERSION,
+            mask_bytes,
+            len(roles),
+            n_slots,
+            len(closure),
+            len(permissions),
+            len(strings),
+            len(version),
+        ),
+        version,
+        b"".join(rid.bytes for rid in roles),
+        struct.pack(f"<{n_slots}I", *slots),
+        b"".join(graph.role_masks.get(rid, 0).to_bytes(mask_bytes, "little") for rid in roles),
+        struct.pack(f"<{len(closure_offsets)}I", *closure_offsets),
+        struct.pack(f"<{len(closure)}I", *closure),
+        struct.pack(f"<{len(permissions)}I", *(bit for _, bit in permissions)),
+        struct.pack(f"<{len(string_offsets)}I", *string_offsets),
+        *encoded,
+    ]
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        for part in parts:
+            f.write(part)
+    os.replace(tmp_path, path)
+    logger.info(f"Снимок политики {graph.version} записан в {path}: {len(roles)} ролей, {len(closure)} рёбер")
+
+
+def open_policy_snapshot(path: str, version: str) -> Optional[MappedPolicyGraph]:
+    """Отображает файл, если он есть и его версия совпадает с текущей; иначе None."""
+    try:
+        mapped = MappedPolicyGraph(path)
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+    if mapped.version != version:
+        mapped.close()
+        return None
+    return mapped
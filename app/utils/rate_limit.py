@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import uuid
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request
+from loguru import logger
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+from tiacore_lib.config import get_settings
+
+RATE_LIMIT_KEY_PREFIX = "ratelimit:"
+# Redis не ответил за это время — пропускаем запрос, а не ждём
+RATE_LIMIT_REDIS_TIMEOUT = 0.1
+
+rate_limited = Counter("rate_limited_total", "Requests rejected by the sliding-window rate limiter", ["scope"])
+rate_limit_errors = Counter("rate_limit_errors_total", "Rate limiter checks skipped because Redis was unavailable")
+
+# Скользящее окно на zset: элемент — попытка, score — её время (мс по часам Redis).
+# KEYS — окна (IP, email); ARGV: длина окна в мс, уникальный id попытки, лимит каждого ключа.
+# Попытка записывается во все окна, только если ни одно не заполнено; иначе
+# возвращается, через сколько мс освободится место в самом занятом.
+SLIDING_WINDOW_LUA = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local window = tonumber(ARGV[1])
+local retry = 0
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= tonumber(ARGV[2 + i]) then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        retry = math.max(retry, tonumber(oldest[2]) + window - now)
+    end
+end
+if retry > 0 then
+    return retry
+end
+for _, key in ipairs(KEYS) do
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+_script = None
+_script_client = None
+
+
+def _sliding_window(redis_client):
+    global _script, _script_client
+    if _script_client is not redis_client:
+        # Script сам повторит EVALSHA через EVAL, если Redis потерял кэш скриптов
+        _script = redis_client.register_script(SLIDING_WINDOW_LUA)
+        _script_client = redis_client
+    return _script
+
+
+async def hit_rate_limit(redis_client, limits: dict[str, int], window: int) -> int:
+    """
+    Учитывает попытку во всех окнах limits (ключ → лимит за window секунд).
+    0 — попытка пропущена; иначе через сколько секунд повторить. При недоступном
+    Redis попытка пропускается: лимитер не должен ронять логин вместе с Redis.
+    """
+    if not limits:
+        return 0
+    script = _sliding_window(redis_client)
+    try:
+        retry_ms = await asyncio.wait_for(
+            script(keys=list(limits), args=[window * 1000, uuid.uuid4().hex, *limits.values()]),
+            RATE_LIMIT_REDIS_TIMEOUT,
+        )
+    except (RedisError, OSError, asyncio.TimeoutError) as e:
+        rate_limit_errors.inc()
+        logger.warning(f"Лимит попыток не проверен, запрос пропущен: {e!r}")
+        return 0
+    return -(-int(retry_ms) // 1000)
+
+
+async def _request_email(request: Request) -> Optional[str]:
+    # Тело уже прочитано FastAPI для модели запроса, повторного чтения из сокета нет
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def _key(scope: str, kind: str, value: str) -> str:
+    # Email в ключе — только хешем: ключи Redis не должны хранить адреса
+    digest = hashlib.blake2b(value.encode(), digest_size=16).hexdigest()
+    return f"{RATE_LIMIT_KEY_PREFIX}{scope}:{kind}:{digest}"
+
+
+def rate_limit(scope: str):
+    """
+    Зависимость для эндпоинтов с bcrypt или отправкой писем: скользящие окна
+    по IP клиента и по email из тела запроса. Отказ — 429 с Retry-After до того,
+    как эндпоинт что-либо хеширует или отправляет.
+
+    IP — request.client: за прокси uvicorn должен запускаться с --proxy-headers.
+    Без Redis (тестовая конфигурация) лимит не действует.
+    """
+
+    async def dependency(request: Request, settings=Depends(get_settings)) -> None:
+        redis_client = getattr(request.app.state, "redis", None)
+        if redis_client is None or not settings.RATE_LIMIT_ENABLED:
+            return
+
+        limits = {}
+        if request.client:
+            limits[_key(scope, "ip", request.client.host)] = settings.RATE_LIMIT_PER_IP
+        email = await _request_email(request)
+        if email:
+            limits[_key(scope, "email", email)] = settings.RATE_LIMIT_PER_EMAIL
+
+        retry_after = await hit_rate_limit(redis_client, limits, settings.RATE_LIMIT_WINDOW)
+        if retry_after:
+            rate_limited.labels(scope=scope).inc()
+            logger.warning(f"🚦 Превышен лимит попыток {scope}: ip={request.client and request.client.host}")
+            raise HTTPException(
+                status_code=429,
+                detail="Слишком много попыток, повторите позже",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+    return dependency
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from typing import Optional
+
+from fastapi_cache import FastAPICache
+from loguru import logger
+from prometheus_client import Counter, Gauge
+
+REVOKED_KEY_PREFIX = "revoked:"
+REVOCATION_CHANNEL = "token_revocations"
+
+revoked_tokens = Gauge("revoked_tokens_local", "Revoked token ids held in the worker-local set")
+revocation_hits = Counter("revoked_token_rejections_total", "Requests rejected because the token was revoked")
+
+
+class RevocationStore:
+    """
+    Отозванные jti в памяти воркера: jti → exp (unix time).
+
+    Проверка — поиск в dict без обращения к Redis. Источник правды — ключи
+    revoked:{jti} в Redis с TTL до exp токена; другие воркеры узнают о новых
+    отзывах через pub/sub и при (пере)подключении перечитывают все ключи.
+    Записи с истёкшим exp выкидываются: такой токен и так не пройдёт проверку подписи.
+    """
+
+    __slots__ = ("_revoked", "_next_prune")
+
+    def __init__(self):
+        self._revoked: dict[str, int] = {}
+        self._next_prune = 0.0
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, exp: int) -> None:
+        if exp > time.time():
+            self._revoked[jti] = exp
+            revoked_tokens.set(len(self._revoked))
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if not jti or not self._revoked:
+            return False
+        exp = self._revoked.get(jti)
+        now = time.time()
+        if now >= self._next_prune:
+            self.prune(now)
+        return exp is not None and exp > now
+
+    def prune(self, now: Optional[float] = None) -> None:
+        now = now or time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        self._next_prune = now + 60
+        revoked_tokens.set(len(self._revoked))
+
+    def clear(self) -> None:
+        self._revoked.clear()
+        revoked_tokens.set(0)
+
+
+revocation_store = RevocationStore()
+
+
+async def revoke_token(jti: str, exp: int, redis_client=None) -> None:
+    ttl = int(exp - time.time())
+    if ttl <= 0:
+        return
+    revocation_store.add(jti, exp)
+    await FastAPICache.get_backend().set(f"{REVOKED_KEY_PREFIX}{jti}", str(exp).encode("utf-8"), expire=ttl)
+    if redis_client is not None:
+        await redis_client.publish(REVOCATION_CHANNEL, f"{jti}:{exp}")
+
+
+def is_token_revoked(jti: Optional[str]) -> bool:
+    if revocation_store.is_revoked(jti):
+        revocation_hits.inc()
+        return True
+    return False
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+async def load_revoked_tokens(redis_client) -> None:
+    """Полная синхронизация локального набора с Redis."""
+    async for key in redis_client.scan_iter(match=f"{REVOKED_KEY_PREFIX}*", count=500):
+        raw = await redis_client.get(key)
+        if raw is not None:
+            revocation_store.add(_decode(key)[len(REVOKED_KEY_PREFIX) :], int(_decode(raw)))
+
+
+def _apply_message(data) -> None:
+    jti, _, exp = _decode(data).rpartition(":")
+    if jti and exp.isdigit():
+        revocation_store.add(jti, int(exp))
+
+
+async def listen_revocations(redis_client) -> None:
+    """Фоновая задача воркера: подписка на отзывы с переподключением."""
+    delay = 1
+    while True:
+        pubsub = redis_client.pubsub()
+        try:
+            await pubsub.subscribe(REVOCATION_CHANNEL)
+            # Подписываемся до полной выгрузки, чтобы не потерять отзывы между ними
+            await load_revoked_tokens(redis_client)
+            delay = 1
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _apply_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Подписка на отзыв токенов прервана: {e}, переподключение через {delay} с")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+        finally:
+            await pubsub.aclose()
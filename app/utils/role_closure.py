@@ -0,0 +1,138 @@
+from collections import defaultdict, deque
+from typing import Iterable, Set, Tuple
+from uuid import UUID
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.database.models import RoleClosure, RoleIncludeRelation
+
+Edge = Tuple[UUID, UUID]
+
+# Ключ pg_advisory_xact_lock для правок замыкания ("role")
+CLOSURE_LOCK_KEY = 0x726F6C65
+
+
+def _as_uuid(value) -> UUID:
+    return value if isinstance(value, UUID) else UUID(str(value))
+
+
+async def _depths(filter_kwargs: dict, key: str, self_id: UUID, using_db) -> dict[UUID, int]:
+    rows = await RoleClosure.filter(**filter_kwargs).using_db(using_db).values_list(key, "depth")
+    depths = {self_id: 0}
+    for role_id, depth in rows:
+        depths[role_id] = depth
+    return depths
+
+
+async def add_edge_to_closure(parent_id: UUID, child_id: UUID, using_db: BaseDBAsyncClient) -> None:
+    """Добавляет пути через ребро parent → child: (предки parent) × (потомки child)."""
+    ancestors = await _depths({"descendant_id": parent_id}, "ancestor_id", parent_id, using_db)
+    descendants = await _depths({"ancestor_id": child_id}, "descendant_id", child_id, using_db)
+
+    candidates = {
+        (ancestor_id, descendant_id): up + 1 + down
+        for ancestor_id, up in ancestors.items()
+        for descendant_id, down in descendants.items()
+        if ancestor_id != descendant_id
+    }
+
+    existing = (
+        await RoleClosure.filter(ancestor_id__in=list(ancestors), descendant_id__in=list(descendants))
+        .using_db(using_db)
+        .values_list("id", "ancestor_id", "descendant_id", "depth")
+    )
+    for row_id, ancestor_id, descendant_id, depth in existing:
+        new_depth = candidates.pop((ancestor_id, descendant_id), None)
+        if new_depth is not None and new_depth < depth:
+            await RoleClosure.filter(id=row_id).using_db(using_db).update(depth=new_depth)
+
+    if candidates:
+        await RoleClosure.bulk_create(
+            [RoleClosure(ancestor_id=a, descendant_id=d, depth=depth) for (a, d), depth in candidates.items()],
+            using_db=using_db,
+        )
+
+
+def _bfs_depths(root: UUID, adj: dict[UUID, Set[UUID]]) -> dict[UUID, int]:
+    """Кратчайшая глубина до каждой роли, достижимой из root (без самой root)."""
+    depths: dict[UUID, int] = {}
+    queue = deque([(root, 0)])
+    while queue:
+        current, depth = queue.popleft()
+        for child_id in adj.get(current, ()):
+            if child_id != root and child_id not in depths:
+                depths[child_id] = depth + 1
+                queue.append((child_id, depth + 1))
+    return depths
+
+
+async def rebuild_closure_for_ancestors(ancestor_ids: Iterable[UUID], using_db: BaseDBAsyncClient) -> None:
+    """Пересобирает строки замыкания только для указанных предков по текущим рёбрам."""
+    ancestor_ids = set(ancestor_ids)
+    if not ancestor_ids:
+        return
+
+    edges = await RoleIncludeRelation.all().using_db(using_db).values_list("parent_role_id", "child_role_id")
+    adj: dict[UUID, Set[UUID]] = defaultdict(set)
+    for parent_id, child_id in edges:
+        adj[parent_id].add(child_id)
+
+    rows = [
+        RoleClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=depth)
+        for ancestor_id in ancestor_ids
+        for descendant_id, depth in _bfs_depths(ancestor_id, adj).items()
+    ]
+    await RoleClosure.filter(ancestor_id__in=list(ancestor_ids)).using_db(using_db).delete()
+    if rows:
+        await RoleClosure.bulk_create(rows, using_db=using_db)
+
+
+async def remove_edge_from_closure(parent_id: UUID, child_id: UUID, using_db: BaseDBAsyncClient) -> None:
+    """
+    Вызывается, когда ребро parent → child уже удалено.
+
+    В DAG к потомку может вести другой путь, поэтому пересобираются только
+    parent и его предки — остальные строки замыкания ребро не затрагивает.
+    """
+    ancestors = await _depths({"descendant_id": parent_id}, "ancestor_id", parent_id, using_db)
+    await rebuild_closure_for_ancestors(ancestors.keys(), using_db)
+
+
+async def _lock_closure(using_db: BaseDBAsyncClient) -> None:
+    """
+    Правки замыкания идут по одной до конца транзакции: параллельная правка читает
+    замыкание только после фиксации предыдущей и не вставляет те же пары (ancestor, descendant).
+    SQLite и так пишет одной транзакцией за раз.
+    """
+    if using_db.capabilities.dialect == "postgres":
+        await using_db.execute_query("SELECT pg_advisory_xact_lock($1)", [CLOSURE_LOCK_KEY])
+
+
+async def replace_closure_edge(previous: Edge | None, current: Edge | None, using_db: BaseDBAsyncClient) -> None:
+    previous = (_as_uuid(previous[0]), _as_uuid(previous[1])) if previous else None
+    current = (_as_uuid(current[0]), _as_uuid(current[1])) if current else None
+    if previous == current:
+        return
+    await _lock_closure(using_db)
+    if previous:
+        await remove_edge_from_closure(*previous, using_db)
+    if current:
+        await add_edge_to_closure(*current, using_db)
+
+
+async def load_role_closure(role_ids: Iterable[UUID]) -> dict[UUID, Set[UUID]]:
+    """Роль → все включённые в неё роли (включая её саму). Один запрос к role_closure."""
+    closure: dict[UUID, Set[UUID]] = {role_id: {role_id} for role_id in role_ids}
+    if not closure:
+        return closure
+    rows = await RoleClosure.filter(ancestor_id__in=list(closure)).values_list("ancestor_id", "descendant_id")
+    for ancestor_id, descendant_id in rows:
+        closure[ancestor_id].add(descendant_id)
+    return closure
+
+
+async def creates_cycle(parent_id: UUID, child_id: UUID) -> bool:
+    """Ребро parent → child замкнёт цикл, если parent уже достижим из child."""
+    if parent_id == child_id:
+        return True
+    return await RoleClosure.exists(ancestor_id=child_id, descendant_id=parent_id)
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from prometheus_client import Counter
+
+single_flight_calls = Counter(
+    "single_flight_calls_total",
+    "Calls to a single-flight group",
+    ["group", "result"],
+)
+
+
+class SingleFlight:
+    """
+    Объединение одновременных вызовов с одинаковым ключом в пределах процесса.
+
+    Первый вызов запускает вычисление отдельной задачей, остальные ждут её
+    результата (или исключения). Отмена одного из ожидающих не отменяет
+    вычисление для остальных. После завершения ключ освобождается — это не кэш.
+    """
+
+    def __init__(self, group: str):
+        self.group = group
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            single_flight_calls.labels(group=self.group, result="executed").inc()
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            single_flight_calls.labels(group=self.group, result="coalesced").inc()
+        return await asyncio.shield(task)
@@ -0,0 +1,88 @@
+"""
+Время ответа на точечную проверку права при тёплом кэше: check_permission против
+прежнего пути — снимок прав из кэша (как для /me) и поиск разрешения в его блоках.
+
+Работает на sqlite в памяти и InMemoryBackend вместо Redis, поэтому чтение версии
+из кэша здесь дешевле сетевого; сетевой round-trip к Redis добавляется к обоим вариантам.
+
+Запуск: python -m benchmarks.access_check_bench --checks 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from tortoise import Tortoise
+
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.handlers.access_check import check_permission
+from app.utils.permissions_cache import get_cached_permission_snapshot
+
+
+async def _seed(companies: int, permissions: int) -> tuple[User, list[Company]]:
+    application = await Application.create(id="bench_app", name="Bench")
+    user = await User.create(email="bench@bench", password_hash="-", full_name="Bench", position="bench")
+    role = await Role.create(name="bench", application_id=application.id)
+    for n in range(permissions):
+        permission = await Permission.create(id=f"perm_{n}", name=f"Право {n}")
+        await RolePermissionRelation.create(role=role, permission=permission)
+    company_rows = [await Company.create(name=f"Компания {n}") for n in range(companies)]
+    for company in company_rows:
+        await UserCompanyRelation.create(user=user, company=company, role=role, application=application)
+    return user, company_rows
+
+
+async def _via_snapshot(user_id, company_id, application_id: str, permission: str) -> bool:
+    user = await User.get(id=user_id)
+    snapshot = await get_cached_permission_snapshot(user) or {}
+    blocks = (snapshot.get("permissions") or {}).get(application_id, {}).get(str(company_id), [])
+    return any(permission in block["permissions"] for block in blocks)
+
+
+async def _per_check_us(fn, checks) -> float:
+    started = time.perf_counter()
+    for check in checks:
+        assert await fn(*check)
+    return (time.perf_counter() - started) / len(checks) * 1e6
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--checks", type=int, default=20000)
+    parser.add_argument("--companies", type=int, default=20)
+    parser.add_argument("--permissions", type=int, default=100)
+    args = parser.parse_args()
+
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.database.models"]})
+    await Tortoise.generate_schemas()
+    FastAPICache.init(InMemoryBackend())
+    user, companies = await _seed(args.companies, args.permissions)
+
+    checks = [
+        (user.id, companies[n % len(companies)].id, "bench_app", f"perm_{n % args.permissions}")
+        for n in range(args.checks)
+    ]
+    for fn in (_via_snapshot, check_permission):
+        await fn(*checks[0])  # прогрев кэша
+
+    snapshot = await _per_check_us(_via_snapshot, checks)
+    point = await _per_check_us(check_permission, checks)
+    await Tortoise.close_connections()
+
+    print(f"checks={args.checks} companies={args.companies} permissions={args.permissions}")
+    print(f"snapshot + search : {snapshot:8.1f} us/check")
+    print(f"check_permission  : {point:8.1f} us/check")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+"""
+Стоимость bcrypt на этом железе: для каждого cost factor — время одного хеша и
+хешей в секунду на ядро, а также стоимость, которую выбрала бы калибровка
+(app.utils.hashing.calibrate_bcrypt_rounds) для --target-ms.
+
+Хешей в секунду на ядро — это и потолок логинов на ядро: проверка пароля
+стоит столько же, сколько хеширование; итог по машине — оценка умножением на число ядер.
+
+Запуск: python -m benchmarks.hash_cost_bench --min-rounds 8 --max-rounds 14 --target-ms 250
+"""
+
+import argparse
+import os
+import statistics
+
+from app.utils.hashing import _hashpw, calibrate_bcrypt_rounds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rounds", type=int, default=8)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--samples", type=int, default=5, help="хешей на замер")
+    parser.add_argument("--target-ms", type=float, default=250, help="цель калибровки на один хеш")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"cores={cores}")
+    print(f"{'cost':>4} {'ms/hash':>9} {'hashes/s/core':>14} {'hashes/s total':>15}")
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        elapsed = statistics.median(_hashpw("benchmark", rounds)[1] for _ in range(args.samples))
+        print(f"{rounds:4d} {elapsed * 1000:9.1f} {1 / elapsed:14.1f} {cores / elapsed:15.1f}")
+
+    rounds = calibrate_bcrypt_rounds(args.target_ms, min_rounds=args.min_rounds, max_rounds=args.max_rounds)
+    print(f"calibrated cost for {args.target_ms:.0f} ms: {rounds}")
+
+
+if __name__ == "__main__":
+    main()
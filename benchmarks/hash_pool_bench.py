@@ -0,0 +1,68 @@
+"""
+Пропускная способность конкурентных логинов на одном воркере: bcrypt.checkpw
+прямо в event loop против пула из app.utils.hashing.
+
+Параллельно крутится «пинг»-корутина: её максимальная задержка показывает,
+насколько хеширование блокирует остальные запросы воркера.
+
+Запуск: python -m benchmarks.hash_pool_bench --logins 64 --workers 4
+"""
+
+import argparse
+import asyncio
+import time
+
+import bcrypt
+
+from app.utils.hashing import HashPool, _checkpw
+
+
+async def _ping(stop: asyncio.Event, lags: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - started - 0.005)
+
+
+async def _measure(login, logins: int) -> tuple[float, float]:
+    stop = asyncio.Event()
+    lags: list[float] = []
+    pinger = asyncio.create_task(_ping(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await pinger
+    return logins / elapsed, max(lags, default=0.0) * 1000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--kind", choices=["thread", "process"], default="thread")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    args = parser.parse_args()
+
+    password = "correct horse battery staple"
+    password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt(args.rounds)).decode()
+
+    async def inline_login():
+        bcrypt.checkpw(password.encode(), password_hash.encode())
+
+    pool = HashPool(args.workers, queue_size=args.logins, kind=args.kind)
+
+    async def pooled_login():
+        await pool.run("verify", _checkpw, password, password_hash)
+
+    inline_rps, inline_lag = await _measure(inline_login, args.logins)
+    pooled_rps, pooled_lag = await _measure(pooled_login, args.logins)
+    pool.shutdown()
+
+    print(f"logins={args.logins} cost={args.rounds} pool={args.kind}x{args.workers}")
+    print(f"inline : {inline_rps:7.1f} logins/s, max loop lag {inline_lag:8.1f} ms")
+    print(f"pool   : {pooled_rps:7.1f} logins/s, max loop lag {pooled_lag:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+Микробенчмарк: распределение прав через битовые маски против прежнего пути
+на множествах и sorted()-списках.
+
+Запуск: python -m benchmarks.permission_bits_bench --relations 500
+"""
+
+import argparse
+import random
+import timeit
+import uuid
+from collections import defaultdict
+
+from app.utils.permission_bits import PermissionIndex
+from app.utils.permissions_get import distribute_role_masks
+
+APPS = ["auth_app", "crm_app", "parcel_app", "price_app"]
+
+
+def build_dataset(relations: int, roles: int, permissions: int, per_role: int, seed: int):
+    rnd = random.Random(seed)
+    permission_ids = [f"permission_{i}" for i in range(permissions)]
+    role_ids = [uuid.uuid4() for _ in range(roles)]
+    role_app_map = {rid: rnd.choice(APPS) for rid in role_ids}
+    role_perm_map = {rid: rnd.sample(permission_ids, per_role) for rid in role_ids}
+
+    # Каждая роль включает до трёх ролей «ниже» себя — DAG без циклов
+    closure_map = {}
+    for i, rid in reversed(list(enumerate(role_ids))):
+        closure = {rid}
+        for child in rnd.sample(role_ids[i + 1 :], min(3, len(role_ids) - i - 1)):
+            closure |= closure_map[child]
+        closure_map[rid] = closure
+
+    relation_pairs = [(str(uuid.uuid4()), rnd.choice(role_ids)) for _ in range(relations)]
+    return permission_ids, role_app_map, role_perm_map, closure_map, relation_pairs
+
+
+def legacy_distribution(relation_pairs, closure_map, role_app_map, role_perm_map):
+    bucket = defaultdict(set)
+    for company_id, base_rid in relation_pairs:
+        for rid in closure_map[base_rid]:
+            target_app_id = role_app_map.get(rid)
+            perms = role_perm_map.get(rid, [])
+            if not target_app_id or not perms:
+                continue
+            bucket[(target_app_id, company_id, rid)].update(perms)
+
+    result = defaultdict(lambda: defaultdict(list))
+    for (app_id, company_id, rid), perms in bucket.items():
+        result[app_id][company_id].append({"role": str(rid), "permissions": sorted(perms)})
+    return result
+
+
+def bitset_distribution(relation_pairs, closure_map, role_app_map, role_masks, index):
+    bucket = distribute_role_masks(relation_pairs, closure_map, role_app_map, role_masks)
+    result = defaultdict(lambda: defaultdict(list))
+    for (app_id, company_id, rid), mask in bucket.items():
+        result[app_id][company_id].append({"role": str(rid), "permissions": index.decode(mask)})
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--relations", type=int, default=500)
+    parser.add_argument("--roles", type=int, default=40)
+    parser.add_argument("--permissions", type=int, default=60)
+    parser.add_argument("--per-role", type=int, default=15)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    permission_ids, role_app_map, role_perm_map, closure_map, relation_pairs = build_dataset(
+        args.relations, args.roles, args.permissions, args.per_role, args.seed
+    )
+    index = PermissionIndex({pid: bit for bit, pid in enumerate(permission_ids)})
+    role_masks = {rid: index.mask_of(perms) for rid, perms in role_perm_map.items()}
+
+    legacy = legacy_distribution(relation_pairs, closure_map, role_app_map, role_perm_map)
+    bitset = bitset_distribution(relation_pairs, closure_map, role_app_map, role_masks, index)
+    assert legacy == bitset, "Результаты путей расходятся"
+
+    legacy_time = timeit.timeit(
+        lambda: legacy_distribution(relation_pairs, closure_map, role_app_map, role_perm_map),
+        number=args.repeat,
+    )
+    bitset_time = timeit.timeit(
+        lambda: bitset_distribution(relation_pairs, closure_map, role_app_map, role_masks, index),
+        number=args.repeat,
+    )
+
+    print(f"relations={args.relations} roles={args.roles} permissions={args.permissions}")
+    print(f"sets + sorted : {legacy_time / args.repeat * 1000:.3f} ms/user")
+    print(f"bitset        : {bitset_time / args.repeat * 1000:.3f} ms/user")
+    print(f"speedup       : {legacy_time / bitset_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
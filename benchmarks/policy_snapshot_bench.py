@@ -0,0 +1,87 @@
+"""
+Память воркера и стоимость разрешения прав: PolicyGraph в куче процесса против
+снимка, отображённого через mmap (app.utils.policy_snapshot).
+
+Граф синтетический: роли в нескольких приложениях, включения по четырём уровням
+иерархии и права. Память кучи меряется tracemalloc; страницы mmap в неё не входят —
+они общие для всех воркеров и учитываются ядром один раз.
+
+Запуск: python -m benchmarks.policy_snapshot_bench --roles 5000 --permissions 300
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import uuid
+from types import MappingProxyType
+
+from app.utils.permission_bits import PermissionIndex
+from app.utils.permissions_get import distribute_role_masks
+from app.utils.policy_graph import PolicyGraph
+from app.utils.policy_snapshot import MappedPolicyGraph, write_policy_snapshot
+
+
+def _synthetic_graph(roles: int, permissions: int, rnd: random.Random) -> PolicyGraph:
+    role_ids = [uuid.uuid4() for _ in range(roles)]
+    index = PermissionIndex({f"permission_{n}": n for n in range(permissions)})
+    masks = {rid: sum(1 << rnd.randrange(permissions) for _ in range(rnd.randint(1, 12))) for rid in role_ids}
+
+    # Четыре уровня: роль включает до трёх ролей следующего уровня
+    tiers = [role_ids[t::4] for t in range(4)]
+    closure: dict[uuid.UUID, set[uuid.UUID]] = {rid: {rid} for rid in tiers[3]}
+    for t in (2, 1, 0):
+        for rid in tiers[t]:
+            children = rnd.sample(tiers[t + 1], rnd.randint(0, 3))
+            closure[rid] = {rid}.union(*(closure[child] for child in children))
+
+    return PolicyGraph(
+        version="bench",
+        index=index,
+        role_app=MappingProxyType({rid: f"app_{n % 6}" for n, rid in enumerate(role_ids)}),
+        role_name=MappingProxyType({rid: f"role_{n}" for n, rid in enumerate(role_ids)}),
+        role_masks=MappingProxyType(masks),
+        closure=MappingProxyType({rid: frozenset(ids) for rid, ids in closure.items()}),
+    )
+
+
+def _resolve(graph, relations) -> float:
+    started = time.perf_counter()
+    for pairs in relations:
+        closure_map = {rid: graph.closure_of(rid) for _, rid in pairs}
+        distribute_role_masks(pairs, closure_map, graph.role_app, graph.role_masks)
+    return (time.perf_counter() - started) / len(relations) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--roles", type=int, default=5000)
+    parser.add_argument("--permissions", type=int, default=300)
+    parser.add_argument("--users", type=int, default=2000)
+    args = parser.parse_args()
+    rnd = random.Random(42)
+
+    tracemalloc.start()
+    graph = _synthetic_graph(args.roles, args.permissions, rnd)
+    heap_graph = tracemalloc.get_traced_memory()[0]
+
+    path = os.path.join(tempfile.mkdtemp(), "policy.bin")
+    write_policy_snapshot(graph, path)
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    mapped = MappedPolicyGraph(path)
+    heap_mapped = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    role_ids = list(graph.role_name)
+    relations = [[(f"company_{c}", rnd.choice(role_ids)) for c in range(rnd.randint(1, 3))] for _ in range(args.users)]
+
+    print(f"roles={args.roles} permissions={args.permissions} file={os.path.getsize(path) / 1024:.0f} KiB")
+    print(f"in-process graph : heap {heap_graph / 1024:8.0f} KiB, {_resolve(graph, relations):7.1f} us/user")
+    print(f"mmap snapshot    : heap {heap_mapped / 1024:8.0f} KiB, {_resolve(mapped, relations):7.1f} us/user")
+
+
+if __name__ == "__main__":
+    main()
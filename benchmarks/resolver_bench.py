@@ -0,0 +1,276 @@
+"""
+Замеры горячего пути на синтетическом RBAC-графе: get_company_permissions_for_user
+(и каждый бэкенд разрешения), verify_token с холодным и тёплым кэшем снимков и
+POST /api/auth/login. Для каждого замера — перцентили задержки и число SQL-запросов
+на вызов; результат пишется в JSON-отчёт, чтобы прогоны можно было сравнивать.
+
+Граф: --apps приложений, --depth уровней по --roles-per-level ролей; каждая роль
+включает --fanout ролей следующего уровня и сама несёт --perms-per-role прав.
+Пользователи получают по --relations связей (компания, роль верхних уровней).
+
+По умолчанию sqlite в памяти и InMemoryBackend вместо Redis; --db-url позволяет
+прогнать то же на PostgreSQL.
+
+Запуск: python -m benchmarks.resolver_bench --users 500 --report resolver_report.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timezone
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import AsyncClient
+from tortoise import Tortoise, connections
+
+from app.config import ConfigName, get_settings_snapshot
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    RoleIncludeRelation,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.handlers.auth import build_access_claims, create_access_token, verify_token
+from app.handlers.cache_handler import bump_user_permissions_version
+from app.utils.hashing import hash_password
+from app.utils.permissions_get import (
+    get_company_permissions_for_user,
+    get_company_permissions_with_masks,
+)
+from app.utils.policy_graph import get_policy_graph
+from app.utils.role_closure import rebuild_closure_for_ancestors
+
+PASSWORD = "bench-password"
+_QUERY_METHODS = ("execute_query", "execute_query_dict", "execute_insert", "execute_many", "execute_script")
+
+
+class QueryCounter:
+    """Считает запросы соединения "default", пока активен."""
+
+    def __init__(self):
+        self.count = 0
+        self._originals = {}
+
+    def __enter__(self):
+        conn = connections.get("default")
+        for name in _QUERY_METHODS:
+            original = self._originals[name] = getattr(conn, name)
+            setattr(conn, name, self._counting(original))
+        return self
+
+    def __exit__(self, *exc):
+        conn = connections.get("default")
+        for name, original in self._originals.items():
+            setattr(conn, name, original)
+
+    def _counting(self, original):
+        async def wrapper(*args, **kwargs):
+            self.count += 1
+            return await original(*args, **kwargs)
+
+        return wrapper
+
+
+async def build_dataset(args, rnd: random.Random) -> list[User]:
+    apps = [await Application.create(id=f"app_{n}", name=f"App {n}") for n in range(args.apps)]
+    await Permission.bulk_create(
+        [Permission(id=f"perm_{n}", name=f"Право {n}", bit_index=n) for n in range(args.permissions)]
+    )
+    permission_ids = [f"perm_{n}" for n in range(args.permissions)]
+
+    levels = [
+        [Role(name=f"role_{level}_{n}", application_id=rnd.choice(apps).id) for n in range(args.roles_per_level)]
+        for level in range(args.depth)
+    ]
+    await Role.bulk_create([role for level in levels for role in level])
+    roles = await Role.all()
+    by_name = {role.name: role for role in roles}
+    levels = [[by_name[role.name] for role in level] for level in levels]
+
+    await RolePermissionRelation.bulk_create(
+        [
+            RolePermissionRelation(role_id=role.id, permission_id=permission_id)
+            for role in roles
+            for permission_id in rnd.sample(permission_ids, min(args.perms_per_role, len(permission_ids)))
+        ]
+    )
+    # Рёбра только на уровень ниже — граф без циклов; замыкание пересобирается один раз
+    await RoleIncludeRelation.bulk_create(
+        [
+            RoleIncludeRelation(parent_role_id=parent.id, child_role_id=child.id, created_by=parent.id, modified_by=parent.id)
+            for upper, lower in zip(levels, levels[1:])
+            for parent in upper
+            for child in rnd.sample(lower, min(args.fanout, len(lower)))
+        ]
+    )
+    await rebuild_closure_for_ancestors([role.id for role in roles], connections.get("default"))
+
+    password_hash = await hash_password(PASSWORD)
+    await Company.bulk_create([Company(name=f"Компания {n}") for n in range(args.companies)])
+    companies = await Company.all().values_list("id", flat=True)
+    await User.bulk_create(
+        [
+            User(email=f"user_{n}@bench", password_hash=password_hash, full_name="Bench", is_verified=True)
+            for n in range(args.users)
+        ]
+    )
+    users = await User.all()
+    # Связи — с ролями верхней половины иерархии, чтобы включения раскрывались
+    entry_roles = [role for level in levels[: max(1, args.depth // 2)] for role in level]
+    await UserCompanyRelation.bulk_create(
+        [
+            UserCompanyRelation(
+                user_id=user.id,
+                company_id=rnd.choice(companies),
+                role_id=(role := rnd.choice(entry_roles)).id,
+                application_id=role.application_id,
+            )
+            for user in users
+            for _ in range(args.relations)
+        ]
+    )
+    return users
+
+
+async def measure(fn, calls: list, prepare=None) -> dict:
+    """fn(*call) для каждого набора аргументов; prepare(*call) выполняется вне замера."""
+    timings = []
+    queries = 0
+    for call in calls:
+        if prepare is not None:
+            await prepare(*call)
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            await fn(*call)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries += counter.count
+    cuts = statistics.quantiles(timings, n=100) if len(timings) > 1 else timings * 99
+    return {
+        "calls": len(timings),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "p50_ms": round(cuts[49], 4),
+        "p95_ms": round(cuts[94], 4),
+        "p99_ms": round(cuts[98], 4),
+        "queries_per_call": round(queries / len(timings), 2),
+    }
+
+
+class _NullPublisher:
+    async def publish_event(self, *args, **kwargs) -> None:
+        pass
+
+
+async def run(args) -> dict:
+    rnd = random.Random(args.seed)
+    settings = get_settings_snapshot(ConfigName.TEST)
+    await Tortoise.init(db_url=args.db_url or "sqlite://:memory:", modules={"models": ["app.database.models"]})
+    await Tortoise.generate_schemas()
+    FastAPICache.init(InMemoryBackend())
+
+    users = await build_dataset(args, rnd)
+    sample = [(user,) for user in rnd.sample(users, min(args.samples, len(users)))]
+    await get_policy_graph()
+
+    results = {"get_company_permissions_for_user": await measure(get_company_permissions_for_user, sample)}
+    for backend in ("graph", "sql", "orm"):
+        results[f"resolver.{backend}"] = await measure(
+            lambda user, backend=backend: get_company_permissions_with_masks(user, backend=backend), sample
+        )
+
+    tokens = {}
+    for (user,) in sample:
+        tokens[user.id] = create_access_token(await build_access_claims(user, settings), settings, "access")
+
+    async def verify(user):
+        await verify_token(tokens[user.id], settings)
+
+    async def invalidate(user):
+        await bump_user_permissions_version(user.id)
+
+    results["verify_token.cold"] = await measure(verify, sample, prepare=invalidate)
+    results["verify_token.warm"] = await measure(verify, sample)
+
+    if not args.no_http:
+        from app import create_app
+
+        app = create_app(ConfigName.TEST)
+        app.state.publisher = _NullPublisher()
+        async with AsyncClient(app=app, base_url="http://bench") as client:
+
+            async def login(user):
+                response = await client.post("/api/auth/login", json={"email": user.email, "password": PASSWORD})
+                assert response.status_code == 200, response.text
+
+            results["api.auth.login"] = await measure(login, sample[: args.login_samples])
+
+    await Tortoise.close_connections()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--companies", type=int, default=50)
+    parser.add_argument("--relations", type=int, default=3, help="связей на пользователя")
+    parser.add_argument("--apps", type=int, default=4)
+    parser.add_argument("--depth", type=int, default=4, help="уровней включения ролей")
+    parser.add_argument("--roles-per-level", type=int, default=25)
+    parser.add_argument("--fanout", type=int, default=3, help="включаемых ролей у каждой роли")
+    parser.add_argument("--permissions", type=int, default=200)
+    parser.add_argument("--perms-per-role", type=int, default=8)
+    parser.add_argument("--samples", type=int, default=300, help="вызовов на замер")
+    parser.add_argument("--login-samples", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-url", default=None, help="по умолчанию sqlite в памяти")
+    parser.add_argument("--no-http", action="store_true", help="без замера /api/auth/login")
+    parser.add_argument("--report", default="resolver_report.json")
+    parser.add_argument("--baseline", default=None, help="прошлый отчёт для сравнения p95")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимый рост p95 (доля)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    results = asyncio.run(run(args))
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "dataset": {
+            key: value
+            for key, value in vars(args).items()
+            if key not in ("report", "db_url", "baseline", "tolerance")
+        },
+        "db": (args.db_url or "sqlite://:memory:").split("://", 1)[0],
+        "results": results,
+    }
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    regressions = []
+    print(f"{'measurement':34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'vs base':>8}")
+    for name, row in results.items():
+        line = f"{name:34} {row['p50_ms']:9.3f} {row['p95_ms']:9.3f} {row['p99_ms']:9.3f} {row['queries_per_call']:8.2f}"
+        base = baseline.get(name)
+        if base:
+            change = row["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+            line += f" {change:+8.0%}"
+            if change > args.tolerance or row["queries_per_call"] > base["queries_per_call"]:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    print(f"report: {args.report}")
+    if regressions:
+        raise SystemExit(f"Регрессия относительно {args.baseline}: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Стоимость проверки отзыва токена на один запрос: локальный RevocationStore
+против GET в Redis на каждый запрос.
+
+Без --redis-url меряется только локальная проверка.
+
+Запуск: python -m benchmarks.revocation_bench --revoked 100000 --checks 200000 --redis-url redis://localhost:6379
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.utils.revocation import RevocationStore
+
+
+def _bench_local(store: RevocationStore, jtis: list[str]) -> float:
+    started = time.perf_counter()
+    for jti in jtis:
+        store.is_revoked(jti)
+    return (time.perf_counter() - started) / len(jtis) * 1e9
+
+
+async def _bench_redis(url: str, jtis: list[str]) -> float:
+    import redis.asyncio as redis
+
+    client = redis.from_url(url)
+    started = time.perf_counter()
+    for jti in jtis:
+        await client.exists(f"revoked:{jti}")
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return elapsed / len(jtis) * 1e9
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--revoked", type=int, default=100_000, help="отозванных токенов в наборе")
+    parser.add_argument("--checks", type=int, default=200_000)
+    parser.add_argument("--redis-url")
+    args = parser.parse_args()
+
+    store = RevocationStore()
+    exp = int(time.time()) + 3600
+    revoked = [str(uuid.uuid4()) for _ in range(args.revoked)]
+    for jti in revoked:
+        store.add(jti, exp)
+
+    # Половина проверок — отозванные токены, половина — живые
+    live = [str(uuid.uuid4()) for _ in range(args.checks // 2)]
+    jtis = [jti for pair in zip(revoked * (args.checks // 2 // max(args.revoked, 1) + 1), live) for jti in pair]
+
+    print(f"revoked={args.revoked} checks={len(jtis)}")
+    print(f"local set : {_bench_local(store, jtis):10.0f} ns/request")
+    if args.redis_url:
+        sample = jtis[: min(len(jtis), 20_000)]
+        print(f"redis GET : {await _bench_redis(args.redis_url, sample):10.0f} ns/request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
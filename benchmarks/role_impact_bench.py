@@ -0,0 +1,89 @@
+"""
+Рассылка USER_UPDATED после правки роли, назначенной множеству пользователей:
+build_user_event на каждого (как в маршрутах связей) против find_affected_users
+и build_user_events пачками.
+
+Работает на sqlite в памяти; публикация не меряется — события только собираются.
+
+Запуск: python -m benchmarks.role_impact_bench --users 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from tiacore_lib.rabbit.models import EventType
+from tortoise import Tortoise
+
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    RoleIncludeRelation,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.utils.event_builder import build_user_event, build_user_events
+from app.utils.impact import USER_EVENTS_BATCH_SIZE, find_affected_users
+
+
+async def _seed(users: int) -> Role:
+    application = await Application.create(id="bench_app", name="Bench")
+    company = await Company.create(name="Bench")
+    permissions = [await Permission.create(id=f"perm_{n}", name=f"Право {n}") for n in range(20)]
+    base = await Role.create(name="base", application_id=application.id)
+    holders = [await Role.create(name=f"holder_{n}", application_id=application.id) for n in range(5)]
+    for n, permission in enumerate(permissions):
+        await RolePermissionRelation.create(role=holders[n % 5] if n % 2 else base, permission=permission)
+    for role in holders:
+        await RoleIncludeRelation.create(parent_role=role, child_role=base, created_by=role.id, modified_by=role.id)
+
+    await User.bulk_create(
+        [User(email=f"user_{n}@bench", password_hash="-", full_name="Bench", position="bench") for n in range(users)]
+    )
+    user_ids = await User.all().values_list("id", flat=True)
+    await UserCompanyRelation.bulk_create(
+        [
+            UserCompanyRelation(user_id=uid, company_id=company.id, role_id=holders[n % 5].id, application_id=application.id)
+            for n, uid in enumerate(user_ids)
+        ]
+    )
+    return base
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--per-user-sample", type=int, default=1000)
+    args = parser.parse_args()
+
+    await Tortoise.init(db_url="sqlite://:memory:", modules={"models": ["app.database.models"]})
+    await Tortoise.generate_schemas()
+    FastAPICache.init(InMemoryBackend())
+    base = await _seed(args.users)
+
+    started = time.perf_counter()
+    user_ids = await find_affected_users([base.id])
+    resolve = time.perf_counter() - started
+    for start in range(0, len(user_ids), USER_EVENTS_BATCH_SIZE):
+        await build_user_events(user_ids[start : start + USER_EVENTS_BATCH_SIZE], EventType.USER_UPDATED)
+    batched = time.perf_counter() - started
+
+    sample = await User.filter(id__in=user_ids[: args.per_user_sample])
+    started = time.perf_counter()
+    for user in sample:
+        await build_user_event(user, EventType.USER_UPDATED)
+    per_user = (time.perf_counter() - started) / len(sample) * len(user_ids)
+
+    await Tortoise.close_connections()
+    print(f"affected users={len(user_ids)} (resolved in {resolve * 1000:.0f} ms)")
+    print(f"build_user_event per user  : {per_user:8.2f} s (экстраполяция по {len(sample)})")
+    print(f"build_user_events batches  : {batched:8.2f} s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Запросов в секунду на /api/auth/me: настройки собираются на каждый запрос
+(_load_settings, как раньше) против снимка из get_settings_snapshot.
+
+Работает на тестовой конфигурации: sqlite из TEST_DATABASE_URL и кеш в памяти.
+
+Запуск: python -m benchmarks.settings_bench --requests 2000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from httpx import AsyncClient
+from tiacore_lib.config import get_settings
+from tortoise import Tortoise
+
+from app import create_app
+from app.config import ConfigName, _load_settings, get_settings_snapshot
+from app.database.models import Application, User
+from app.handlers.auth import create_access_token
+
+
+async def _rps(client: AsyncClient, headers: dict, requests: int) -> float:
+    started = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get("/api/auth/me", params={"application_id": "auth_app"}, headers=headers)
+        assert response.status_code == 200, response.text
+    return requests / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    settings = get_settings_snapshot(ConfigName.TEST)
+    await Tortoise.init(db_url=settings.db_url, modules={"models": ["app.database.models"]})
+    await Tortoise.generate_schemas()
+    FastAPICache.init(InMemoryBackend())
+
+    await Application.get_or_create(id="auth_app", defaults={"name": "Auth"})
+    user = await User.get_or_none(email="bench_user")
+    if user is None:
+        user = await User.create_user(email="bench_user", password="bench", full_name="Bench", position="bench")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': user.email}, settings, 'access')}"}
+
+    app = create_app(ConfigName.TEST)
+    async with AsyncClient(app=app, base_url="http://bench") as client:
+        app.dependency_overrides[get_settings] = lambda: _load_settings(ConfigName.TEST)
+        await _rps(client, headers, 50)
+        per_request = await _rps(client, headers, args.requests)
+
+        app.dependency_overrides[get_settings] = lambda: get_settings_snapshot(ConfigName.TEST)
+        await _rps(client, headers, 50)
+        snapshot = await _rps(client, headers, args.requests)
+
+    await Tortoise.close_connections()
+    print(f"requests={args.requests}")
+    print(f"_load_settings per request : {per_request:8.1f} req/s")
+    print(f"settings snapshot          : {snapshot:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
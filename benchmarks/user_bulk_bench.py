@@ -0,0 +1,91 @@
+"""
+Массовое создание пользователей: построчно, как /api/users/add (проверка email,
+хеш, вставка, поиск роли и компании, вставка связи), против provision_users
+(один IN-запрос на партию, хеши в пуле, bulk_create в транзакции).
+
+Стоимость bcrypt по умолчанию снижена (--rounds), чтобы замер показывал работу с БД;
+с боевой стоимостью разница определяется числом воркеров пула хеширования.
+
+Запуск: python -m benchmarks.user_bulk_bench --users 2000 --rounds 4
+"""
+
+import argparse
+import asyncio
+import time
+
+from tortoise import Tortoise
+
+from app.database.models import Application, Company, Role, User, UserCompanyRelation
+from app.handlers.user_bulk import provision_users
+from app.utils.hashing import (
+    BcryptHasher,
+    configure_hash_pool,
+    configure_password_hasher,
+)
+
+
+def _rows(prefix: str, count: int, company_id, application_id) -> list[dict]:
+    return [
+        {
+            "email": f"{prefix}_{n}@bench",
+            "full_name": "Bench",
+            "position": "user",
+            "password": "bench-password",
+            "company_id": str(company_id),
+            "application_id": application_id,
+        }
+        for n in range(count)
+    ]
+
+
+async def _one_by_one(rows: list[dict]) -> None:
+    for row in rows:
+        if await User.get_or_none(email=row["email"]):
+            continue
+        user = await User.create_user(
+            email=row["email"], full_name=row["full_name"], position=row["position"], password=row["password"]
+        )
+        role = await Role.get_or_none(system_name="user", application_id=row["application_id"])
+        company = await Company.get_or_none(id=row["company_id"])
+        if role and company:
+            await UserCompanyRelation.create(user=user, company=company, role=role, application_id=row["application_id"])
+
+
+async def _rows_iter(rows: list[dict]):
+    for row in rows:
+        yield row
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=4, help="стоимость bcrypt")
+    parser.add_argument("--workers", type=int, default=4, help="воркеров пула хеширования")
+    parser.add_argument("--db-url", default="sqlite://:memory:")
+    args = parser.parse_args()
+
+    configure_hash_pool(args.workers, queue_size=64)
+    configure_password_hasher(BcryptHasher(args.rounds))
+    await Tortoise.init(db_url=args.db_url, modules={"models": ["app.database.models"]})
+    await Tortoise.generate_schemas()
+    application = await Application.create(id="bench_app", name="Bench")
+    await Role.create(name="bench_user", system_name="user", application_id=application.id)
+    company = await Company.create(name="Bench")
+
+    started = time.perf_counter()
+    await _one_by_one(_rows("single", args.users, company.id, application.id))
+    single = time.perf_counter() - started
+
+    started = time.perf_counter()
+    response = await provision_users(_rows_iter(_rows("bulk", args.users, company.id, application.id)))
+    bulk = time.perf_counter() - started
+    assert response.created == args.users, response.failed
+
+    await Tortoise.close_connections()
+    print(f"users={args.users} cost={args.rounds} pool=thread x{args.workers}")
+    print(f"one by one : {single:7.2f} s, {args.users / single:8.1f} users/s")
+    print(f"bulk       : {bulk:7.2f} s, {args.users / bulk:8.1f} users/s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
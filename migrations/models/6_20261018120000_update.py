@@ -0,0 +1,31 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "role_closure" (
+    "id" UUID NOT NULL PRIMARY KEY,
+    "depth" INT NOT NULL,
+    "ancestor_id" UUID NOT NULL REFERENCES "user_roles" ("id") ON DELETE CASCADE,
+    "descendant_id" UUID NOT NULL REFERENCES "user_roles" ("id") ON DELETE CASCADE,
+    CONSTRAINT "uid_role_closur_ancesto_5a0618" UNIQUE ("ancestor_id", "descendant_id")
+);
+        CREATE INDEX IF NOT EXISTS "idx_role_closur_descend_ee59d7" ON "role_closure" ("descendant_id");
+        COMMENT ON TABLE "role_closure" IS 'Транзитивное замыкание RoleIncludeRelation: ancestor включает descendant на глубине depth.';
+        INSERT INTO "role_closure" ("id", "ancestor_id", "descendant_id", "depth")
+        WITH RECURSIVE "paths" ("ancestor_id", "descendant_id", "depth") AS (
+            SELECT "parent_role_id", "child_role_id", 1 FROM "role_include_relations"
+            UNION
+            SELECT "p"."ancestor_id", "r"."child_role_id", "p"."depth" + 1
+            FROM "paths" "p"
+            JOIN "role_include_relations" "r" ON "r"."parent_role_id" = "p"."descendant_id"
+        )
+        SELECT gen_random_uuid(), "ancestor_id", "descendant_id", MIN("depth")
+        FROM "paths"
+        WHERE "ancestor_id" <> "descendant_id"
+        GROUP BY "ancestor_id", "descendant_id";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "role_closure";"""
@@ -0,0 +1,14 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "permissions" ADD "bit_index" INT UNIQUE;
+        UPDATE "permissions" AS "p" SET "bit_index" = "n"."rn" - 1
+        FROM (SELECT "id", ROW_NUMBER() OVER (ORDER BY "id") AS "rn" FROM "permissions") AS "n"
+        WHERE "p"."id" = "n"."id";"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "permissions" DROP COLUMN "bit_index";"""
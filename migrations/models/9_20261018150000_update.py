@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "event_outbox" (
+    "id" BIGSERIAL NOT NULL PRIMARY KEY,
+    "event_type" VARCHAR(50) NOT NULL,
+    "user_id" UUID,
+    "payload" JSONB NOT NULL,
+    "attempts" INT NOT NULL DEFAULT 0,
+    "available_at" TIMESTAMPTZ,
+    "last_error" TEXT,
+    "created_at" TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+        COMMENT ON TABLE "event_outbox" IS 'Событие пользователя для брокера, записанное в той же транзакции, что и правка.';"""
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "event_outbox";"""
@@ -10,6 +10,8 @@ from app.config import ConfigName, _load_settings
 from app.database.models import Application, User
 from app.handlers.auth import create_access_token, create_refresh_token, login_handler
 from app.utils.db_helpers import drop_all_tables
+from app.utils.permission_bits import reset_permission_index
+from app.utils.policy_graph import reset_policy_graph
 from tests.test_publisher import NullPublisher
 
 
@@ -45,6 +47,10 @@ async def setup_and_clean_db(test_settings):
     )
 
     await Tortoise.generate_schemas()
+    # Битовые индексы разрешений и граф ролей в каждом тесте строятся заново
+    reset_permission_index()
+    reset_policy_graph()
+    FastAPICache.init(InMemoryBackend())
 
     yield
     await drop_all_tables()  # 💥 удаляем все таблицы
@@ -0,0 +1,87 @@
+import pytest
+from tortoise import connections
+
+from app.database.models import (
+    Company,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.handlers.access_check import check_permission
+from app.handlers.cache_handler import bump_policy_version
+
+
+@pytest.mark.asyncio
+async def test_check_endpoints(
+    test_app,
+    jwt_token_admin: dict,
+    seed_admin: User,
+    seed_user: User,
+    seed_company: Company,
+    seed_relation: UserCompanyRelation,
+    seed_role_permission_relation: RolePermissionRelation,
+):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    check = {
+        "user_id": str(seed_user.id),
+        "company_id": str(seed_company.id),
+        "application_id": "test_app",
+        "permission": "test_permission",
+    }
+
+    response = await test_app.post("/api/auth/check", json=check, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json() == {"allowed": True, "restrictions": []}
+
+    checks = [
+        check,
+        {**check, "permission": "missing_permission"},
+        {**check, "application_id": "other_app"},
+        {**check, "user_id": str(seed_admin.id)},
+    ]
+    response = await test_app.post("/api/auth/check/batch", json={"checks": checks}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["results"] == [True, False, False, True]
+
+
+@pytest.mark.asyncio
+async def test_check_requires_superadmin(test_app, jwt_token_user: dict, seed_user: User, seed_company: Company):
+    check = {
+        "user_id": str(seed_user.id),
+        "company_id": str(seed_company.id),
+        "application_id": "test_app",
+        "permission": "test_permission",
+    }
+    response = await test_app.post(
+        "/api/auth/check", json=check, headers={"Authorization": f"Bearer {jwt_token_user['access_token']}"}
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_repeated_check_served_from_memory(
+    seed_user: User,
+    seed_company: Company,
+    seed_relation: UserCompanyRelation,
+    seed_role_permission_relation: RolePermissionRelation,
+    monkeypatch,
+):
+    args = (seed_user.id, seed_company.id, "test_app", "test_permission")
+    assert await check_permission(*args) is True
+
+    queries = []
+    conn = connections.get("default")
+    original = conn.execute_query
+
+    async def counting(*a, **kw):
+        queries.append(a[0])
+        return await original(*a, **kw)
+
+    monkeypatch.setattr(conn, "execute_query", counting)
+    assert await check_permission(*args) is True
+    assert queries == []
+
+    # Смена версии политики — права перечитываются
+    await seed_role_permission_relation.delete()
+    await bump_policy_version()
+    assert await check_permission(*args) is False
@@ -0,0 +1,204 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.database.models import (
+    ApiToken,
+    Application,
+    Company,
+    Permission,
+    Role,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.handlers.token import generate_api_token
+
+
+def _lookups(result: str) -> float:
+    return REGISTRY.get_sample_value("api_token_lookups_total", {"result": result}) or 0.0
+
+
+async def _issue(user: User, application: Application, settings, expires_at=None) -> str:
+    raw_token, prefix, token_hash = generate_api_token(settings)
+    await ApiToken.create(
+        user=user,
+        application=application,
+        prefix=prefix,
+        token_hash=token_hash,
+        expires_at=expires_at,
+    )
+    return raw_token
+
+
+async def _me(client, token: str, application: Application):
+    return await client.get(
+        "/api/auth/me",
+        params={"application_id": application.id},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_api_token_authenticates_from_cache(test_app, seed_user: User, seed_application: Application, test_settings):
+    raw_token = await _issue(seed_user, seed_application, test_settings)
+    from_db, from_cache = _lookups("db"), _lookups("cache")
+
+    first = await _me(test_app, raw_token, seed_application)
+    second = await _me(test_app, raw_token, seed_application)
+
+    assert first.status_code == 200, first.text
+    assert second.json()["email"] == seed_user.email
+    assert _lookups("db") == from_db + 1
+    assert _lookups("cache") == from_cache + 1
+
+
+@pytest.mark.asyncio
+async def test_api_token_rejected_when_forged_or_expired(
+    test_app, seed_user: User, seed_application: Application, test_settings
+):
+    raw_token = await _issue(seed_user, seed_application, test_settings)
+    forged = raw_token[:-4] + ("AAAA" if not raw_token.endswith("AAAA") else "BBBB")
+    assert (await _me(test_app, forged, seed_application)).status_code == 401
+    assert (await _me(test_app, "tia_unknown_secret", seed_application)).status_code == 401
+
+    expired = await _issue(
+        seed_user, seed_application, test_settings, expires_at=datetime.now(timezone.utc) - timedelta(minutes=1)
+    )
+    assert (await _me(test_app, expired, seed_application)).status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_deleted_api_token_stops_working(
+    test_app, jwt_token_admin, seed_user: User, seed_application: Application
+):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = await test_app.post(
+        "/api/api-tokens/add",
+        headers=headers,
+        json={"user_id": str(seed_user.id), "application_id": seed_application.id, "comment": "ci"},
+    )
+    assert response.status_code == 201, response.text
+    raw_token = response.json()["api_token"]
+    assert raw_token.startswith("tia_")
+    assert (await _me(test_app, raw_token, seed_application)).status_code == 200
+
+    response = await test_app.delete(f"/api/api-tokens/{response.json()['api_token_id']}", headers=headers)
+    assert response.status_code == 204
+
+    assert (await _me(test_app, raw_token, seed_application)).status_code == 401
+
+
+async def _member(email: str, company: Company, role: Role) -> User:
+    user = await User.create_user(email=email, password="123", full_name=email, position="-", is_verified=True)
+    await UserCompanyRelation.create(user=user, company=company, role=role, application_id=role.application_id)  # type: ignore
+    return user
+
+
+@pytest.fixture
+async def token_companies(seed_application: Application):
+    """Две компании; manager в home может выпускать и удалять API-токены."""
+    home = await Company.create(name="Home")
+    foreign = await Company.create(name="Foreign")
+    manager_role = await Role.create(name="manager", system_name="manager", application_id=seed_application.id)
+    viewer_role = await Role.create(name="viewer", system_name="viewer", application_id=seed_application.id)
+    for permission_id in ("add_api_token", "delete_api_token"):
+        permission = await Permission.create(id=permission_id, name=permission_id)
+        await RolePermissionRelation.create(role=manager_role, permission=permission)
+    return {
+        "home": home,
+        "foreign": foreign,
+        "manager": await _member("manager@test", home, manager_role),
+        "colleague": await _member("colleague@test", home, viewer_role),
+        "outsider": await _member("outsider@test", foreign, viewer_role),
+    }
+
+
+async def _add_token(client, token: str, user: User, application: Application, company: Company | None):
+    return await client.post(
+        "/api/api-tokens/add",
+        params={"company": str(company.id)} if company else {},
+        headers={"Authorization": f"Bearer {token}"},
+        json={"user_id": str(user.id), "application_id": application.id},
+    )
+
+
+@pytest.mark.asyncio
+async def test_api_token_issued_by_company_permission(
+    test_app, token_companies, seed_application: Application, get_token_for_user
+):
+    token = await get_token_for_user(token_companies["manager"])
+    response = await _add_token(
+        test_app, token, token_companies["colleague"], seed_application, token_companies["home"]
+    )
+    assert response.status_code == 201, response.text
+
+
+@pytest.mark.asyncio
+async def test_api_token_not_issued_without_own_permission(
+    test_app, token_companies, seed_user: User, seed_application: Application, get_token_for_user
+):
+    home, foreign = token_companies["home"], token_companies["foreign"]
+    colleague, outsider = token_companies["colleague"], token_companies["outsider"]
+
+    # Не член компании: связь только с foreign, а компания в запросе — home
+    response = await _add_token(test_app, await get_token_for_user(outsider), colleague, seed_application, home)
+    assert response.status_code == 403
+    # Пользователь без связей
+    no_relations = await User.create_user(
+        email="lonely@test", password="123", full_name="-", position="-", is_verified=True
+    )
+    for company in (home, None):
+        response = await _add_token(test_app, await get_token_for_user(no_relations), colleague, seed_application, company)
+        assert response.status_code == 403
+    # Владелец токена из чужой компании
+    manager_token = await get_token_for_user(token_companies["manager"])
+    for company in (home, foreign):
+        response = await _add_token(test_app, manager_token, outsider, seed_application, company)
+        assert response.status_code == 403
+    assert await ApiToken.all().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_api_token_deleted_only_by_owner_or_company(
+    test_app, token_companies, seed_application: Application, test_settings, get_token_for_user
+):
+    raw_token = await _issue(token_companies["colleague"], seed_application, test_settings)
+    token_id = (await ApiToken.get()).id
+    no_relations = await User.create_user(
+        email="lonely@test", password="123", full_name="-", position="-", is_verified=True
+    )
+
+    for caller, company in ((no_relations, None), (token_companies["outsider"], token_companies["foreign"])):
+        response = await test_app.delete(
+            f"/api/api-tokens/{token_id}",
+            params={"company": str(company.id)} if company else {},
+            headers={"Authorization": f"Bearer {await get_token_for_user(caller)}"},
+        )
+        assert response.status_code == 403
+    assert (await _me(test_app, raw_token, seed_application)).status_code == 200
+
+    response = await test_app.delete(
+        f"/api/api-tokens/{token_id}",
+        params={"company": str(token_companies["home"].id)},
+        headers={"Authorization": f"Bearer {await get_token_for_user(token_companies['manager'])}"},
+    )
+    assert response.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_api_token_limited_to_its_application(
+    test_app, token_companies, seed_application: Application, test_settings
+):
+    other = await Application.create(id="other_app", name="Other")
+    raw_token = await _issue(token_companies["manager"], other, test_settings)
+
+    response = await _me(test_app, raw_token, seed_application)
+    assert response.status_code == 200, response.text
+    assert response.json()["permissions"] == {}
+    # Права приложения токена, а не все права владельца
+    response = await _add_token(
+        test_app, raw_token, token_companies["colleague"], seed_application, token_companies["home"]
+    )
+    assert response.status_code == 403
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.database.models import User
+from app.handlers.auth import login_handler
+from app.utils.hashing import (
+    BcryptHasher,
+    HashPool,
+    _checkpw,
+    calibrate_bcrypt_rounds,
+    configure_password_hasher,
+    get_password_hasher,
+    hash_password,
+    verify_password,
+)
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_roundtrip():
+    hashed = await hash_password("secret")
+    assert await verify_password("secret", hashed)
+    assert not await verify_password("wrong", hashed)
+
+
+@pytest.mark.asyncio
+async def test_user_password_methods_use_pool(seed_user: User):
+    assert await seed_user.check_password("qweasdzcx")
+    await seed_user.update_password("new_password")
+    assert await seed_user.check_password("new_password")
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_overflow():
+    pool = HashPool(workers=1, queue_size=1)
+    hashed = await hash_password("secret")
+    try:
+        results = await asyncio.gather(
+            *(pool.run("verify", _checkpw, "secret", hashed) for _ in range(3)),
+            return_exceptions=True,
+        )
+    finally:
+        pool.shutdown()
+
+    rejected = [r for r in results if isinstance(r, HTTPException)]
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 503
+    assert results.count(True) == 2
+
+
+def test_bcrypt_needs_rehash_off_target_cost():
+    hasher = BcryptHasher(5)
+    hashed, _ = hasher.hash("secret")
+
+    assert hashed.startswith("$2b$05$")
+    assert not hasher.needs_rehash(hashed)
+    assert BcryptHasher(4).needs_rehash(hashed)
+    assert BcryptHasher(6).needs_rehash(hashed)
+    assert hasher.needs_rehash("not-a-bcrypt-hash")
+
+
+def test_calibration_stays_within_bounds():
+    assert calibrate_bcrypt_rounds(0, min_rounds=4, max_rounds=6) == 4
+    assert calibrate_bcrypt_rounds(60_000, min_rounds=4, max_rounds=6) == 6
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_with_current_cost(seed_user: User):
+    previous = get_password_hasher()
+    configure_password_hasher(BcryptHasher(5))
+    try:
+        user, _ = await login_handler(seed_user.email, "qweasdzcx")
+    finally:
+        configure_password_hasher(previous)
+
+    stored = await User.get(id=seed_user.id)
+    assert stored.password_hash.startswith("$2b$05$")
+    assert stored.password_hash != seed_user.password_hash
+    assert await stored.check_password("qweasdzcx")
@@ -0,0 +1,107 @@
+import pytest
+
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.handlers.auth import create_access_token, verify_token
+from app.handlers.depends import context_has_permission, get_current_context
+from app.utils.identity import parse_permissions
+
+
+def test_parse_permissions_builds_frozen_sets():
+    parsed = parse_permissions(
+        {"crm_app": {"c1": [{"role": "a", "permissions": ["x", "y"]}, {"role": "b", "permissions": ["y", "z"]}]}},
+        {"crm_app": {"c1": 7}},
+    )
+    company = parsed["crm_app"]["c1"]
+
+    assert company.permissions == frozenset({"x", "y", "z"})
+    assert [block.role for block in company.blocks] == ["a", "b"]
+    assert company.mask == 7
+    with pytest.raises(TypeError):
+        parsed["crm_app"]["c2"] = company  # type: ignore[index]
+
+
+def test_restrictions_apply_only_when_every_role_restricts():
+    parsed = parse_permissions(
+        {
+            "crm_app": {
+                "c1": [
+                    {"role": "a", "permissions": ["x", "y"], "restrictions": {"x": ["own"], "y": ["own"]}},
+                    {"role": "b", "permissions": ["y"], "restrictions": {"y": ["branch"]}},
+                    {"role": "c", "permissions": ["x"]},
+                ]
+            }
+        }
+    )
+    company = parsed["crm_app"]["c1"]
+
+    assert company.blocks[0].restrictions["x"] == frozenset({"own"})
+    # x выдано ролью c без запрета, y ограничено обеими ролями
+    assert dict(company.restrictions) == {"y": frozenset({"own", "branch"})}
+
+
+@pytest.mark.asyncio
+async def test_context_uses_identity_without_relation_query(
+    test_app,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+    test_settings,
+):
+    permission = await Permission.create(id="view_company", name="Просмотр компании")
+    role = await Role.create(name="viewer", application_id=seed_application.id)
+    await RolePermissionRelation.create(role=role, permission=permission)
+    await UserCompanyRelation.create(user=seed_user, company=seed_company, role=role, application=seed_application)
+
+    token = create_access_token({"sub": seed_user.email}, test_settings, "access")
+    token_data = await verify_token(token, test_settings)
+    assert token_data["has_relations"] is True
+
+    # Связи удалены после выдачи identity: контекст берёт флаг из неё, а не из БД
+    await UserCompanyRelation.filter(user_id=seed_user.id).delete()
+    context = await get_current_context(token_data, seed_company.id, test_settings)
+
+    assert context["has_relations"] is True
+    assert "view_company" in context["permissions"]
+    assert context["raw_permission_blocks"][0].role == "viewer"
+    assert context["permission_mask"] != 0
+
+
+@pytest.mark.asyncio
+async def test_permission_checked_by_context_bit(
+    test_app,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+    test_settings,
+):
+    granted = await Permission.create(id="view_company", name="Просмотр компании")
+    await Permission.create(id="edit_company", name="Изменение компании")
+    role = await Role.create(name="viewer", application_id=seed_application.id)
+    await RolePermissionRelation.create(role=role, permission=granted)
+    await UserCompanyRelation.create(user=seed_user, company=seed_company, role=role, application=seed_application)
+
+    token_data = await verify_token(create_access_token({"sub": seed_user.email}, test_settings, "access"), test_settings)
+    context = await get_current_context(token_data, seed_company.id, test_settings)
+
+    assert await context_has_permission(context, "view_company")
+    assert not await context_has_permission(context, "edit_company")
+    # Разрешения нет в индексе — проверка по множеству прав
+    assert not await context_has_permission(context, "unknown_permission")
+
+
+@pytest.mark.asyncio
+async def test_superadmin_context_has_permission_mask(test_app, seed_admin: User, seed_company: Company, test_settings):
+    await Permission.create(id="view_company", name="Просмотр компании")
+
+    token_data = await verify_token(create_access_token({"sub": seed_admin.email}, test_settings, "access"), test_settings)
+    context = await get_current_context(token_data, seed_company.id, test_settings)
+
+    assert await context_has_permission(context, "view_company")
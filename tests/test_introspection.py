@@ -0,0 +1,78 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from app.database.models import Application, User
+from app.handlers.auth import (
+    create_access_token,
+    create_refresh_token,
+    issue_token_pair,
+)
+
+
+def _metric(name: str) -> float:
+    return REGISTRY.get_sample_value(name, {}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_introspect_batch(
+    test_app,
+    seed_user: User,
+    seed_relation,
+    seed_application: Application,
+    jwt_token_admin,
+    test_settings,
+):
+    user_tokens = [create_access_token({"sub": seed_user.email}, test_settings, "access") for _ in range(3)]
+    refresh = create_refresh_token({"sub": seed_user.email}, test_settings, "refresh")
+    tokens = [*user_tokens, user_tokens[0], "garbage", refresh, jwt_token_admin["access_token"]]
+    computed = _metric("permissions_cache_misses_total") + _metric("permissions_cache_hits_total")
+
+    response = await test_app.post(
+        "/api/auth/introspect",
+        json={"tokens": tokens, "application_id": seed_application.id},
+        headers={"Authorization": f"Bearer {jwt_token_admin['access_token']}"},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(tokens)
+    assert [r["active"] for r in results] == [True, True, True, True, False, False, True]
+    assert {r["user_id"] for r in results[:4]} == {str(seed_user.id)}
+    assert results[0]["permissions"] == {}
+    assert results[6]["is_superadmin"] is True and results[6]["permissions"] is None
+    # Права пользователя считаются один раз на весь пакет
+    assert _metric("permissions_cache_misses_total") + _metric("permissions_cache_hits_total") == computed + 1
+
+
+@pytest.mark.asyncio
+async def test_introspect_requires_superadmin(test_app, jwt_token_user, seed_application: Application):
+    response = await test_app.post(
+        "/api/auth/introspect",
+        json={"tokens": [jwt_token_user["access_token"]], "application_id": seed_application.id},
+        headers={"Authorization": f"Bearer {jwt_token_user['access_token']}"},
+    )
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_introspect_rejects_logged_out_session(
+    test_app, seed_user: User, seed_application: Application, jwt_token_admin, test_settings
+):
+    access_token, refresh_token = await issue_token_pair(seed_user, test_settings)
+    response = await test_app.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200, response.text
+    # Выход по новому access-токену отзывает всю сессию, в том числе старый access-токен
+    response = await test_app.post(
+        "/api/auth/logout", headers={"Authorization": f"Bearer {response.json()['access_token']}"}
+    )
+    assert response.status_code == 200
+
+    response = await test_app.post(
+        "/api/auth/introspect",
+        json={"tokens": [access_token], "application_id": seed_application.id},
+        headers={"Authorization": f"Bearer {jwt_token_admin['access_token']}"},
+    )
+    assert response.status_code == 200
+    [result] = response.json()["results"]
+    assert not result["active"]
+    assert result["error"] == "Token has been revoked"
@@ -0,0 +1,70 @@
+import pytest
+import rsa
+from fastapi import HTTPException, Response
+from jose import jwt
+
+from app.database.models import User
+from app.handlers.auth import create_access_token, verify_token
+from app.routes.jwks_route import get_jwks
+from app.utils.jwt_keys import reset_keyrings
+
+
+@pytest.fixture
+def keys_dir(tmp_path):
+    for kid in ("2026-01", "2026-02"):
+        _, private = rsa.newkeys(1024)
+        (tmp_path / f"{kid}.pem").write_bytes(private.save_pkcs1())
+    yield tmp_path
+    reset_keyrings()
+
+
+def _settings(test_settings, keys_dir, kid=None):
+    return test_settings.model_copy(update={"JWT_KEYS_DIR": str(keys_dir), "JWT_SIGNING_KID": kid})
+
+
+@pytest.mark.asyncio
+async def test_access_token_signed_with_active_kid(test_app, seed_user: User, test_settings, keys_dir):
+    settings = _settings(test_settings, keys_dir)
+    token = create_access_token({"sub": seed_user.email}, settings, "access")
+
+    assert jwt.get_unverified_header(token) == {"alg": "RS256", "kid": "2026-02", "typ": "JWT"}
+    token_data = await verify_token(token, settings)
+    assert token_data["user_id"] == str(seed_user.id)
+
+    jwks = await get_jwks(Response(), settings)
+    assert [key["kid"] for key in jwks["keys"]] == ["2026-01", "2026-02"]
+    assert all("d" not in key for key in jwks["keys"])
+
+
+@pytest.mark.asyncio
+async def test_rotation_keeps_old_tokens_until_key_removed(test_app, seed_user: User, test_settings, keys_dir):
+    old_token = create_access_token({"sub": seed_user.email}, _settings(test_settings, keys_dir, "2026-01"), "access")
+    settings = _settings(test_settings, keys_dir, "2026-02")
+
+    assert (await verify_token(old_token, settings))["email"] == seed_user.email
+
+    (keys_dir / "2026-01.pem").unlink()
+    reset_keyrings()
+    with pytest.raises(HTTPException) as exc:
+        await verify_token(old_token, settings)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_hs256_tokens_accepted_after_switch(test_app, seed_user: User, test_settings, keys_dir):
+    legacy_token = create_access_token({"sub": seed_user.email}, test_settings, "access")
+    token_data = await verify_token(legacy_token, _settings(test_settings, keys_dir))
+    assert token_data["email"] == seed_user.email
+
+
+@pytest.mark.asyncio
+async def test_hs256_tokens_rejected_when_disabled(test_app, seed_user: User, test_settings, keys_dir):
+    legacy_token = create_access_token({"sub": seed_user.email}, test_settings, "access")
+    settings = _settings(test_settings, keys_dir).model_copy(update={"JWT_ACCEPT_HS256": False})
+
+    with pytest.raises(HTTPException) as exc:
+        await verify_token(legacy_token, settings)
+    assert exc.value.status_code == 401
+    # Токены новой подписи по-прежнему принимаются
+    token = create_access_token({"sub": seed_user.email}, settings, "access")
+    assert (await verify_token(token, settings))["email"] == seed_user.email
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from tiacore_lib.rabbit.models import EventType
+
+from app.database.models import (
+    Application,
+    Company,
+    OutboxEvent,
+    Role,
+    User,
+    UserCompanyRelation,
+)
+from app.utils.outbox import dispatch_outbox_batch, enqueue_user_event
+
+
+class RecordingPublisher:
+    def __init__(self):
+        self.events = []
+
+    async def publish_event(self, event) -> None:
+        self.events.append(event)
+
+
+class FailingPublisher:
+    async def publish_event(self, event) -> None:
+        raise ConnectionError("broker unavailable")
+
+
+@pytest.mark.asyncio
+async def test_relation_change_writes_outbox_row(
+    test_app,
+    jwt_token_admin,
+    seed_user: User,
+    seed_company: Company,
+    seed_role_admin: Role,
+    seed_application: Application,
+):
+    await OutboxEvent.all().delete()
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    response = await test_app.post(
+        "/api/user-company-relations/add",
+        headers=headers,
+        json={
+            "user_id": str(seed_user.id),
+            "company_id": str(seed_company.id),
+            "role_id": str(seed_role_admin.id),
+            "application_id": seed_application.id,
+        },
+    )
+    assert response.status_code == 201, response.text
+
+    rows = await OutboxEvent.filter(event_type=EventType.USER_UPDATED.value)
+    assert [str(row.user_id) for row in rows] == [str(seed_user.id)]
+    # Тело собрано в транзакции правки — новая связь в нём уже есть
+    assert rows[0].payload["payload"]["companies"] == [str(seed_company.id)]
+
+
+@pytest.mark.asyncio
+async def test_dispatch_sends_one_message_per_row(seed_user: User):
+    await OutboxEvent.all().delete()
+    await enqueue_user_event(EventType.USER_LOGGED_IN, user_id=seed_user.id)
+    await enqueue_user_event(EventType.USER_LOGGED_IN, user_id=seed_user.id)
+    await enqueue_user_event(EventType.USER_LOGGED_OUT, email="gone@test")
+    publisher = RecordingPublisher()
+
+    assert await dispatch_outbox_batch(publisher) == 3
+
+    assert [(event.event, event.email) for event in publisher.events] == [
+        (EventType.USER_LOGGED_IN, seed_user.email),
+        (EventType.USER_LOGGED_IN, seed_user.email),
+        (EventType.USER_LOGGED_OUT, "gone@test"),
+    ]
+    assert await OutboxEvent.all().count() == 0
+
+
+@pytest.mark.asyncio
+async def test_payload_reflects_state_at_enqueue(
+    seed_user: User, seed_company: Company, seed_role_admin: Role, seed_application: Application
+):
+    await OutboxEvent.all().delete()
+    await enqueue_user_event(EventType.USER_UPDATED, user_id=seed_user.id)
+    # Правка после записи в outbox в уже поставленное событие не попадает
+    await UserCompanyRelation.create(
+        user=seed_user, company=seed_company, role=seed_role_admin, application=seed_application
+    )
+    publisher = RecordingPublisher()
+
+    assert await dispatch_outbox_batch(publisher) == 1
+    assert publisher.events[0].payload.user_id == str(seed_user.id)
+    assert publisher.events[0].payload.companies == []
+
+
+@pytest.mark.asyncio
+async def test_failed_publish_is_deferred(seed_user: User):
+    await OutboxEvent.all().delete()
+    await enqueue_user_event(EventType.USER_UPDATED, user_id=seed_user.id)
+
+    assert await dispatch_outbox_batch(FailingPublisher()) == 1
+
+    row = await OutboxEvent.get()
+    assert row.attempts == 1
+    assert row.available_at > datetime.now(timezone.utc)
+    assert "broker unavailable" in row.last_error
+    # Отложенная строка не берётся до available_at
+    assert await dispatch_outbox_batch(RecordingPublisher()) == 0
+
+
+@pytest.mark.asyncio
+async def test_claimed_rows_are_leased(seed_user: User):
+    await OutboxEvent.all().delete()
+    await enqueue_user_event(EventType.USER_UPDATED, user_id=seed_user.id)
+    claimed = asyncio.Event()
+    release = asyncio.Event()
+
+    class SlowPublisher:
+        async def publish_event(self, event) -> None:
+            claimed.set()
+            await release.wait()
+
+    first = asyncio.create_task(dispatch_outbox_batch(SlowPublisher()))
+    await claimed.wait()
+    # Пока первая партия публикуется, строка в аренде и второму диспетчеру не достаётся
+    assert await dispatch_outbox_batch(RecordingPublisher()) == 0
+    release.set()
+    assert await first == 1
+    assert await OutboxEvent.all().count() == 0
@@ -0,0 +1,100 @@
+import json
+import random
+
+import pytest
+
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Restriction,
+    Role,
+    RoleIncludeRelation,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.utils.permissions_get import (
+    get_company_permissions_by_application,
+    get_company_permissions_with_masks,
+)
+
+
+async def _random_rbac(rnd: random.Random, user: User) -> None:
+    """Случайный DAG ролей двух приложений, права ролей и связи пользователя с компаниями."""
+    apps = [await Application.create(id=f"app_{n}", name=f"App {n}") for n in range(2)]
+    permissions = [await Permission.create(id=f"perm_{n}", name=f"Право {n}") for n in range(12)]
+    roles = [await Role.create(name=f"role_{n}", application_id=rnd.choice(apps).id) for n in range(10)]
+
+    for role in roles:
+        for permission in rnd.sample(permissions, rnd.randint(0, 4)):
+            await RolePermissionRelation.create(role=role, permission=permission)
+
+    # Рёбра только «вперёд» по списку — граф без циклов
+    for i, parent in enumerate(roles):
+        for child in roles[i + 1 :]:
+            if rnd.random() < 0.25:
+                await RoleIncludeRelation.create(
+                    parent_role=parent, child_role=child, created_by=user.id, modified_by=user.id
+                )
+
+    companies = [await Company.create(name=f"Компания {n}") for n in range(3)]
+    for _ in range(rnd.randint(1, 4)):
+        await UserCompanyRelation.create(
+            user=user, company=rnd.choice(companies), role=rnd.choice(roles), application=rnd.choice(apps)
+        )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", range(8))
+async def test_backends_match_orm(seed: int, seed_user: User):
+    await _random_rbac(random.Random(seed), seed_user)
+
+    orm = json.dumps(await get_company_permissions_with_masks(seed_user, backend="orm"), sort_keys=True)
+    for backend in ("sql", "graph"):
+        result = await get_company_permissions_with_masks(seed_user, backend=backend)
+        assert json.dumps(result, sort_keys=True) == orm, backend
+
+
+@pytest.mark.asyncio
+async def test_backends_agree_without_relations(seed_user: User):
+    for backend in ("orm", "sql", "graph"):
+        assert await get_company_permissions_with_masks(seed_user, backend=backend) == ({}, {})
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", range(4))
+async def test_application_scoped_resolution_matches_full(seed: int, seed_user: User):
+    await _random_rbac(random.Random(seed), seed_user)
+
+    full, _ = await get_company_permissions_with_masks(seed_user, backend="orm")
+    for backend in ("orm", "sql", "graph"):
+        for app_id in ("app_0", "app_1", "missing_app"):
+            scoped = await get_company_permissions_by_application(seed_user, app_id, backend=backend)
+            assert json.loads(json.dumps(scoped)) == {app_id: json.loads(json.dumps(full.get(app_id, {})))}, backend
+
+
+@pytest.mark.asyncio
+async def test_restrictions_resolved_with_permissions(seed_user: User):
+    application = await Application.create(id="crm_app", name="CRM")
+    company = await Company.create(name="Компания")
+    own = await Restriction.create(id="own_only", name="Только свои")
+    view = await Permission.create(id="view_deal", name="Просмотр сделки")
+    edit = await Permission.create(id="edit_deal", name="Правка сделки")
+    manager = await Role.create(name="manager", application_id=application.id)
+    viewer = await Role.create(name="viewer", application_id=application.id)
+    await RolePermissionRelation.create(role=viewer, permission=view, restriction=own)
+    await RolePermissionRelation.create(role=manager, permission=edit, restriction=own)
+    # Та же правка без запрета — запрет у роли manager не действует
+    await RolePermissionRelation.create(role=manager, permission=edit)
+    await RoleIncludeRelation.create(
+        parent_role=manager, child_role=viewer, created_by=seed_user.id, modified_by=seed_user.id
+    )
+    await UserCompanyRelation.create(user=seed_user, company=company, role=manager, application=application)
+
+    for backend in ("orm", "sql", "graph"):
+        permissions, _ = await get_company_permissions_with_masks(seed_user, backend=backend)
+        assert permissions["crm_app"][str(company.id)] == [
+            {"role": "manager", "permissions": ["edit_deal"]},
+            {"role": "viewer", "permissions": ["view_deal"], "restrictions": {"view_deal": ["own_only"]}},
+        ], backend
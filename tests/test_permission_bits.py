@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from tortoise.exceptions import IntegrityError
+
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.utils.permission_bits import PermissionIndex, get_permission_index
+from app.utils.permissions_get import get_company_permissions_with_masks
+
+
+def test_index_roundtrip():
+    index = PermissionIndex({"view_user": 0, "edit_user": 1, "add_user": 5})
+    mask = index.mask_of(["view_user", "add_user", "unknown"])
+
+    assert mask == 0b100001
+    assert index.decode(mask) == ["add_user", "view_user"]
+    assert index.decode(0) == []
+
+
+@pytest.mark.asyncio
+async def test_bit_index_assigned_once():
+    first = await Permission.create(id="first_permission", name="Первое")
+    second = await Permission.create(id="second_permission", name="Второе")
+    assert second.bit_index == first.bit_index + 1  # type: ignore[operator]
+
+    first.name = "Переименованное"
+    await first.save()
+    await first.refresh_from_db()
+    assert first.bit_index == second.bit_index - 1  # type: ignore[operator]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_permissions_get_distinct_bits():
+    permissions = await asyncio.gather(
+        *(Permission.create(id=f"parallel_{n}", name="Параллельное") for n in range(8))
+    )
+    assert sorted(permission.bit_index for permission in permissions) == list(range(8))
+
+    # Конфликт по первичному ключу не повторяется и не съедает бит
+    with pytest.raises(IntegrityError):
+        await Permission.create(id="parallel_0", name="Дубликат")
+    assert await Permission.filter(bit_index__isnull=False).count() == 8
+
+
+@pytest.mark.asyncio
+async def test_masks_match_permission_lists(
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+):
+    view = await Permission.create(id="view_user", name="Просмотр")
+    edit = await Permission.create(id="edit_user", name="Редактирование")
+    viewer = await Role.create(name="viewer", application_id="auth_app")
+    editor = await Role.create(name="editor", application_id="auth_app")
+    await RolePermissionRelation.create(role=viewer, permission=view)
+    await RolePermissionRelation.create(role=editor, permission=edit)
+    for role in (viewer, editor):
+        await UserCompanyRelation.create(user=seed_user, company=seed_company, role=role, application=seed_application)
+
+    permissions, masks = await get_company_permissions_with_masks(seed_user)
+    index = await get_permission_index()
+    company_id = str(seed_company.id)
+
+    flat = {perm for block in permissions["auth_app"][company_id] for perm in block["permissions"]}  # type: ignore[index]
+    assert flat == {"view_user", "edit_user"}
+    assert masks["auth_app"][company_id] == index.mask_of(flat)  # type: ignore[index]
@@ -0,0 +1,222 @@
+import asyncio
+
+import pytest
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from prometheus_client import REGISTRY
+
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.handlers.cache_handler import (
+    bump_policy_version,
+    bump_user_permissions_version,
+    get_permissions_version,
+)
+from app.utils.permissions_cache import (
+    get_cached_company_permissions,
+    get_cached_permission_snapshot,
+    update_snapshot_after_relation_change,
+)
+from app.utils.permissions_get import get_company_permissions_with_masks
+
+
+def _metric(name: str, labels: dict | None = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_served_from_cache(test_app, seed_user: User, seed_relation):
+    hits = _metric("permissions_cache_hits_total")
+    misses = _metric("permissions_cache_misses_total")
+
+    first = await get_cached_company_permissions(seed_user)
+    second = await get_cached_company_permissions(seed_user)
+
+    assert first == second
+    assert _metric("permissions_cache_misses_total") == misses + 1
+    assert _metric("permissions_cache_hits_total") == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_user_bump_invalidates_snapshot(
+    test_app,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+):
+    permission = await Permission.create(id="cached_permission", name="Кэшируемое разрешение")
+    role = await Role.create(name="cache_role", application_id=seed_application.id)
+    await RolePermissionRelation.create(role=role, permission=permission)
+
+    assert await get_cached_company_permissions(seed_user) == {}
+
+    await UserCompanyRelation.create(user=seed_user, company=seed_company, role=role, application=seed_application)
+    # Без инвалидации отдаётся прежний снимок
+    assert await get_cached_company_permissions(seed_user) == {}
+
+    invalidations = _metric("permissions_cache_invalidations_total", {"scope": "user"})
+    await bump_user_permissions_version(seed_user.id)
+    assert _metric("permissions_cache_invalidations_total", {"scope": "user"}) == invalidations + 1
+
+    permissions = await get_cached_company_permissions(seed_user)
+    blocks = permissions[seed_application.id][str(seed_company.id)]
+    assert blocks == [{"role": "cache_role", "permissions": ["cached_permission"]}]
+
+
+@pytest.mark.asyncio
+async def test_policy_bump_invalidates_snapshot(test_app, seed_user: User, seed_relation, seed_role_admin: Role):
+    assert await get_cached_company_permissions(seed_user) == {}
+
+    permission = await Permission.create(id="policy_permission", name="Разрешение политики")
+    await RolePermissionRelation.create(role=seed_role_admin, permission=permission)
+    await bump_policy_version()
+
+    permissions = await get_cached_company_permissions(seed_user)
+    company_id = str(seed_relation.company_id)
+    assert permissions["test_app"][company_id][0]["permissions"] == ["policy_permission"]
+
+
+@pytest.mark.asyncio
+async def test_relation_route_invalidates_snapshot(
+    test_app,
+    jwt_token_admin,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+    seed_role_admin: Role,
+):
+    assert await get_cached_company_permissions(seed_user) == {}
+    permission = await Permission.create(id="route_permission", name="Разрешение через роут")
+    await RolePermissionRelation.create(role=seed_role_admin, permission=permission)
+
+    response = await test_app.post(
+        "/api/user-company-relations/add",
+        headers={"Authorization": f"Bearer {jwt_token_admin['access_token']}"},
+        json={
+            "user_id": str(seed_user.id),
+            "company_id": str(seed_company.id),
+            "role_id": str(seed_role_admin.id),
+            "application_id": seed_application.id,
+        },
+    )
+    assert response.status_code == 201, response.text
+
+    permissions = await get_cached_company_permissions(seed_user)
+    assert str(seed_company.id) in permissions["test_app"]
+
+
+@pytest.mark.asyncio
+async def test_relation_delta_matches_full_recompute(
+    test_app,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+    seed_relation,
+):
+    permission = await Permission.create(id="delta_permission", name="Разрешение дельты")
+    role = await Role.create(name="delta_role", application_id=seed_application.id)
+    await RolePermissionRelation.create(role=role, permission=permission)
+    await bump_policy_version()
+    other = await Company.create(name="Дельта")
+    # Связь в том же приложении остаётся после удаления — проверка удаления не пустая
+    await UserCompanyRelation.create(user=seed_user, company=seed_company, role=role, application=seed_application)
+    await get_cached_permission_snapshot(seed_user)
+    misses = _metric("permissions_cache_misses_total")
+
+    version = await get_permissions_version(seed_user.id)
+    relation = await UserCompanyRelation.create(user=seed_user, company=other, role=role, application=seed_application)
+    assert await update_snapshot_after_relation_change(seed_user.id, [other.id], version)
+
+    snapshot = await get_cached_permission_snapshot(seed_user)
+    assert _metric("permissions_cache_misses_total") == misses
+    assert (snapshot["permissions"], snapshot["masks"]) == await get_company_permissions_with_masks(seed_user)
+    assert snapshot["permissions"][seed_application.id][str(other.id)] == [
+        {"role": "delta_role", "permissions": ["delta_permission"]}
+    ]
+
+    version = await get_permissions_version(seed_user.id)
+    await relation.delete()
+    assert await update_snapshot_after_relation_change(seed_user.id, [other.id], version)
+
+    snapshot = await get_cached_permission_snapshot(seed_user)
+    assert set(snapshot["permissions"][seed_application.id]) == {str(seed_company.id)}
+    assert (snapshot["permissions"], snapshot["masks"]) == await get_company_permissions_with_masks(seed_user)
+    assert snapshot["has_relations"]
+
+
+@pytest.mark.asyncio
+async def test_relation_delta_falls_back_to_rebuild(
+    test_app,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+    seed_role_admin: Role,
+):
+    # Снимка ещё нет — дополнять нечего
+    version = await get_permissions_version(seed_user.id)
+    assert not await update_snapshot_after_relation_change(seed_user.id, [seed_company.id], version)
+
+    permission = await Permission.create(id="rebuild_permission", name="Разрешение пересчёта")
+    await RolePermissionRelation.create(role=seed_role_admin, permission=permission)
+    await bump_policy_version()
+
+    # Версию успела сменить другая правка
+    await get_cached_permission_snapshot(seed_user)
+    version = await get_permissions_version(seed_user.id)
+    await bump_user_permissions_version(seed_user.id)
+    await UserCompanyRelation.create(
+        user=seed_user, company=seed_company, role=seed_role_admin, application=seed_application
+    )
+    assert not await update_snapshot_after_relation_change(seed_user.id, [seed_company.id], version)
+
+    permissions = await get_cached_company_permissions(seed_user)
+    assert str(seed_company.id) in permissions["test_app"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_relation_changes_apply_one_delta(
+    test_app,
+    monkeypatch,
+    seed_user: User,
+    seed_company: Company,
+    seed_application: Application,
+    seed_role_admin: Role,
+):
+    permission = await Permission.create(id="race_permission", name="Разрешение гонки")
+    await RolePermissionRelation.create(role=seed_role_admin, permission=permission)
+    other = await Company.create(name="Гонка")
+    await get_cached_permission_snapshot(seed_user)
+    version = await get_permissions_version(seed_user.id)
+
+    # Обращения к кэшу уступают цикл событий, как сетевые запросы к Redis
+    backend_get, backend_set = InMemoryBackend.get, InMemoryBackend.set
+
+    async def slow_get(self, key):
+        await asyncio.sleep(0)
+        return await backend_get(self, key)
+
+    async def slow_set(self, key, value, expire=None):
+        await asyncio.sleep(0)
+        await backend_set(self, key, value, expire)
+
+    monkeypatch.setattr(InMemoryBackend, "get", slow_get)
+    monkeypatch.setattr(InMemoryBackend, "set", slow_set)
+    for company in (seed_company, other):
+        await UserCompanyRelation.create(
+            user=seed_user, company=company, role=seed_role_admin, application=seed_application
+        )
+    applied = await asyncio.gather(
+        update_snapshot_after_relation_change(seed_user.id, [seed_company.id], version),
+        update_snapshot_after_relation_change(seed_user.id, [other.id], version),
+    )
+
+    # Прежнюю версию видит только одна правка; снимок, который отдаётся, содержит обе
+    assert sorted(applied) == [False, True]
+    snapshot = await get_cached_permission_snapshot(seed_user)
+    assert set(snapshot["permissions"]["test_app"]) == {str(seed_company.id), str(other.id)}
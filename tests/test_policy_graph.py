@@ -0,0 +1,40 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from app.database.models import (
+    Permission,
+    Role,
+    RoleIncludeRelation,
+    RolePermissionRelation,
+)
+from app.handlers.cache_handler import bump_policy_version
+from app.utils.policy_graph import get_policy_graph
+
+
+def _loads() -> float:
+    return REGISTRY.get_sample_value("policy_graph_loads_total", {}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_graph_reloaded_only_on_policy_bump():
+    parent = await Role.create(name="parent", application_id="crm_app")
+    child = await Role.create(name="child", application_id="parcel_app")
+    permission = await Permission.create(id="view_parcel", name="Просмотр посылки")
+    await RolePermissionRelation.create(role=child, permission=permission)
+    loads = _loads()
+
+    graph = await get_policy_graph()
+    assert await get_policy_graph() is graph
+    assert graph.closure_of(parent.id) == {parent.id}
+    assert graph.role_masks[child.id] == graph.index.mask_of(["view_parcel"])
+    assert _loads() == loads + 1
+
+    await RoleIncludeRelation.create(parent_role=parent, child_role=child, created_by=parent.id, modified_by=parent.id)
+    # Пока версия не сменилась, процесс работает со старым графом
+    assert (await get_policy_graph()).closure_of(parent.id) == {parent.id}
+
+    await bump_policy_version()
+    updated = await get_policy_graph()
+    assert updated is not graph
+    assert updated.closure_of(parent.id) == {parent.id, child.id}
+    assert _loads() == loads + 2
@@ -0,0 +1,114 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from app.database.models import (
+    Permission,
+    Restriction,
+    Role,
+    RoleIncludeRelation,
+    RolePermissionRelation,
+)
+from app.handlers.cache_handler import bump_policy_version, get_policy_version
+from app.utils import policy_graph
+from app.utils.policy_graph import (
+    configure_policy_snapshot,
+    get_policy_graph,
+    load_policy_graph,
+    policy_graph_in_use,
+)
+from app.utils.policy_snapshot import (
+    MappedPolicyGraph,
+    open_policy_snapshot,
+    write_policy_snapshot,
+)
+
+
+@pytest.fixture
+async def rbac():
+    roles = [await Role.create(name=f"role_{n}", application_id=f"app_{n % 2}") for n in range(4)]
+    for n, permission_id in enumerate(["view_user", "edit_user", "view_company"]):
+        permission = await Permission.create(id=permission_id, name=permission_id)
+        await RolePermissionRelation.create(role=roles[n], permission=permission)
+    restriction = await Restriction.create(id="own_only", name="Только свои")
+    await RolePermissionRelation.create(role=roles[3], permission=permission, restriction=restriction)
+    for parent, child in ((0, 1), (1, 2), (0, 3)):
+        await RoleIncludeRelation.create(
+            parent_role=roles[parent], child_role=roles[child], created_by=roles[0].id, modified_by=roles[0].id
+        )
+    return roles
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    path = str(tmp_path / "policy.bin")
+    configure_policy_snapshot(path)
+    yield path
+    configure_policy_snapshot(None)
+
+
+@pytest.mark.asyncio
+async def test_snapshot_roundtrip(rbac, tmp_path):
+    graph = await load_policy_graph("v1")
+    path = str(tmp_path / "policy.bin")
+    write_policy_snapshot(graph, path)
+
+    mapped = MappedPolicyGraph(path)
+    assert mapped.version == "v1"
+    for role in rbac:
+        assert mapped.closure_of(role.id) == graph.closure_of(role.id)
+        assert mapped.role_app[role.id] == graph.role_app[role.id]
+        assert mapped.role_name[role.id] == graph.role_name[role.id]
+        assert mapped.role_masks.get(role.id, 0) == graph.role_masks.get(role.id, 0)
+        assert mapped.role_restrictions.get(role.id, {}) == graph.role_restrictions.get(role.id, {})
+    assert dict(mapped.index.items()) == dict(graph.index.items())
+    assert mapped.closure_of(rbac[0].id) == {rbac[0].id, rbac[1].id, rbac[2].id, rbac[3].id}
+    assert mapped.role_restrictions[rbac[3].id] == {"view_company": ("own_only",)}
+
+    assert open_policy_snapshot(path, "v2") is None
+
+
+@pytest.mark.asyncio
+async def test_restarted_worker_maps_existing_snapshot(rbac, snapshot_path):
+    loads = REGISTRY.get_sample_value("policy_graph_loads_total", {}) or 0.0
+
+    first = await get_policy_graph()
+    assert isinstance(first, MappedPolicyGraph)
+    assert first.version == await get_policy_version()
+    closure = first.closure_of(rbac[1].id)
+
+    # Новый воркер: графа в памяти нет, файл текущей версии уже лежит на диске
+    policy_graph.reset_policy_graph()
+    second = await get_policy_graph()
+
+    assert second is not first
+    assert second.closure_of(rbac[1].id) == closure
+    assert REGISTRY.get_sample_value("policy_graph_loads_total", {}) == loads + 1
+
+
+@pytest.mark.asyncio
+async def test_replaced_snapshots_are_closed(rbac, snapshot_path):
+    retired = []
+    for _ in range(3):
+        graph = await get_policy_graph()
+        assert isinstance(graph, MappedPolicyGraph)
+        assert not graph.closed
+        retired.append(graph)
+        await bump_policy_version()
+
+    current = await get_policy_graph()
+    assert all(graph.closed for graph in retired)
+    assert current.closure_of(rbac[0].id) == {role.id for role in rbac}
+
+
+@pytest.mark.asyncio
+async def test_snapshot_held_by_reader_closes_after_release(rbac, snapshot_path):
+    async with policy_graph_in_use() as held:
+        await bump_policy_version()
+        replacement = await get_policy_graph()
+        assert replacement is not held
+        # Вытесненный снимок ещё читается, пока его держат
+        assert held.retired and not held.closed
+        assert held.closure_of(rbac[1].id) == {rbac[1].id, rbac[2].id}
+
+    assert held.closed
+    assert not replacement.closed
@@ -0,0 +1,100 @@
+import pytest
+from httpx import AsyncClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import app.database.models as models
+from app import create_app
+from app.config import ConfigName
+from app.database.models import User
+from tests.test_publisher import NullPublisher
+
+
+class FakeWindowScript:
+    """Та же логика, что у SLIDING_WINDOW_LUA, на словаре в памяти; время двигает тест."""
+
+    def __init__(self):
+        self.now = 0
+        self.windows: dict[str, list[tuple[int, str]]] = {}
+
+    async def __call__(self, keys, args):
+        window, member, *limits = args
+        retry = 0
+        for key, limit in zip(keys, limits):
+            entries = self.windows[key] = [e for e in self.windows.get(key, []) if e[0] > self.now - window]
+            if len(entries) >= limit:
+                retry = max(retry, entries[0][0] + window - self.now)
+        if retry:
+            return retry
+        for key in keys:
+            self.windows[key].append((self.now, member))
+        return 0
+
+
+class FakeRedis:
+    def __init__(self, script=None):
+        self.script = script
+
+    def register_script(self, lua):
+        return self.script
+
+
+async def _unavailable(keys, args):
+    raise RedisConnectionError("Redis недоступен")
+
+
+@pytest.fixture
+async def limited_client():
+    app = create_app(config_name=ConfigName.TEST)
+    app.state.publisher = NullPublisher()
+    app.state.redis = FakeRedis(FakeWindowScript())
+    async with AsyncClient(app=app, base_url="http://testserver") as client:
+        client.app = app
+        yield client
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    calls = []
+    original = models.verify_password
+
+    async def counting(password, password_hash):
+        calls.append(password)
+        return await original(password, password_hash)
+
+    monkeypatch.setattr(models, "verify_password", counting)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_login_throttled_before_hashing(limited_client, seed_user: User, verify_calls):
+    for _ in range(5):
+        response = await limited_client.post("/api/auth/login", json={"email": seed_user.email, "password": "wrong"})
+        assert response.status_code == 401
+
+    response = await limited_client.post("/api/auth/login", json={"email": seed_user.email, "password": "qweasdzcx"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+    assert len(verify_calls) == 5
+
+    # Окно сдвинулось — попытки снова принимаются
+    limited_client.app.state.redis.script.now += 60_000
+    response = await limited_client.post("/api/auth/login", json={"email": seed_user.email, "password": "qweasdzcx"})
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_email_windows_are_independent(limited_client, seed_user: User):
+    for _ in range(5):
+        await limited_client.post("/api/auth/login", json={"email": seed_user.email, "password": "wrong"})
+
+    response = await limited_client.post("/api/auth/login", json={"email": "other@example.com", "password": "x"})
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_limiter_fails_open_without_redis(limited_client, seed_user: User):
+    limited_client.app.state.redis = FakeRedis(_unavailable)
+
+    for _ in range(7):
+        response = await limited_client.post("/api/auth/login", json={"email": seed_user.email, "password": "qweasdzcx"})
+        assert response.status_code == 200
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+from fastapi_cache import FastAPICache
+
+from app.database.models import User
+from app.handlers.auth import issue_token_pair
+from app.utils.revocation import RevocationStore, _apply_message, is_token_revoked
+
+
+def test_store_drops_expired_entries():
+    store = RevocationStore()
+    now = int(time.time())
+    store.add("expired", now - 1)
+    store.add("alive", now + 60)
+
+    assert not store.is_revoked("expired")
+    assert store.is_revoked("alive")
+    assert not store.is_revoked(None)
+
+    store.prune(now + 120)
+    assert len(store) == 0
+
+
+def test_pubsub_message_revokes_locally():
+    _apply_message(f"remote-jti:{int(time.time()) + 60}".encode())
+    assert is_token_revoked("remote-jti")
+    assert not is_token_revoked("other-jti")
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_access_token(test_app, jwt_token_admin):
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    # InMemoryBackend хранит ключи на уровне класса — считаем только новые
+    before = {key for key in FastAPICache.get_backend()._store if key.startswith("revoked:")}  # type: ignore[attr-defined]
+
+    response = await test_app.post("/api/auth/logout", headers=headers)
+    assert response.status_code == 200
+
+    response = await test_app.post("/api/auth/logout", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+
+    keys = {key for key in FastAPICache.get_backend()._store if key.startswith("revoked:")} - before  # type: ignore[attr-defined]
+    assert len(keys) == 1
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_session_refresh_token(test_app, seed_admin: User, test_settings):
+    access_token, refresh_token = await issue_token_pair(seed_admin, test_settings)
+
+    # access-токен вместо refresh не принимается
+    response = await test_app.post("/api/auth/refresh", json={"refresh_token": access_token})
+    assert response.status_code == 401
+
+    # Обновлённая пара остаётся в той же сессии
+    response = await test_app.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 200, response.text
+    refreshed_access = response.json()["access_token"]
+
+    response = await test_app.post("/api/auth/logout", headers={"Authorization": f"Bearer {refreshed_access}"})
+    assert response.status_code == 200
+
+    response = await test_app.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    response = await test_app.get("/api/auth/me", params={"application_id": "auth_app"}, headers={"Authorization": f"Bearer {access_token}"})
+    assert response.status_code == 401
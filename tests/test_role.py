@@ -1,7 +1,16 @@
 import pytest
 from httpx import AsyncClient
 
-from app.database.models import Role
+from app.database.models import (
+    Application,
+    Company,
+    Permission,
+    Role,
+    User,
+    UserCompanyRelation,
+)
+from app.utils.permissions_get import get_company_permissions_for_user
+from app.utils.policy_graph import get_policy_graph
 
 
 @pytest.mark.asyncio
@@ -101,3 +110,41 @@ async def test_get_roles(
 
     role_ids = [role["role_id"] for role in roles]
     assert str(other_role.id) in role_ids, "Тестовая роль отсутствует в списке"
+
+
+@pytest.mark.asyncio
+async def test_created_role_resolves_permissions(
+    test_app: AsyncClient,
+    jwt_token_admin: dict,
+    seed_user: User,
+    seed_company: Company,
+    seed_permission: Permission,
+    seed_application: Application,
+):
+    """Роль, созданная через add-many, сразу попадает в граф ролей."""
+    headers = {"Authorization": f"Bearer {jwt_token_admin['access_token']}"}
+    # Граф процесса загружен до создания роли
+    await get_policy_graph()
+
+    response = await test_app.post(
+        "/api/roles/add-many",
+        headers=headers,
+        json={
+            "role_name": "Fresh Role",
+            "application_id": seed_application.id,
+            "permissions": [seed_permission.id],
+        },
+    )
+    assert response.status_code == 201, response.text
+    role_id = response.json()["role_id"]
+
+    await UserCompanyRelation.create(
+        user=seed_user,
+        company=seed_company,
+        role_id=role_id,
+        application=seed_application,
+    )
+    permissions = await get_company_permissions_for_user(seed_user)
+    assert permissions[seed_application.id][str(seed_company.id)] == [
+        {"role": "Fresh Role", "permissions": [seed_permission.id]}
+    ]
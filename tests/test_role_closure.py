@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from app.database.models import Role, RoleClosure, RoleIncludeRelation
+from app.utils.role_closure import creates_cycle, load_role_closure
+
+
+@pytest.fixture
+async def roles():
+    return {name: await Role.create(name=name, application_id="auth_app") for name in "abcd"}
+
+
+async def _include(parent: Role, child: Role, author) -> RoleIncludeRelation:
+    return await RoleIncludeRelation.create(
+        parent_role=parent,
+        child_role=child,
+        created_by=author,
+        modified_by=author,
+    )
+
+
+async def _closure_rows() -> set[tuple]:
+    rows = await RoleClosure.all().values_list("ancestor_id", "descendant_id", "depth")
+    return set(rows)
+
+
+@pytest.mark.asyncio
+async def test_chain_closure_depths(roles):
+    a, b, c = roles["a"], roles["b"], roles["c"]
+    await _include(a, b, a.id)
+    await _include(b, c, a.id)
+
+    assert await _closure_rows() == {(a.id, b.id, 1), (b.id, c.id, 1), (a.id, c.id, 2)}
+    closure = await load_role_closure({a.id})
+    assert closure[a.id] == {a.id, b.id, c.id}
+
+
+@pytest.mark.asyncio
+async def test_delete_keeps_alternative_path(roles):
+    """Ромб a → b → d, a → c → d: удаление a → b не должно убрать a → d."""
+    a, b, c, d = roles["a"], roles["b"], roles["c"], roles["d"]
+    ab = await _include(a, b, a.id)
+    await _include(a, c, a.id)
+    await _include(b, d, a.id)
+    await _include(c, d, a.id)
+
+    await ab.delete()
+
+    rows = await _closure_rows()
+    assert (a.id, d.id, 2) in rows
+    assert not any(row[:2] == (a.id, b.id) for row in rows)
+    assert (b.id, d.id, 1) in rows
+
+
+@pytest.mark.asyncio
+async def test_patch_moves_closure(roles):
+    a, b, c = roles["a"], roles["b"], roles["c"]
+    relation = await _include(a, b, a.id)
+    await _include(c, a, a.id)
+
+    relation.child_role_id = roles["d"].id
+    await relation.save()
+
+    rows = await _closure_rows()
+    assert rows == {(a.id, roles["d"].id, 1), (c.id, a.id, 1), (c.id, roles["d"].id, 2)}
+
+
+@pytest.mark.asyncio
+async def test_creates_cycle_uses_closure(roles):
+    a, b, c = roles["a"], roles["b"], roles["c"]
+    await _include(a, b, a.id)
+    await _include(b, c, a.id)
+
+    assert await creates_cycle(c.id, a.id)
+    assert await creates_cycle(a.id, a.id)
+    assert not await creates_cycle(a.id, c.id)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_includes_build_full_closure(roles):
+    """Параллельные a → b и b → c: вторая правка видит первую, путь a → c не теряется."""
+    a, b, c, d = roles["a"], roles["b"], roles["c"], roles["d"]
+
+    await asyncio.gather(_include(a, b, a.id), _include(b, c, a.id), _include(d, b, a.id))
+
+    assert await _closure_rows() == {
+        (a.id, b.id, 1),
+        (b.id, c.id, 1),
+        (d.id, b.id, 1),
+        (a.id, c.id, 2),
+        (d.id, c.id, 2),
+    }
@@ -0,0 +1,72 @@
+import pytest
+
+from app.database.models import (
+    Application,
+    Company,
+    OutboxEvent,
+    Permission,
+    Role,
+    RoleIncludeRelation,
+    RolePermissionRelation,
+    User,
+    UserCompanyRelation,
+)
+from app.utils.impact import enqueue_role_impact, find_affected_users
+
+
+@pytest.fixture
+async def hierarchy(seed_user: User):
+    """manager включает viewer; у каждой роли свой пользователь, у other — посторонний."""
+    application = await Application.create(id="crm_app", name="CRM")
+    company = await Company.create(name="Компания")
+    viewer = await Role.create(name="viewer", application_id=application.id)
+    manager = await Role.create(name="manager", application_id=application.id)
+    other = await Role.create(name="other", application_id=application.id)
+    await RoleIncludeRelation.create(
+        parent_role=manager, child_role=viewer, created_by=seed_user.id, modified_by=seed_user.id
+    )
+
+    users = {}
+    for role in (viewer, manager, other):
+        user = await User.create_user(email=f"{role.name}@test", password="123", full_name=role.name, position="-")
+        await UserCompanyRelation.create(user=user, company=company, role=role, application=application)
+        users[role.name] = user
+    return {"viewer": viewer, "manager": manager, "other": other, "users": users, "company": company}
+
+
+@pytest.mark.asyncio
+async def test_affected_users_follow_reverse_closure(hierarchy):
+    users = hierarchy["users"]
+
+    affected = await find_affected_users([hierarchy["viewer"].id])
+    assert set(affected) == {users["viewer"].id, users["manager"].id}
+
+    assert await find_affected_users([hierarchy["manager"].id]) == [users["manager"].id]
+    assert await find_affected_users([]) == []
+
+
+@pytest.mark.asyncio
+async def test_user_updates_enqueued_in_batches(hierarchy):
+    permission = await Permission.create(id="view_deal", name="Просмотр сделки")
+    # Граф ролей процесса не перезагружен — тела собираются по графу из БД
+    await RolePermissionRelation.create(role=hierarchy["viewer"], permission=permission)
+
+    assert await enqueue_role_impact([hierarchy["viewer"].id], batch_size=1) == 2
+
+    by_email = {row.payload["email"]: row.payload["payload"] for row in await OutboxEvent.all()}
+    assert set(by_email) == {"viewer@test", "manager@test"}
+
+    manager = by_email["manager@test"]
+    company_id = str(hierarchy["company"].id)
+    assert manager["companies"] == [company_id]
+    assert manager["relations"][0]["role"] == "manager"
+    # Права viewer видны держателю manager через включение
+    assert manager["permissions"]["crm_app"][company_id] == [{"role": "viewer", "permissions": ["view_deal"]}]
+
+
+@pytest.mark.asyncio
+async def test_role_impact_adds_known_users(hierarchy):
+    other = hierarchy["users"]["other"]
+
+    assert await enqueue_role_impact(user_ids=[other.id]) == 1
+    assert [str(row.user_id) for row in await OutboxEvent.all()] == [str(other.id)]
@@ -0,0 +1,29 @@
+import pytest
+from pydantic import ValidationError
+
+from app import provide_settings
+from app.config import ConfigName, get_settings_snapshot, reload_settings
+
+
+def test_settings_built_once():
+    provider = provide_settings(ConfigName.TEST)
+    assert provider() is provider() is get_settings_snapshot(ConfigName.TEST)
+
+
+def test_settings_are_frozen():
+    with pytest.raises(ValidationError):
+        get_settings_snapshot(ConfigName.TEST).SECRET_KEY = "changed"
+
+
+def test_reload_replaces_snapshot(monkeypatch):
+    provider = provide_settings(ConfigName.TEST)
+    before = provider()
+    monkeypatch.setenv("ACCESS_TOKEN_EXPIRE_MINUTES", "5")
+
+    reloaded = reload_settings(ConfigName.TEST)
+    assert reloaded is not before
+    assert provider() is reloaded
+    assert reloaded.ACCESS_TOKEN_EXPIRE_MINUTES == 5
+
+    monkeypatch.delenv("ACCESS_TOKEN_EXPIRE_MINUTES")
+    reload_settings(ConfigName.TEST)
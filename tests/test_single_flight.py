@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.database.models import User
+from app.utils.permissions_cache import get_cached_permission_snapshot
+from app.utils.single_flight import SingleFlight
+
+
+def _calls(group: str, result: str) -> float:
+    return REGISTRY.get_sample_value("single_flight_calls_total", {"group": group, "result": result}) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test_shared")
+    executions = 0
+
+    async def compute():
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return {"value": executions}
+
+    results = await asyncio.gather(*(flight.do("key", compute) for _ in range(10)))
+
+    assert executions == 1
+    assert all(result is results[0] for result in results)
+    assert _calls("test_shared", "coalesced") == 9
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_and_key_is_released():
+    flight = SingleFlight("test_errors")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def ok():
+        return "ok"
+
+    assert await flight.do("key", ok) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_others():
+    flight = SingleFlight("test_cancel")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", slow))
+    second = asyncio.create_task(flight.do("key", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "done"
+
+
+@pytest.mark.asyncio
+async def test_parallel_snapshot_requests_coalesce(test_app, seed_user: User, seed_relation):
+    executed = _calls("permission_snapshot", "executed")
+    coalesced = _calls("permission_snapshot", "coalesced")
+
+    snapshots = await asyncio.gather(*(get_cached_permission_snapshot(seed_user) for _ in range(10)))
+
+    assert all(snapshot == snapshots[0] for snapshot in snapshots)
+    assert _calls("permission_snapshot", "executed") == executed + 1
+    assert _calls("permission_snapshot", "coalesced") == coalesced + 9
@@ -0,0 +1,59 @@
+import pytest
+from fastapi import HTTPException
+
+from app.database.models import User
+from app.handlers.auth import build_access_claims, create_access_token, verify_token
+from app.handlers.cache_handler import (
+    bump_policy_version,
+    bump_user_permissions_version,
+)
+
+
+@pytest.fixture
+def stateless_settings(test_settings):
+    return test_settings.model_copy(update={"STATELESS_ACCESS_TOKENS": True})
+
+
+@pytest.mark.asyncio
+async def test_stateless_token_skips_db(test_app, seed_user: User, seed_relation, stateless_settings):
+    """Актуальный снимок прав в токене принимается без обращения к БД."""
+    claims = await build_access_claims(seed_user, stateless_settings)
+    assert claims["uid"] == str(seed_user.id)
+    assert "pv" in claims
+
+    token = create_access_token(claims, stateless_settings, "access")
+    await User.filter(id=seed_user.id).delete()
+
+    token_data = await verify_token(token, stateless_settings)
+    assert token_data["user_id"] == str(seed_user.id)
+    assert token_data["permissions"] == claims["perms"]
+    assert token_data["is_superadmin"] is False
+
+
+@pytest.mark.asyncio
+async def test_stateless_token_stale_after_user_bump(test_app, seed_user: User, stateless_settings):
+    """После смены версии прав пользователя токен проверяется по БД."""
+    token = create_access_token(await build_access_claims(seed_user, stateless_settings), stateless_settings, "access")
+    await User.filter(id=seed_user.id).delete()
+    await bump_user_permissions_version(seed_user.id)
+
+    with pytest.raises(HTTPException) as exc:
+        await verify_token(token, stateless_settings)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_stateless_token_stale_after_policy_bump(test_app, seed_user: User, stateless_settings):
+    claims = await build_access_claims(seed_user, stateless_settings)
+    await bump_policy_version()
+
+    token_data = await verify_token(create_access_token(claims, stateless_settings, "access"), stateless_settings)
+    # Снимок устарел — права пересчитаны по БД
+    assert token_data["user_id"] == str(seed_user.id)
+    assert token_data["permissions"] == {}
+
+
+@pytest.mark.asyncio
+async def test_stateless_disabled_keeps_plain_claims(seed_user: User, test_settings):
+    claims = await build_access_claims(seed_user, test_settings)
+    assert claims == {"sub": seed_user.email}
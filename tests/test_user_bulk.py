@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from app.database.models import Application, Company, Role, User, UserCompanyRelation
+from app.handlers import user_bulk
+from app.utils.hashing import hash_passwords
+
+
+def _row(email: str, **extra) -> dict:
+    return {"email": email, "full_name": "Bulk User", "position": "user", "password": "bulk-pass", **extra}
+
+
+@pytest.mark.asyncio
+async def test_bulk_json_reports_each_row(
+    test_app, jwt_token_admin, seed_user: User, seed_company: Company, seed_application: Application
+):
+    role = await Role.create(name="bulk_user_role", system_name="user", application_id=seed_application.id)
+    rows = [
+        _row("bulk_1", company_id=str(seed_company.id), application_id=seed_application.id),
+        _row(seed_user.email),
+        _row("bulk_2"),
+        _row("bulk_1"),
+        {"full_name": "Без email"},
+    ]
+
+    response = await test_app.post(
+        "/api/users/bulk",
+        headers={"Authorization": f"Bearer {jwt_token_admin['access_token']}"},
+        json=rows,
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    assert [r["status"] for r in body["results"]] == ["created", "exists", "created", "duplicate", "invalid"]
+    assert (body["created"], body["failed"]) == (2, 3)
+    assert body["results"][0]["relation_created"]
+    assert not body["results"][2]["relation_created"]
+
+    user = await User.get(email="bulk_1")
+    assert await user.check_password("bulk-pass")
+    assert await UserCompanyRelation.exists(user=user, company=seed_company, role=role)
+
+
+@pytest.mark.asyncio
+async def test_bulk_ndjson_stream(test_app, jwt_token_admin):
+    lines = [json.dumps(_row("ndjson_1")), "{not json", json.dumps(_row("ndjson_2"))]
+
+    response = await test_app.post(
+        "/api/users/bulk",
+        headers={
+            "Authorization": f"Bearer {jwt_token_admin['access_token']}",
+            "Content-Type": "application/x-ndjson",
+        },
+        content="\n".join(lines) + "\n",
+    )
+    assert response.status_code == 200, response.text
+
+    assert [r["status"] for r in response.json()["results"]] == ["created", "invalid", "created"]
+    assert await User.filter(email__in=["ndjson_1", "ndjson_2"]).count() == 2
+
+
+@pytest.mark.asyncio
+async def test_bulk_retry_reuses_password_hashes(test_app, jwt_token_admin, monkeypatch):
+    hashed: list[str] = []
+
+    async def racing_hash_passwords(passwords):
+        if not hashed:
+            # Пока партия хешируется, параллельный запрос занимает один из email
+            await User.create(email="race_1", full_name="Гонка", password_hash="-")
+        hashed.extend(passwords)
+        return await hash_passwords(passwords)
+
+    monkeypatch.setattr(user_bulk, "hash_passwords", racing_hash_passwords)
+
+    response = await test_app.post(
+        "/api/users/bulk",
+        headers={"Authorization": f"Bearer {jwt_token_admin['access_token']}"},
+        json=[_row("race_1"), _row("race_2")],
+    )
+    assert response.status_code == 200, response.text
+
+    assert [r["status"] for r in response.json()["results"]] == ["exists", "created"]
+    # Повтор партии не хеширует пароли заново
+    assert len(hashed) == 2
+    assert await (await User.get(email="race_2")).check_password("bulk-pass")